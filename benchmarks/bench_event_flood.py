@@ -0,0 +1,143 @@
+"""
+Simulation of a `message` flood from a single noisy workspace, reporting the latency (enqueue to handler finished)
+of `app_home_opened` and of messages of the other workspaces.
+
+Events are routed by slack_app.queues (the same code `enqueue_slack_event` uses), every queue is then simulated
+as a FIFO served by its own workers. Time is simulated, so results are deterministic and the run takes seconds.
+
+    python benchmarks/bench_event_flood.py
+    python benchmarks/bench_event_flood.py --flood-rate 1000 --workers 8
+
+Requires Django to be installed.
+"""
+import argparse
+import heapq
+import os
+import random
+import statistics
+import sys
+from collections import defaultdict
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+NOISY_TEAM = "T0NOISY"
+DEFAULT_QUEUE = "celery"
+
+# seconds a handler takes per event type
+SERVICE_TIME = {
+    "message": 0.02,
+    "app_home_opened": 0.05,
+}
+
+
+def configure_django():
+    import django
+    from django.conf import settings
+
+    settings.configure(SECRET_KEY="bench", INSTALLED_APPS=[], DATABASES={})
+    django.setup()
+
+
+def generate_events(duration: float, flood_rate: float, teams: int, rng: random.Random) -> list:
+    """
+    Returns (arrival time, team id, event type) sorted by arrival, Poisson arrivals per source
+    """
+    sources = [(NOISY_TEAM, "message", flood_rate)]
+    for i in range(teams):
+        sources.append((f"T{i:05d}", "message", 2))
+        sources.append((f"T{i:05d}", "app_home_opened", 0.2))
+
+    events = []
+    for team_id, event_type, rate in sources:
+        now = rng.expovariate(rate)
+        while now < duration:
+            events.append((now, team_id, event_type))
+            now += rng.expovariate(rate)
+    events.sort()
+    return events
+
+
+def simulate(events: list, route, workers: dict) -> dict:
+    """
+    :param route: (event type, team id, now) -> queue name
+    :param workers: queue name -> number of workers serving it
+    :return: latencies by (event type, noisy or not)
+    """
+    queues = defaultdict(list)
+    for arrival, team_id, event_type in events:
+        queues[route(event_type, team_id, arrival)].append((arrival, team_id, event_type))
+
+    latencies = defaultdict(list)
+    for queue, queued in queues.items():
+        free_at = [0.0] * workers[queue]
+        for arrival, team_id, event_type in queued:
+            start = max(arrival, heapq.heappop(free_at))
+            finish = start + SERVICE_TIME[event_type]
+            heapq.heappush(free_at, finish)
+            latencies[(event_type, team_id == NOISY_TEAM)].append(finish - arrival)
+    return latencies
+
+
+def percentile(values: list, fraction: float) -> float:
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+
+def report(name: str, latencies: dict):
+    print(name)
+    labels = {
+        ("app_home_opened", False): "app_home_opened",
+        ("message", False): "message (other workspaces)",
+        ("message", True): "message (noisy workspace)",
+    }
+    for key, label in labels.items():
+        values = latencies.get(key)
+        if values:
+            print(f"  {label:<28} n={len(values):>7}  p50 {statistics.median(values) * 1000:>10.1f} ms  "
+                  f"p99 {percentile(values, 0.99) * 1000:>10.1f} ms  max {max(values) * 1000:>10.1f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--duration", type=float, default=60, help="simulated seconds")
+    parser.add_argument("--flood-rate", type=float, default=500, help="messages/sec of the noisy workspace")
+    parser.add_argument("--teams", type=int, default=50, help="number of other workspaces")
+    parser.add_argument("--workers", type=int, default=8, help="workers in total")
+    parser.add_argument("--fair-share", type=float, default=20, help="events/sec per workspace before overflowing")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    configure_django()
+    from slack_app.queues import EventQueueRouter, WorkspaceFairness
+
+    events = generate_events(args.duration, args.flood_rate, args.teams, random.Random(args.seed))
+    print(f"{len(events)} events in {args.duration:.0f} s, {args.workers} workers\n")
+
+    report("single queue", simulate(events, lambda event_type, team_id, now: DEFAULT_QUEUE,
+                                    {DEFAULT_QUEUE: args.workers}))
+
+    now = [0.0]
+    router = EventQueueRouter(
+        routes={"app_home_opened": {"queue": "slack_priority", "priority": 9}},
+        workspace_routes={},
+        fairness=WorkspaceFairness(args.fair_share, args.fair_share * 2, clock=lambda: now[0]),
+        overflow_queue="slack_overflow",
+    )
+
+    def route(event_type, team_id, arrival):
+        now[0] = arrival
+        return router.get_options(event_type, team_id).get("queue") or DEFAULT_QUEUE
+
+    # a quarter of the workers serve the priority and overflow queues each
+    dedicated = max(1, args.workers // 4)
+    workers = {
+        "slack_priority": dedicated,
+        "slack_overflow": dedicated,
+        DEFAULT_QUEUE: max(1, args.workers - 2 * dedicated),
+    }
+    print()
+    report(f"routed & fair share ({workers})", simulate(events, route, workers))
+
+
+if __name__ == "__main__":
+    main()
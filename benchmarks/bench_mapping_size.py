@@ -0,0 +1,163 @@
+"""
+Size of SlackUserMapping before and after the workspace fields moved to SlackWorkspace (migrations 0003 & 0004).
+
+Creates a throwaway database, migrates it to 0002, fills it with mappings and measures the table size and the WAL
+written by a metadata refresh (`bulk_update` of `metadata_fields` in batches), then migrates it to the latest
+migration and measures again. Sizes are compared after VACUUM FULL, PostgreSQL keeps dropped columns in existing rows
+until they are rewritten, the size right after the migration is reported as well.
+
+    PGHOST=/var/run/postgresql python benchmarks/bench_mapping_size.py
+    python benchmarks/bench_mapping_size.py --workspaces 20 --users 1000
+
+Requires PostgreSQL (connection through the usual PG* environment variables), Django, celery, slackclient and
+psycopg2 to be installed.
+"""
+import argparse
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+BEFORE = [("slack_app", "0002_metadata_refreshed_at")]
+BATCH_SIZE = 500
+
+ICON = "https://avatars.slack-edge.com/2020-01-01/123456789012_0123456789abcdef0123_{}.png"
+
+OLD_METADATA_FIELDS = [
+    'slack_email', 'image_24', 'image_32', 'image_48', 'image_72', 'image_192', 'image_512', 'image_1024',
+    'workspace_name', 'workspace_domain', 'workspace_image_34', 'workspace_image_44', 'workspace_image_68',
+    'workspace_image_88', 'workspace_image_102', 'workspace_image_132', 'workspace_image_230',
+    'workspace_image_original', 'metadata_refreshed_at',
+]
+
+
+def configure_django(database: str):
+    import django
+    from django.conf import settings
+
+    settings.configure(
+        USE_TZ=True,
+        DATABASES={"default": {"ENGINE": "django.db.backends.postgresql", "NAME": database}},
+        INSTALLED_APPS=["django.contrib.auth", "django.contrib.contenttypes", "django.contrib.sites", "slack_app"],
+        SITE_ID=1,
+    )
+    django.setup()
+
+
+def migrate(targets):
+    from django.db import connection
+    from django.db.migrations.executor import MigrationExecutor
+
+    executor = MigrationExecutor(connection)
+    targets = targets or executor.loader.graph.leaf_nodes()
+    executor.migrate(targets)
+    return executor.loader.project_state(targets).apps
+
+
+def table_size() -> int:
+    from django.db import connection
+
+    with connection.cursor() as cursor:
+        cursor.execute("VACUUM ANALYZE slack_app_slackusermapping")
+        cursor.execute("SELECT pg_total_relation_size('slack_app_slackusermapping')")
+        return cursor.fetchone()[0]
+
+
+def vacuum_full():
+    from django.db import connection
+
+    with connection.cursor() as cursor:
+        cursor.execute("VACUUM FULL slack_app_slackusermapping")
+
+
+def wal_bytes(fn) -> int:
+    from django.db import connection
+
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT pg_current_wal_lsn()")
+        start = cursor.fetchone()[0]
+        fn()
+        cursor.execute("SELECT pg_wal_lsn_diff(pg_current_wal_lsn(), %s)", [start])
+        return int(cursor.fetchone()[0])
+
+
+def populate(apps, workspaces: int, users: int):
+    from django.utils import timezone
+
+    SlackWorkspace = apps.get_model("slack_app", "SlackWorkspace")
+    SlackUserMapping = apps.get_model("slack_app", "SlackUserMapping")
+
+    for w in range(workspaces):
+        workspace = SlackWorkspace.objects.create(
+            id=f"T{w:08d}", name=f"Workspace {w}", scope="commands,chat:write", bot_access_token=f"xoxb-{w}",
+            bot_user_id=f"B{w:08d}", response={},
+        )
+        SlackUserMapping.objects.bulk_create([
+            SlackUserMapping(
+                slack_user_id=f"U{w:04d}{u:06d}", slack_team_id=workspace.pk, slack_workspace=workspace,
+                access_token=f"xoxp-{w}-{u}", slack_email=f"user{u}@workspace{w}.example.com",
+                metadata_refreshed_at=timezone.now(),
+                workspace_name=f"Workspace {w}", workspace_domain=f"workspace-{w}",
+                **{f"workspace_image_{size}": ICON.format(size) for size in [34, 44, 68, 88, 102, 132, 230]},
+                workspace_image_original=ICON.format("original"),
+                **{f"image_{size}": ICON.format(size) for size in [24, 32, 48, 72, 192, 512, 1024]},
+            )
+            for u in range(users)
+        ], batch_size=BATCH_SIZE)
+
+
+def refresh_metadata(model, fields):
+    from django.utils import timezone
+
+    def refresh():
+        mappings = list(model.objects.order_by("pk"))
+        for mapping in mappings:
+            mapping.metadata_refreshed_at = timezone.now()
+        for start in range(0, len(mappings), BATCH_SIZE):
+            model.objects.bulk_update(mappings[start:start + BATCH_SIZE], fields)
+
+    return refresh
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--database", default="postgres", help="database to connect to, a test database is created")
+    parser.add_argument("--workspaces", type=int, default=10)
+    parser.add_argument("--users", type=int, default=1000, help="mappings per workspace")
+    args = parser.parse_args()
+
+    configure_django(args.database)
+
+    from django.db import connection
+
+    test_database = connection.creation.create_test_db(verbosity=0, autoclobber=True)
+    try:
+        apps = migrate(BEFORE)
+        populate(apps, args.workspaces, args.users)
+        mapping_model = apps.get_model("slack_app", "SlackUserMapping")
+        vacuum_full()
+        before_size = table_size()
+        before_wal = wal_bytes(refresh_metadata(mapping_model, OLD_METADATA_FIELDS))
+
+        migrate(None)
+        from slack_app.models import SlackUserMapping
+
+        migrated_size = table_size()
+        vacuum_full()
+        after_size = table_size()
+        after_wal = wal_bytes(refresh_metadata(SlackUserMapping, SlackUserMapping.metadata_fields))
+    finally:
+        connection.creation.destroy_test_db(test_database, verbosity=0)
+
+    mappings = args.workspaces * args.users
+    print(f"{mappings} mappings in {args.workspaces} workspaces")
+    print(f"{'':28} {'table size':>12} {'bytes/row':>10} {'refresh WAL':>12} {'bytes/row':>10}")
+    print(f"{'0002 (fields on mappings)':28} {before_size:>12} {before_size / mappings:>10.0f} "
+          f"{before_wal:>12} {before_wal / mappings:>10.0f}")
+    print(f"{'latest, before VACUUM FULL':28} {migrated_size:>12} {migrated_size / mappings:>10.0f}")
+    print(f"{'latest':28} {after_size:>12} {after_size / mappings:>10.0f} "
+          f"{after_wal:>12} {after_wal / mappings:>10.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,198 @@
+"""
+Micro-benchmark of parsing interactivity payloads, from a small block_actions to a large view_submission.
+
+Compares the previous handling (json.loads of the whole `payload` field, then dict lookups) with the payload
+classes of slack_app.payloads, which use orjson when it's installed. Then compares memory allocated per payload
+by eagerly filled payload dicts (a copy of the decoded payload, the command's QueryDict copied twice) with the
+lazily filled ones: routing only, and once handed to a handler.
+
+    python benchmarks/bench_payloads.py
+    python benchmarks/bench_payloads.py --inputs 500
+
+Runs without Django installed, the slash command allocations are measured when it is.
+"""
+import argparse
+import json
+import os
+import sys
+import timeit
+import tracemalloc
+from urllib.parse import urlencode
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from slack_app import payloads  # noqa: E402
+from slack_app.payloads import parse_interactivity_payload, INTERACTIVITY_PAYLOAD_CLASSES  # noqa: E402
+
+
+def rich_text(index: int) -> dict:
+    return {
+        "type": "rich_text",
+        "block_id": f"rt-{index}",
+        "elements": [{
+            "type": "rich_text_section",
+            "elements": [{"type": "text", "text": "Lorem ipsum dolor sit amet, consectetur adipiscing elit. " * 3}],
+        }],
+    }
+
+
+def view_submission(inputs: int) -> str:
+    blocks = []
+    values = {}
+    for i in range(inputs):
+        blocks.append({
+            "type": "input",
+            "block_id": f"block-{i}",
+            "label": {"type": "plain_text", "text": f"Question {i}"},
+            "element": {"type": "plain_text_input", "action_id": "answer", "multiline": True},
+        })
+        values[f"block-{i}"] = {"answer": {"type": "plain_text_input", "value": f"Answer {i} " * 20}}
+        blocks.append(rich_text(i))
+
+    return json.dumps({
+        "type": "view_submission",
+        "team": {"id": "T0BENCH", "domain": "benchmark"},
+        "user": {"id": "U0BENCH", "username": "bench", "name": "bench", "team_id": "T0BENCH"},
+        "api_app_id": "A0BENCH",
+        "token": "bench",
+        "trigger_id": "1.2.3",
+        "view": {
+            "id": "V0BENCH",
+            "type": "modal",
+            "callback_id": "survey",
+            "private_metadata": "",
+            "blocks": blocks,
+            "state": {"values": values},
+            "title": {"type": "plain_text", "text": "Survey"},
+        },
+    })
+
+
+def block_actions() -> str:
+    return json.dumps({
+        "type": "block_actions",
+        "team": {"id": "T0BENCH", "domain": "benchmark"},
+        "user": {"id": "U0BENCH", "name": "bench"},
+        "trigger_id": "1.2.3",
+        "response_url": "https://hooks.slack.com/actions/bench",
+        "actions": [{"action_id": "approve", "block_id": "request", "type": "button", "value": "1"}],
+    })
+
+
+def legacy(raw: str):
+    payload = json.loads(raw)
+    return payload.get("type"), payload.get("team").get("id"), payload.get("user").get("id")
+
+
+def current(raw: str):
+    payload = parse_interactivity_payload(raw)
+    return payload.type, payload.team_id, payload.user_id
+
+
+def peak_memory(fn, raw) -> int:
+    tracemalloc.start()
+    fn(raw)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return peak
+
+
+def allocated(fn, raw) -> int:
+    """
+    Bytes allocated by `fn` and still held by its result
+    """
+    tracemalloc.start()
+    result = fn(raw)  # noqa: F841
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return size
+
+
+def eager_interactivity(raw: str):
+    # payload classes filled upfront: the decoded payload copied into the payload dict
+    data = payloads.loads(raw)
+    payload = INTERACTIVITY_PAYLOAD_CLASSES.get(data.get("type"), payloads.InteractivityPayload)(data).fill()
+    return payload, payload.type, payload.team_id, payload.user_id
+
+
+def lazy_interactivity(raw: str):
+    payload = parse_interactivity_payload(raw)
+    return payload, payload.type, payload.team_id, payload.user_id
+
+
+def handled_interactivity(raw: str):
+    payload, *fields = lazy_interactivity(raw)
+    return payload.fill(), *fields
+
+
+def command_query():
+    import django
+    from django.conf import settings
+
+    if not settings.configured:
+        settings.configure()
+        django.setup()
+    from django.http import QueryDict
+
+    return QueryDict(urlencode({
+        "token": "bench", "command": "/bench", "text": "hello " * 20, "team_id": "T0BENCH", "team_domain": "benchmark",
+        "channel_id": "C0BENCH", "channel_name": "general", "user_id": "U0BENCH", "user_name": "bench",
+        "response_url": "https://hooks.slack.com/commands/T0BENCH/1234/abcdef", "trigger_id": "1.2.3",
+        "api_app_id": "A0BENCH", "is_enterprise_install": "false",
+    }))
+
+
+def eager_command(query):
+    # QueryDict.dict() copied into the payload dict
+    payload = payloads.CommandPayload(query.dict()).fill()
+    return payload, payload.command, payload.text, payload.user_id
+
+
+def lazy_command(query):
+    payload = payloads.CommandPayload(query)
+    return payload, payload.command, payload.text, payload.user_id
+
+
+def handled_command(query):
+    payload, *fields = lazy_command(query)
+    return payload.fill(), *fields
+
+
+def print_allocations(name: str, raw, eager, lazy, handled):
+    assert eager(raw)[1:] == lazy(raw)[1:] == handled(raw)[1:]
+    print(f"{name:<22} eager {allocated(eager, raw):>8} B  lazy {allocated(lazy, raw):>8} B  "
+          f"handed to a handler {allocated(handled, raw):>8} B")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--inputs", type=int, nargs="+", default=[10, 100, 500], help="inputs of the large modals")
+    args = parser.parse_args()
+
+    print(f"JSON backend: {payloads.JSON_BACKEND}")
+
+    cases = [("block_actions", block_actions())] + [
+        (f"view_submission x{inputs}", view_submission(inputs)) for inputs in args.inputs
+    ]
+    for name, raw in cases:
+        assert legacy(raw) == current(raw)
+        number = max(10, 20 * 1024 * 1024 // len(raw))
+        legacy_time = min(timeit.repeat(lambda: legacy(raw), number=number, repeat=5)) / number
+        current_time = min(timeit.repeat(lambda: current(raw), number=number, repeat=5)) / number
+        print(f"{name:<22} {len(raw) / 1024:>8.1f} KB  legacy {legacy_time * 1e6:>9.1f} us "
+              f"{peak_memory(legacy, raw) / 1024:>8.1f} KB  payloads {current_time * 1e6:>9.1f} us "
+              f"{peak_memory(current, raw) / 1024:>8.1f} KB  speedup {legacy_time / current_time:>5.2f}x")
+
+    print("\nAllocated per payload, decoded JSON included:")
+    for name, raw in cases:
+        print_allocations(name, raw, eager_interactivity, lazy_interactivity, handled_interactivity)
+    try:
+        query = command_query()
+    except ImportError:
+        print("slash command             skipped, requires Django")
+    else:
+        print_allocations("slash command", query, eager_command, lazy_command, handled_command)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+"""
+Micro-benchmark of Slack signature verification for payloads of growing size.
+
+Compares the previous implementation (decodes the body and hashes a re-encoded copy of it) with
+SignatureVerifier (hashes the raw body with precomputed keyed HMAC state).
+
+    python benchmarks/bench_signature.py
+    python benchmarks/bench_signature.py --secrets 2 --sizes 1024 1048576
+
+Requires Django, celery and slackclient to be installed.
+"""
+import argparse
+import hashlib
+import hmac
+import os
+import sys
+import time
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+SIGNING_SECRET = "bench-signing-secret"
+
+
+def configure_django():
+    import django
+    from django.conf import settings
+
+    settings.configure(
+        SECRET_KEY="bench",
+        INSTALLED_APPS=[
+            "django.contrib.auth",
+            "django.contrib.contenttypes",
+            "slack_app",
+        ],
+        DATABASES={},
+        SLACK_SIGNING_SECRET=SIGNING_SECRET,
+    )
+    django.setup()
+
+
+def legacy_verify(signing_secret: str, signature: str, timestamp: str, body: bytes) -> bool:
+    if abs(time.time() - int(timestamp)) > 60 * 5:
+        return False
+    sig_basestring = f"v0:{timestamp}:{body.decode('utf-8')}".encode("utf-8")
+    my_signature = 'v0=' + hmac.new(bytes(signing_secret, 'utf-8'), sig_basestring, hashlib.sha256).hexdigest()
+    return hmac.compare_digest(my_signature, signature)
+
+
+def sign(body: bytes, timestamp: str) -> str:
+    return "v0=" + hmac.new(SIGNING_SECRET.encode(), b"v0:" + timestamp.encode() + b":" + body, hashlib.sha256) \
+        .hexdigest()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1024, 16 * 1024, 256 * 1024, 1024 * 1024])
+    parser.add_argument("--secrets", type=int, default=1, help="number of configured secrets, the valid one is last")
+    parser.add_argument("-n", "--number", type=int, default=None, help="iterations per size, default: adaptive")
+    args = parser.parse_args()
+
+    configure_django()
+    from slack_app.signature import SignatureVerifier
+
+    # during a rotation the request may be signed by the last configured secret, the worst case
+    secrets = [f"rotated-{i}" for i in range(args.secrets - 1)] + [SIGNING_SECRET]
+    verifier = SignatureVerifier(secrets)
+
+    for size in args.sizes:
+        body = b"payload=" + b"x" * size
+        timestamp = str(int(time.time()))
+        signature = sign(body, timestamp)
+        assert legacy_verify(SIGNING_SECRET, signature, timestamp, body)
+        assert verifier.verify(signature, timestamp, body)
+
+        number = args.number or max(10, 2 * 1024 * 1024 * 100 // (size + 1024))
+        legacy = min(timeit.repeat(lambda: legacy_verify(SIGNING_SECRET, signature, timestamp, body),
+                                   number=number, repeat=5)) / number
+        current = min(timeit.repeat(lambda: verifier.verify(signature, timestamp, body), number=number, repeat=5)) \
+            / number
+        print(f"{size:>10} B  legacy {legacy * 1e6:>10.2f} us  verifier {current * 1e6:>10.2f} us  "
+              f"speedup {legacy / current:>5.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,314 @@
+"""
+Benchmarks of the Slack endpoints: slack_events, slack_command and slack_interactivity.
+
+Requests are signed the same way Slack signs them, outbound Slack API calls go to a local stand-in
+(see slack_app/tests/fake_slack.py) and Celery tasks run eagerly, so an event is measured including its receivers.
+
+    python benchmarks/bench_views.py -n 2000
+    python benchmarks/bench_views.py --server --concurrency 8
+    python benchmarks/bench_views.py --save-baseline benchmarks/baseline.json
+    python benchmarks/bench_views.py --baseline benchmarks/baseline.json --tolerance 0.2
+
+Requires Django, celery, slackclient and psycopg2 (imported by the initial migration) to be installed.
+"""
+import argparse
+import hashlib
+import hmac
+import http.client
+import json
+import os
+import statistics
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from socketserver import ThreadingMixIn
+from urllib.parse import urlencode
+from wsgiref.simple_server import WSGIServer, WSGIRequestHandler, make_server
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from slack_app.tests.fake_slack import FakeSlackServer  # noqa: E402
+
+SIGNING_SECRET = "bench-signing-secret"
+TEAM_ID = "T0BENCH"
+USER_ID = "U0BENCH"
+
+
+def configure_django(api_url: str, db_name: str):
+    import django
+    from django.conf import settings
+
+    settings.configure(
+        DEBUG=False,
+        USE_TZ=True,
+        SECRET_KEY="bench",
+        ALLOWED_HOSTS=["*"],
+        DATABASES={
+            'default': {
+                'ENGINE': 'django.db.backends.sqlite3',
+                'NAME': db_name,
+            }
+        },
+        INSTALLED_APPS=[
+            "django.contrib.auth",
+            "django.contrib.contenttypes",
+            "slack_app",
+        ],
+        MIDDLEWARE=[],
+        ROOT_URLCONF="slack_app.urls",
+        CACHES={"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}},
+        SLACK_CLIENT_ID="bench",
+        SLACK_CLIENT_SECRET="bench",
+        SLACK_SIGNING_SECRET=SIGNING_SECRET,
+        SLACK_API_BASE_URL=api_url,
+        # the benchmark hammers a single workspace, don't let the outbound scheduler throttle it
+        SLACK_RATE_LIMIT_ENABLED=False,
+        SLACK_APP_HOME_DEBOUNCE=0,
+    )
+    django.setup()
+
+    from celery import Celery
+    celery_app = Celery("bench", set_as_current=True)
+    celery_app.conf.task_always_eager = True
+
+    from django.core.management import call_command
+    # the real migrations, so the benchmark runs against the indexes deployments have
+    call_command("migrate", verbosity=0)
+
+
+def register_handlers():
+    from django.http import JsonResponse
+
+    from slack_app.decorators import slack_command, slack_interactivity, on_slack_signal, slack_app_home
+
+    @slack_command("bench")
+    def bench_command(request, payload, slack_user_mapping, slack_workspace):
+        return JsonResponse({"text": f"Hello {slack_user_mapping.user.username}"})
+
+    @slack_interactivity("block_actions")
+    def bench_block_actions(request, payload, slack_user_mapping, slack_workspace):
+        return JsonResponse({})
+
+    @on_slack_signal("message", inject_slack_models=True)
+    def bench_message(sender, event_type, event_data, slack_user_mapping, slack_workspace, **kwargs):
+        return slack_user_mapping
+
+    @slack_app_home
+    def bench_home(sender, event_type, event_data, slack_user_mapping, slack_workspace, **kwargs):
+        # a fresh view every time, so the content hash doesn't skip the publish
+        return [{"type": "section", "text": {"type": "mrkdwn", "text": uuid.uuid4().hex}}], {
+            "type": "plain_text", "text": "Benchmark"
+        }
+
+
+def create_fixtures():
+    from django.contrib.auth import get_user_model
+    from slack_app.models import SlackWorkspace, SlackUserMapping
+
+    user = get_user_model().objects.create(username="bench")
+    workspace = SlackWorkspace.objects.create(
+        id=TEAM_ID, name="Benchmark", scope="commands", bot_access_token="xoxb-bench", bot_user_id="B0BENCH",
+    )
+    SlackUserMapping.objects.create(
+        slack_user_id=USER_ID, slack_team_id=TEAM_ID, slack_workspace=workspace, user=user,
+        access_token="xoxp-bench",
+    )
+
+
+def sign(body: bytes) -> dict:
+    timestamp = str(int(time.time()))
+    signature = hmac.new(SIGNING_SECRET.encode(), b"v0:" + timestamp.encode() + b":" + body, hashlib.sha256)
+    return {
+        "X-Slack-Signature": "v0=" + signature.hexdigest(),
+        "X-Slack-Request-Timestamp": timestamp,
+    }
+
+
+def command_request():
+    body = urlencode({
+        "token": "bench", "command": "/bench", "text": "hello", "team_id": TEAM_ID, "team_domain": "benchmark",
+        "channel_id": "C0BENCH", "channel_name": "general", "user_id": USER_ID, "user_name": "bench",
+        "response_url": "https://hooks.slack.com/commands/bench", "trigger_id": "1.2.3",
+    }).encode()
+    return "/commands/bench/", body, "application/x-www-form-urlencoded"
+
+
+def interactivity_request():
+    payload = {
+        "type": "block_actions",
+        "team": {"id": TEAM_ID, "domain": "benchmark"},
+        "user": {"id": USER_ID, "name": "bench"},
+        "trigger_id": "1.2.3",
+        "response_url": "https://hooks.slack.com/actions/bench",
+        "actions": [{"action_id": "approve", "block_id": "request", "type": "button", "value": "1"}],
+    }
+    return "/interactivity/", urlencode({"payload": json.dumps(payload)}).encode(), "application/x-www-form-urlencoded"
+
+
+def event_request(event: dict):
+    def build():
+        body = json.dumps({
+            "token": "bench",
+            "team_id": TEAM_ID,
+            "api_app_id": "A0BENCH",
+            "type": "event_callback",
+            "event_id": f"Ev{uuid.uuid4().hex}",
+            "event_time": int(time.time()),
+            "event": dict(event),
+        }).encode()
+        return "/events/", body, "application/json"
+
+    return build
+
+
+SCENARIOS = {
+    "command": command_request,
+    "interactivity": interactivity_request,
+    "event_message": event_request({"type": "message", "user": USER_ID, "channel": "C0BENCH", "text": "hi"}),
+    "event_app_home_opened": event_request({"type": "app_home_opened", "user": USER_ID, "tab": "home"}),
+}
+
+
+class TestClientTransport:
+
+    def __init__(self):
+        from django.test import Client
+        self.client = Client()
+
+    def __call__(self, path, body, content_type):
+        headers = {f"HTTP_{key.upper().replace('-', '_')}": value for key, value in sign(body).items()}
+        response = self.client.generic("POST", path, body, content_type=content_type, **headers)
+        assert response.status_code == 200, (path, response.status_code, response.content)
+
+
+class ThreadingWSGIServer(ThreadingMixIn, WSGIServer):
+    daemon_threads = True
+
+
+class QuietHandler(WSGIRequestHandler):
+
+    def log_message(self, format, *args):
+        pass
+
+
+class ServerTransport:
+
+    def __init__(self):
+        from django.core.wsgi import get_wsgi_application
+        self.httpd = make_server("127.0.0.1", 0, get_wsgi_application(), ThreadingWSGIServer, QuietHandler)
+        threading.Thread(target=self.httpd.serve_forever, daemon=True).start()
+        self.netloc = "%s:%s" % self.httpd.server_address[:2]
+
+    def __call__(self, path, body, content_type):
+        connection = http.client.HTTPConnection(self.netloc)
+        connection.request("POST", path, body=body, headers={"Content-Type": content_type, **sign(body)})
+        response = connection.getresponse()
+        response.read()
+        connection.close()
+        assert response.status == 200, (path, response.status)
+
+
+def count_queries(transport, build, samples=20) -> float:
+    from django.db import connection
+    from django.test.utils import CaptureQueriesContext
+
+    with CaptureQueriesContext(connection) as context:
+        for _ in range(samples):
+            transport(*build())
+    return len(context.captured_queries) / samples
+
+
+def run_scenario(transport, build, requests: int, concurrency: int) -> dict:
+    def timed(_):
+        request = build()
+        started = time.perf_counter()
+        transport(*request)
+        return time.perf_counter() - started
+
+    for _ in range(min(50, requests)):
+        transport(*build())
+
+    started = time.perf_counter()
+    if concurrency > 1:
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            latencies = list(executor.map(timed, range(requests)))
+    else:
+        latencies = [timed(i) for i in range(requests)]
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    return {
+        "requests_per_second": round(requests / elapsed, 1),
+        "p50_ms": round(statistics.median(latencies) * 1000, 3),
+        "p99_ms": round(latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))] * 1000, 3),
+    }
+
+
+def compare(results: dict, baseline: dict, tolerance: float) -> list:
+    regressions = []
+    for name, result in results.items():
+        base = baseline.get(name)
+        if not base:
+            continue
+        if result["p50_ms"] > base["p50_ms"] * (1 + tolerance):
+            regressions.append(f"{name}: p50 {base['p50_ms']}ms -> {result['p50_ms']}ms")
+        if result.get("queries") is not None and base.get("queries") is not None \
+                and result["queries"] > base["queries"]:
+            regressions.append(f"{name}: queries/request {base['queries']} -> {result['queries']}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("-n", "--requests", type=int, default=1000)
+    parser.add_argument("--scenario", action="append", choices=sorted(SCENARIOS), help="default: all")
+    parser.add_argument("--server", action="store_true", help="go through a real WSGI server instead of test client")
+    parser.add_argument("--concurrency", type=int, default=1)
+    parser.add_argument("--baseline", help="compare with results stored in this file")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="allowed p50 slowdown against the baseline")
+    parser.add_argument("--save-baseline", help="store results into this file")
+    args = parser.parse_args()
+
+    fake_slack = FakeSlackServer().start()
+    db_file = tempfile.NamedTemporaryFile(suffix=".sqlite3", delete=False)
+    db_file.close()
+
+    try:
+        configure_django(fake_slack.api_url, db_file.name)
+        register_handlers()
+        create_fixtures()
+
+        transport = ServerTransport() if args.server else TestClientTransport()
+        results = {}
+        for name in args.scenario or sorted(SCENARIOS):
+            build = SCENARIOS[name]
+            result = run_scenario(transport, build, args.requests, args.concurrency)
+            # queries can only be captured on the connection of this thread
+            result["queries"] = None if args.server else count_queries(transport, build)
+            results[name] = result
+            print(f"{name:<24} {result['requests_per_second']:>10} req/s  p50 {result['p50_ms']:>8} ms  "
+                  f"p99 {result['p99_ms']:>8} ms  queries/request {result['queries']}")
+
+        print(f"Slack API calls: {dict(fake_slack.calls)}")
+    finally:
+        fake_slack.stop()
+        os.unlink(db_file.name)
+
+    if args.save_baseline:
+        with open(args.save_baseline, "w") as f:
+            json.dump(results, f, indent=2, sort_keys=True)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
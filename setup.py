@@ -2,5 +2,6 @@ from setuptools import setup
 
 setup(
     version="1.0.40",
-    install_requires=["slackclient", "celery"]
+    install_requires=["Django>=3.2", "slackclient", "celery"],
+    extras_require={"socket-mode": ["slack_sdk"], "orjson": ["orjson"]},
 )
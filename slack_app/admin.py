@@ -1,5 +1,25 @@
 from django.contrib import admin
-from .models import SlackWorkspace, SlackUserMapping
+from .models import SlackWorkspace, SlackUserMapping, SlackWorkspaceUninstall
+
+
+@admin.register(SlackWorkspace)
+class SlackWorkspaceAdmin(admin.ModelAdmin):
+    actions = ['uninstall']
+
+    @admin.action(description="Uninstall selected workspaces in the background")
+    def uninstall(self, request, queryset):
+        # deleting a large workspace within the request would time out, see uninstall.py
+        for workspace in queryset:
+            workspace.uninstall()
+        # uninstalls already in progress aren't scheduled again, see schedule_uninstall
+        self.message_user(request, f"{len(queryset)} workspaces will be uninstalled shortly")
+
+
+@admin.register(SlackWorkspaceUninstall)
+class SlackWorkspaceUninstallAdmin(admin.ModelAdmin):
+    list_display = ['workspace_id', 'workspace_name', 'started', 'updated', 'slack_uninstalled_at',
+                    'user_mappings_deleted', 'webhooks_deleted', 'event_payloads_deleted', 'finished_at']
+    readonly_fields = list_display
+
 
-admin.site.register(SlackWorkspace)
 admin.site.register(SlackUserMapping)
@@ -9,4 +9,6 @@ class SlackAppConfig(AppConfig):
     def ready(self):
         super().ready()
 
+        from . import cache  # noqa: F401 connects the lookup cache invalidation receivers
+
         autodiscover_modules('slack')
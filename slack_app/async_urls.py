@@ -0,0 +1,16 @@
+from django.urls import path
+
+from .async_views import slack_interactivity, slack_command, slack_events
+from .views import slack_oauthcallback, slack_login_callback, connect_account, slack_metrics
+
+app_name = "slack_app"
+
+urlpatterns = [
+    path('install/', slack_oauthcallback, name='install'),
+    path('login/', slack_login_callback, name='login'),
+    path('interactivity/', slack_interactivity, name='interactivity'),
+    path('events/', slack_events, name='events'),
+    path('commands/<str:name>/', slack_command, name='command'),
+    path('connect/<str:nonce>/', connect_account, name='connect_account'),
+    path('metrics/', slack_metrics, name='metrics'),
+]
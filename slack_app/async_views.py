@@ -0,0 +1,175 @@
+"""
+Async counterparts of the Slack endpoints in views.py, to be served under ASGI (e.g. uvicorn).
+
+Include `slack_app.async_urls` instead of `slack_app.urls` to use them. Handlers registered with
+@slack_command/@slack_interactivity may be coroutines; they are awaited directly and should use
+`clients.get_async_client` for Slack API calls. Sync handlers keep working, they run in a thread pool
+(not one at a time on the single thread-sensitive thread), each managing its own DB connection.
+Requires Django 4.1+ (async ORM & cache API).
+"""
+import asyncio
+from typing import Tuple
+
+import django
+from asgiref.sync import sync_to_async
+from django.core.exceptions import ImproperlyConfigured
+from django.db import close_old_connections
+from django.http import HttpResponse, HttpResponseNotAllowed, JsonResponse
+
+if django.VERSION < (4, 1):
+    raise ImproperlyConfigured(
+        "slack_app.async_views (and async_urls) require Django 4.1+, use slack_app.urls with older versions"
+    )
+
+from . import metrics
+from .cache import aget_workspace, aget_or_create_user_mapping
+from .decorators import async_slack_verify_request
+from .interactivity import interactivity_index
+from .payloads import CommandPayload, EventPayload, HandlerPayload, parse_interactivity_payload
+from .deferred import defer_handler, COMMAND, INTERACTIVITY
+from .events import enqueue_slack_event
+from .exceptions import SlackAppNotInstalledProperlyException, SlackAccountNotLinkedException, \
+    SlackCommandDoesNotExist, SlackInteractivityTypeDoesNotExist, SlackEventRejected
+from .helpers import slack_interactivity_callbacks, slack_commands, run_handler
+from .models import SlackWorkspace, SlackUserMapping
+from .views import app_not_installed_response, account_not_linked_response
+
+
+def in_thread_pool(fn):
+    """
+    Runs the sync `fn` in the thread pool, so sync handlers of concurrent requests run in parallel.
+    The pool's threads aren't closed with the request, so the DB connection is handled the same way
+    as for a request.
+    """
+    def wrapper(*args, **kwargs):
+        close_old_connections()
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            close_old_connections()
+
+    return sync_to_async(wrapper, thread_sensitive=False)
+
+
+async def arun_handler(fn, request, payload, *args, kind='handler'):
+    if asyncio.iscoroutinefunction(fn):
+        if isinstance(payload, HandlerPayload):
+            payload.fill()  # see run_handler
+        with metrics.track_handler(kind, fn, count_queries=False):
+            return await fn(request, payload, *args)
+    return await in_thread_pool(run_handler)(fn, request, payload, *args, kind=kind)
+
+
+async def aget_slack_user_and_workspace(team_id, user_id) -> Tuple[SlackUserMapping, SlackWorkspace]:
+    with metrics.timer('slack_model_resolution_seconds'):
+        workspace = await aget_workspace(team_id)
+        if workspace is None:
+            raise SlackAppNotInstalledProperlyException("Application is not installed properly")
+
+        mapping, created = await aget_or_create_user_mapping(user_id, workspace)
+
+    if created or mapping.user_id is None:
+        raise SlackAccountNotLinkedException(mapping)
+
+    return mapping, workspace
+
+
+@async_slack_verify_request
+async def slack_interactivity(request):
+    if request.method != "POST":
+        return HttpResponseNotAllowed(["POST"])
+
+    payload = parse_interactivity_payload(request.POST.get('payload'))
+    payload_type = payload.type
+    name = interactivity_index.resolve(payload)
+    callback = slack_interactivity_callbacks.get(name, None) if name else None
+
+    if callback is None:
+        raise SlackInteractivityTypeDoesNotExist(
+            f"Interactivity type '{payload_type}' is not linked using @slack_interactivity decorator")
+
+    fn = callback.fn
+    if fn:
+        if callback.require_linked_account:
+            try:
+                mapping, workspace = await aget_slack_user_and_workspace(
+                    payload.get('team').get('id'),
+                    payload.get('user').get('id'),
+                )
+            except SlackAppNotInstalledProperlyException:
+                return app_not_installed_response()
+            except SlackAccountNotLinkedException as err:
+                return account_not_linked_response(request, err.slack_user_mapping)
+        else:
+            mapping = None
+            workspace = None
+        if callback.deferred:
+            return await in_thread_pool(defer_handler)(
+                INTERACTIVITY, name, request, payload, mapping, workspace
+            )
+
+        return await arun_handler(fn, request, payload, mapping, workspace, kind=INTERACTIVITY)
+
+    return HttpResponse(status=400)
+
+
+@async_slack_verify_request
+async def slack_command(request, name: str):
+    if request.method != "POST":
+        return HttpResponseNotAllowed(["POST"])
+
+    payload = CommandPayload(request.POST)
+    callback = slack_commands.get(name, None)
+
+    if callback is None:
+        raise SlackCommandDoesNotExist(f"Command '{name}' is not linked using @slack_command decorator")
+
+    fn = callback.fn
+    if fn:
+        if callback.require_linked_account:
+            try:
+                mapping, workspace = await aget_slack_user_and_workspace(
+                    payload.get('team_id'),
+                    payload.get('user_id')
+                )
+            except SlackAppNotInstalledProperlyException:
+                return app_not_installed_response()
+            except SlackAccountNotLinkedException as err:
+                return account_not_linked_response(request, err.slack_user_mapping)
+        else:
+            workspace = None
+            mapping = None
+
+        if callback.deferred:
+            return await in_thread_pool(defer_handler)(COMMAND, name, request, payload, mapping, workspace)
+
+        return await arun_handler(fn, request, payload, mapping, workspace, kind=COMMAND)
+
+    return HttpResponse(status=400)
+
+
+@async_slack_verify_request
+async def slack_events(request):
+    payload = EventPayload(request.body)
+
+    if payload.type == "url_verification":
+        return JsonResponse({
+            "challenge": payload.get("challenge"),
+        })
+
+    if payload.type == "event_callback":
+        # publishing to the broker is blocking I/O
+        try:
+            await in_thread_pool(enqueue_slack_event)(
+                request.get_host(),
+                payload.dict(),
+                retry_reason=request.META.get('HTTP_X_SLACK_RETRY_REASON'),
+            )
+        except SlackEventRejected:
+            return HttpResponse(status=503)
+        return JsonResponse({})
+
+    if payload.type == 'app_rate_limited':
+        return JsonResponse({})
+
+    return HttpResponse(status=400)
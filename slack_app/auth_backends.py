@@ -1,13 +1,57 @@
-import slack
 from django.conf import settings
 from django.contrib.auth import get_user_model
 from django.contrib.auth.backends import BaseBackend
-from django.db import transaction
+from django.db import transaction, IntegrityError
+from django.db.models import Q
 
+from .clients import get_client
+from .ratelimit import call_slack_api, PRIORITY_HIGH
 from .models import SlackUserMapping, SlackWorkspace
 
 User = get_user_model()
 
+USERNAME_ATTEMPTS = 10
+
+
+def get_next_username(base: str) -> str:
+    """
+    Returns `base` if it's free, `base-<n>` with `n` following the highest used suffix otherwise (a single query).
+    `base` is only shortened when the suffixed name wouldn't fit.
+    """
+    max_length = User._meta.get_field(User.USERNAME_FIELD).max_length
+    base = base[:max_length]
+    taken = User.objects.filter(
+        Q(**{User.USERNAME_FIELD: base}) | Q(**{f"{User.USERNAME_FIELD}__startswith": f"{base}-"})
+    ).values_list(User.USERNAME_FIELD, flat=True)
+
+    suffixes = set()
+    for username in taken:
+        if username == base:
+            suffixes.add(0)
+        elif username.startswith(f"{base}-") and username[len(base) + 1:].isdigit():
+            suffixes.add(int(username[len(base) + 1:]))
+
+    if 0 not in suffixes:
+        return base
+    username = f"{base}-{max(suffixes) + 1}"
+    if len(username) > max_length:
+        return get_next_username(base[:max_length - 8])  # room for the suffix
+    return username
+
+
+def create_user_with_unique_username(base: str):
+    """
+    Creates a user named after `base`. A concurrent login may take the same name between the lookup and the insert,
+    the insert is then retried with a fresh lookup within its own savepoint.
+    """
+    for attempt in range(USERNAME_ATTEMPTS):
+        try:
+            with transaction.atomic():
+                return User.objects.create(**{User.USERNAME_FIELD: get_next_username(base)})
+        except IntegrityError:
+            if attempt == USERNAME_ATTEMPTS - 1:
+                raise
+
 
 class SlackAuthenticationBackend(BaseBackend):
 
@@ -16,9 +60,13 @@ class SlackAuthenticationBackend(BaseBackend):
         if code is None:
             return None
 
-        client = slack.WebClient(token="")
+        client = get_client()
 
-        response = client.oauth_access(
+        response = call_slack_api(
+            None,
+            'oauth.access',
+            client.oauth_access,
+            priority=PRIORITY_HIGH,
             client_id=settings.SLACK_CLIENT_ID,
             client_secret=settings.SLACK_CLIENT_SECRET,
             code=code,
@@ -47,14 +95,7 @@ class SlackAuthenticationBackend(BaseBackend):
         )
 
         if slack_user.user is None:
-            username = data.get("user").get("name")
-            # TODO get an unique username in a more sophisticated way
-            n = 1
-            while User.objects.filter(username=username).exists():
-                username = f"{data.get('user').get('name')}-{n}"
-                n += 1
-
-            user = User.objects.create(username=username)
+            user = create_user_with_unique_username(data.get("user").get("name"))
 
             slack_user.user = user
             slack_user.save()
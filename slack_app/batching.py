@@ -0,0 +1,105 @@
+"""
+Opt-in micro-batching of Slack events.
+
+Instead of one Celery message per event, events are buffered per process and enqueued as a single
+`receive_slack_signal_batch_task` once SLACK_EVENT_BATCH_SIZE events are buffered or SLACK_EVENT_BATCH_LATENCY
+seconds passed since the first one. Slack has already been acknowledged at that point, so events
+buffered by a process that gets killed are lost; keep the latency low. The buffer is flushed when the process exits.
+A batch that can't be enqueued is logged and its events are forgotten by the deduplication, see idempotency.py.
+"""
+import atexit
+import logging
+import threading
+from typing import Callable, List, Optional
+
+from . import metrics
+from .idempotency import forget_event
+from .settings import SLACK_EVENT_BATCHING_ENABLED, SLACK_EVENT_BATCH_TYPES, SLACK_EVENT_BATCH_SIZE, \
+    SLACK_EVENT_BATCH_LATENCY
+
+logger = logging.getLogger(__name__)
+
+
+class EventBatcher:
+
+    def __init__(self, flush_func: Callable[[List[dict]], None], max_size: int, max_latency: float):
+        self.flush_func = flush_func
+        self.max_size = max_size
+        self.max_latency = max_latency
+        self._events = []
+        self._timer = None
+        self._lock = threading.Lock()
+
+    def add(self, event: dict):
+        with self._lock:
+            self._events.append(event)
+            if len(self._events) >= self.max_size:
+                events = self._take()
+            else:
+                events = None
+                if self._timer is None:
+                    self._timer = threading.Timer(self.max_latency, self.flush)
+                    self._timer.daemon = True
+                    self._timer.start()
+
+        if events:
+            self._send(events)
+
+    def _take(self) -> List[dict]:
+        events, self._events = self._events, []
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        return events
+
+    def _send(self, events: List[dict]):
+        try:
+            self.flush_func(events)
+        except Exception:
+            metrics.incr('slack_event_batches_failed')
+            metrics.incr('slack_events_lost', len(events))
+            # Slack won't retry acknowledged events, but a later delivery of them shouldn't be dropped
+            for event in events:
+                forget_event(event.get('event_id'))
+            raise
+
+        metrics.incr('slack_event_batches_enqueued')
+        metrics.observe('slack_event_batch_size', len(events), buckets=metrics.SIZE_BUCKETS)
+
+    def flush(self):
+        """
+        Enqueues the buffered events, called by the timer & at exit, where nobody would see an exception
+        """
+        with self._lock:
+            events = self._take()
+
+        if events:
+            try:
+                self._send(events)
+            except Exception:
+                logger.exception("Unable to enqueue a batch of %s Slack events", len(events))
+
+
+_batcher = None
+_batcher_lock = threading.Lock()
+
+
+def _enqueue_batch(events: List[dict]):
+    from .tasks import receive_slack_signal_batch_task
+    receive_slack_signal_batch_task.delay(events=events)
+
+
+def get_event_batcher() -> EventBatcher:
+    # created lazily, so every (forked) worker process gets its own buffer & timer
+    global _batcher
+    with _batcher_lock:
+        if _batcher is None:
+            _batcher = EventBatcher(_enqueue_batch, SLACK_EVENT_BATCH_SIZE, SLACK_EVENT_BATCH_LATENCY)
+            atexit.register(_batcher.flush)
+        return _batcher
+
+
+def should_batch(event_type: Optional[str]) -> bool:
+    if not SLACK_EVENT_BATCHING_ENABLED:
+        return False
+    return SLACK_EVENT_BATCH_TYPES is None or event_type in SLACK_EVENT_BATCH_TYPES
@@ -0,0 +1,144 @@
+"""
+Direct message broadcast to many linked Slack users across workspaces.
+
+Recipients are grouped by workspace, workspaces are processed concurrently and messages within a workspace are
+sent by a few threads through the outbound scheduler (low priority, so interactive calls go first and 429s are
+honoured, see ratelimit.py). Each DM channel has its own chat.postMessage bucket and all messages of a workspace
+count against its workspace-wide budget, so a 429's Retry-After pauses the whole workspace. Messages are posted
+with the user id as the channel, so Slack delivers them into the app's DM with the user (opening it if needed)
+without a `conversations.open` call per recipient.
+
+Progress is checkpointed per workspace after every batch. Running a broadcast with the same key again resumes it,
+messages of a batch interrupted by a crash may be sent twice.
+"""
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional
+
+from django.db import close_old_connections
+from django.db.models import QuerySet
+from django.utils import timezone
+from slack.errors import SlackApiError
+
+from . import metrics
+from .clients import get_client
+from .models import SlackBroadcast, SlackBroadcastProgress, SlackUserMapping, SlackWorkspace
+from .ratelimit import call_slack_api, PRIORITY_LOW
+from .settings import SLACK_BROADCAST_CONCURRENCY, SLACK_BROADCAST_WORKSPACE_CONCURRENCY, SLACK_BROADCAST_BATCH_SIZE
+
+logger = logging.getLogger(__name__)
+
+
+def send_direct_message(workspace: SlackWorkspace, slack_user_id: str, message: dict) -> bool:
+    client = get_client(workspace.bot_access_token)
+    try:
+        call_slack_api(
+            workspace.id, 'chat.postMessage', client.chat_postMessage,
+            priority=PRIORITY_LOW, scope=slack_user_id, channel=slack_user_id, **message
+        )
+        return True
+    except SlackApiError:
+        logger.warning("Unable to send broadcast message to %s", slack_user_id, exc_info=True)
+        return False
+
+
+def broadcast_to_workspace(broadcast: SlackBroadcast, workspace: SlackWorkspace, recipients: QuerySet,
+                           concurrency: int, batch_size: int) -> SlackBroadcastProgress:
+    progress, created = SlackBroadcastProgress.objects.get_or_create(broadcast=broadcast, workspace=workspace)
+    if progress.finished:
+        return progress
+
+    recipients = recipients.filter(slack_workspace=workspace).order_by('slack_user_id')
+    if progress.last_slack_user_id:
+        recipients = recipients.filter(slack_user_id__gt=progress.last_slack_user_id)
+
+    slack_user_ids = list(recipients.values_list('slack_user_id', flat=True)[:batch_size])
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        while slack_user_ids:
+            sent = list(executor.map(
+                lambda slack_user_id: send_direct_message(workspace, slack_user_id, broadcast.message), slack_user_ids
+            ))
+
+            progress.last_slack_user_id = slack_user_ids[-1]
+            progress.sent += sum(sent)
+            progress.failed += len(sent) - sum(sent)
+            progress.save(update_fields=['last_slack_user_id', 'sent', 'failed'])
+            metrics.incr('slack_broadcast_messages', sum(sent), result='sent')
+            metrics.incr('slack_broadcast_messages', len(sent) - sum(sent), result='failed')
+
+            slack_user_ids = list(
+                recipients.filter(slack_user_id__gt=progress.last_slack_user_id)
+                .values_list('slack_user_id', flat=True)[:batch_size]
+            )
+
+    progress.finished = True
+    progress.save(update_fields=['finished'])
+    return progress
+
+
+def _broadcast_to_workspace(*args) -> Optional[SlackBroadcastProgress]:
+    try:
+        return broadcast_to_workspace(*args)
+    except Exception:
+        logger.exception("Broadcast to workspace %s failed, run it again to resume", args[1].pk)
+        return None
+    finally:
+        close_old_connections()
+
+
+def send_broadcast(key: str, message: dict, recipients: Optional[QuerySet] = None, concurrency: Optional[int] = None,
+                   workspace_concurrency: Optional[int] = None, batch_size: Optional[int] = None) -> dict:
+    """
+    Sends `message` (chat.postMessage arguments, e.g. `text` & `blocks`) to every recipient as a direct message
+
+    :param key: identifies the broadcast, running it again with the same key resumes it
+    :param recipients: SlackUserMapping queryset, all linked users of installed workspaces by default
+    :param concurrency: number of workspaces processed at once
+    :param workspace_concurrency: number of messages in flight within a workspace
+    :return: sent & failed messages of this run, elapsed seconds and messages per second
+    """
+    concurrency = concurrency or SLACK_BROADCAST_CONCURRENCY
+    workspace_concurrency = workspace_concurrency or SLACK_BROADCAST_WORKSPACE_CONCURRENCY
+    batch_size = batch_size or SLACK_BROADCAST_BATCH_SIZE
+
+    if recipients is None:
+        recipients = SlackUserMapping.objects.filter(user__isnull=False)
+    recipients = recipients.filter(slack_workspace__isnull=False)
+
+    broadcast, created = SlackBroadcast.objects.get_or_create(key=key, defaults={'message': message})
+    already_done = {
+        progress.workspace_id: (progress.sent, progress.failed) for progress in broadcast.progress.all()
+    }
+    workspaces = SlackWorkspace.objects.filter(pk__in=recipients.values('slack_workspace')) \
+        .only('pk', 'bot_access_token')
+
+    started = time.monotonic()
+    with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix='slack-broadcast') as executor:
+        results = list(executor.map(
+            lambda workspace: _broadcast_to_workspace(broadcast, workspace, recipients, workspace_concurrency,
+                                                      batch_size),
+            workspaces,
+        ))
+    elapsed = time.monotonic() - started
+
+    sent = failed = 0
+    for progress in results:
+        if progress is not None:
+            previous_sent, previous_failed = already_done.get(progress.workspace_id, (0, 0))
+            sent += progress.sent - previous_sent
+            failed += progress.failed - previous_failed
+
+    if all(progress is not None and progress.finished for progress in results):
+        broadcast.finished_at = timezone.now()
+        broadcast.save(update_fields=['finished_at'])
+
+    report = {
+        'sent': sent,
+        'failed': failed,
+        'seconds': round(elapsed, 3),
+        'messages_per_second': round((sent + failed) / elapsed, 1) if elapsed else 0,
+        'finished': broadcast.finished_at is not None,
+    }
+    logger.info("Broadcast %s: %s", key, report)
+    return report
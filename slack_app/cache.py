@@ -0,0 +1,260 @@
+"""
+Two-tier cache for the lookups done on every slash command and interactivity payload.
+
+The first tier is a small in-process LRU with a short TTL, the second one is Django's cache framework.
+The in-process tier hands out copies, so instances aren't shared by concurrent requests.
+
+Entries are invalidated on post_save/post_delete of SlackWorkspace and SlackUserMapping. Bulk writes
+(`bulk_update`, `QuerySet.update`) don't send these signals, call `invalidate_workspaces` &
+`invalidate_user_mappings` after them. Since the in-process tier of other processes can't be invalidated,
+keep SLACK_LOOKUP_CACHE_LOCAL_TIMEOUT short, it's the window in which they may see stale entries.
+"""
+import copy
+import threading
+import time
+from collections import OrderedDict
+from typing import Iterable, Optional, Tuple
+
+from django.core.cache import caches
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from . import metrics
+from .models import SlackWorkspace, SlackUserMapping
+from .settings import SLACK_LOOKUP_CACHE_ENABLED, SLACK_LOOKUP_CACHE_ALIAS, SLACK_LOOKUP_CACHE_TIMEOUT, \
+    SLACK_LOOKUP_CACHE_LOCAL_TIMEOUT, SLACK_LOOKUP_CACHE_LOCAL_SIZE
+
+_MISSING = object()
+
+
+class LocalTTLCache:
+    """
+    Thread-safe LRU cache with a per-entry time to live.
+    """
+
+    def __init__(self, maxsize: int, timeout: float):
+        self.maxsize = maxsize
+        self.timeout = timeout
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self._lock:
+            entry = self._data.get(key, _MISSING)
+            if entry is _MISSING:
+                return default
+
+            expires, value = entry
+            if expires < time.monotonic():
+                del self._data[key]
+                return default
+
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._data[key] = (time.monotonic() + self.timeout, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+
+class LookupCache:
+    """
+    In-process LRU/TTL tier backed by a Django cache alias.
+    """
+
+    def __init__(self, alias: Optional[str], timeout: int, local_timeout: float, local_size: int):
+        self.alias = alias
+        self.timeout = timeout
+        self.local = LocalTTLCache(local_size, local_timeout)
+
+    @property
+    def shared(self):
+        return caches[self.alias] if self.alias else None
+
+    def get(self, key):
+        value = self.local.get(key)
+        if value is not None:
+            metrics.incr('slack_lookup_cache_hits', tier='local')
+            return copy.copy(value)
+
+        if self.shared is not None:
+            value = self.shared.get(key)
+            if value is not None:
+                metrics.incr('slack_lookup_cache_hits', tier='shared')
+                self.local.set(key, copy.copy(value))
+                return value
+
+        metrics.incr('slack_lookup_cache_misses')
+        return None
+
+    async def aget(self, key):
+        value = self.local.get(key)
+        if value is not None:
+            metrics.incr('slack_lookup_cache_hits', tier='local')
+            return copy.copy(value)
+
+        if self.shared is not None:
+            value = await self.shared.aget(key)
+            if value is not None:
+                metrics.incr('slack_lookup_cache_hits', tier='shared')
+                self.local.set(key, copy.copy(value))
+                return value
+
+        metrics.incr('slack_lookup_cache_misses')
+        return None
+
+    def set(self, key, value):
+        self.local.set(key, copy.copy(value))
+        if self.shared is not None:
+            self.shared.set(key, value, self.timeout)
+
+    async def aset(self, key, value):
+        self.local.set(key, copy.copy(value))
+        if self.shared is not None:
+            await self.shared.aset(key, value, self.timeout)
+
+    def delete(self, key):
+        self.local.delete(key)
+        if self.shared is not None:
+            self.shared.delete(key)
+
+    def delete_many(self, keys):
+        for key in keys:
+            self.local.delete(key)
+        if self.shared is not None:
+            self.shared.delete_many(keys)
+
+
+lookup_cache = LookupCache(
+    SLACK_LOOKUP_CACHE_ALIAS,
+    SLACK_LOOKUP_CACHE_TIMEOUT,
+    SLACK_LOOKUP_CACHE_LOCAL_TIMEOUT,
+    SLACK_LOOKUP_CACHE_LOCAL_SIZE,
+)
+
+
+def workspace_key(team_id) -> str:
+    return f"slack_app:lookup:workspace:{team_id}"
+
+
+def user_mapping_key(user_id) -> str:
+    return f"slack_app:lookup:user_mapping:{user_id}"
+
+
+def get_workspace(team_id) -> Optional[SlackWorkspace]:
+    """
+    Returns the workspace for a given Slack team id, or None if the app isn't installed there.
+    """
+    if SLACK_LOOKUP_CACHE_ENABLED:
+        workspace = lookup_cache.get(workspace_key(team_id))
+        if workspace is not None:
+            return workspace
+
+    try:
+        workspace = SlackWorkspace.objects.get(id=team_id)
+    except SlackWorkspace.DoesNotExist:
+        return None
+
+    if SLACK_LOOKUP_CACHE_ENABLED:
+        lookup_cache.set(workspace_key(team_id), workspace)
+
+    return workspace
+
+
+def get_or_create_user_mapping(user_id, workspace: SlackWorkspace) -> Tuple[SlackUserMapping, bool]:
+    """
+    Returns a (mapping, created) tuple. Only mappings linked to a User are cached, so already linked users
+    don't hit the DB at all, while unlinked ones always see the current state of the nonce & link.
+    """
+    if SLACK_LOOKUP_CACHE_ENABLED:
+        mapping = lookup_cache.get(user_mapping_key(user_id))
+        if mapping is not None and mapping.slack_workspace_id == workspace.id:
+            mapping.slack_workspace = workspace
+            return mapping, False
+
+    mapping, created = SlackUserMapping.objects.get_or_create(slack_user_id=user_id, slack_workspace=workspace)
+
+    if SLACK_LOOKUP_CACHE_ENABLED and mapping.user_id is not None:
+        lookup_cache.set(user_mapping_key(user_id), mapping)
+
+    return mapping, created
+
+
+async def aget_workspace(team_id) -> Optional[SlackWorkspace]:
+    if SLACK_LOOKUP_CACHE_ENABLED:
+        workspace = await lookup_cache.aget(workspace_key(team_id))
+        if workspace is not None:
+            return workspace
+
+    try:
+        workspace = await SlackWorkspace.objects.aget(id=team_id)
+    except SlackWorkspace.DoesNotExist:
+        return None
+
+    if SLACK_LOOKUP_CACHE_ENABLED:
+        await lookup_cache.aset(workspace_key(team_id), workspace)
+
+    return workspace
+
+
+async def aget_or_create_user_mapping(user_id, workspace: SlackWorkspace) -> Tuple[SlackUserMapping, bool]:
+    if SLACK_LOOKUP_CACHE_ENABLED:
+        mapping = await lookup_cache.aget(user_mapping_key(user_id))
+        if mapping is not None and mapping.slack_workspace_id == workspace.id:
+            mapping.slack_workspace = workspace
+            return mapping, False
+
+    mapping, created = await SlackUserMapping.objects.aget_or_create(slack_user_id=user_id, slack_workspace=workspace)
+
+    if SLACK_LOOKUP_CACHE_ENABLED and mapping.user_id is not None:
+        await lookup_cache.aset(user_mapping_key(user_id), mapping)
+
+    return mapping, created
+
+
+def get_user_mapping(user_id) -> Optional[SlackUserMapping]:
+    """
+    Returns the mapping for a given Slack user id regardless of its workspace, or None if it doesn't exist.
+    """
+    if SLACK_LOOKUP_CACHE_ENABLED:
+        mapping = lookup_cache.get(user_mapping_key(user_id))
+        if mapping is not None:
+            return mapping
+
+    mapping = SlackUserMapping.objects.filter(pk=user_id).first()
+
+    if SLACK_LOOKUP_CACHE_ENABLED and mapping is not None and mapping.user_id is not None:
+        lookup_cache.set(user_mapping_key(user_id), mapping)
+
+    return mapping
+
+
+def invalidate_workspaces(team_ids: Iterable[str]):
+    lookup_cache.delete_many([workspace_key(team_id) for team_id in team_ids])
+
+
+def invalidate_user_mappings(user_ids: Iterable[str]):
+    lookup_cache.delete_many([user_mapping_key(user_id) for user_id in user_ids])
+
+
+@receiver(post_save, sender=SlackWorkspace)
+@receiver(post_delete, sender=SlackWorkspace)
+def invalidate_workspace(instance, **kwargs):
+    lookup_cache.delete(workspace_key(instance.pk))
+
+
+@receiver(post_save, sender=SlackUserMapping)
+@receiver(post_delete, sender=SlackUserMapping)
+def invalidate_user_mapping(instance, **kwargs):
+    lookup_cache.delete(user_mapping_key(instance.pk))
@@ -0,0 +1,234 @@
+"""
+Opt-in claim-check for large Slack events (SLACK_CLAIM_CHECK_ENABLED).
+
+Event data larger than SLACK_CLAIM_CHECK_THRESHOLD bytes (e.g. messages with blocks, files & attachments) is written
+once to a store and only a reference to it travels through the broker. The task is published once the payload is
+visible to workers, i.e. after the transaction of the request commits for the database store (`ATOMIC_REQUESTS`).
+The worker reads the payload back before sending the signal, receivers get a plain dict.
+
+Stored payloads expire after SLACK_CLAIM_CHECK_TTL seconds, the same TTL covers task retries.
+Schedule `cleanup_slack_claim_checks_task` (e.g. hourly with Celery beat) for the database & filesystem stores.
+"""
+import datetime
+import json
+import logging
+import os
+import tempfile
+import time
+import uuid
+from typing import Optional
+
+from django.core.cache import caches
+from django.db import router, transaction
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from . import metrics
+from .payloads import loads
+from .settings import SLACK_CLAIM_CHECK_ENABLED, SLACK_CLAIM_CHECK_THRESHOLD, SLACK_CLAIM_CHECK_STORE, \
+    SLACK_CLAIM_CHECK_TTL, SLACK_CLAIM_CHECK_CACHE_ALIAS, SLACK_CLAIM_CHECK_DIRECTORY
+
+logger = logging.getLogger(__name__)
+
+CLAIM_KEY = 'slack_claim_check'
+
+
+class ClaimCheckStore:
+    """
+    Base class of payload stores
+    """
+
+    def put(self, key: str, data: bytes, ttl: int, team_id: Optional[str] = None):
+        """
+        :param team_id: workspace of the event, its payloads may be deleted when it's uninstalled
+        """
+        raise NotImplementedError
+
+    def get(self, key: str) -> Optional[bytes]:
+        raise NotImplementedError
+
+    def delete(self, key: str):
+        raise NotImplementedError
+
+    def on_commit(self, fn):
+        """
+        Calls `fn` once payloads put so far can be read by other processes
+        """
+        fn()
+
+    def cleanup(self) -> int:
+        """
+        Removes expired payloads, returns their number
+        """
+        return 0
+
+
+class DatabaseStore(ClaimCheckStore):
+
+    def put(self, key, data, ttl, team_id=None):
+        from .models import SlackEventPayload
+        SlackEventPayload.objects.create(
+            key=key, data=data, expires_at=timezone.now() + datetime.timedelta(seconds=ttl), team_id=team_id
+        )
+
+    def get(self, key):
+        from .models import SlackEventPayload
+        data = SlackEventPayload.objects.filter(key=key, expires_at__gt=timezone.now()) \
+            .values_list('data', flat=True).first()
+        return bytes(data) if data is not None else None
+
+    def delete(self, key):
+        from .models import SlackEventPayload
+        SlackEventPayload.objects.filter(key=key).delete()
+
+    def on_commit(self, fn):
+        from .models import SlackEventPayload
+        # the payload is written in the transaction of the request, if any
+        transaction.on_commit(fn, using=router.db_for_write(SlackEventPayload))
+
+    def cleanup(self):
+        from .models import SlackEventPayload
+        deleted, _ = SlackEventPayload.objects.filter(expires_at__lte=timezone.now()).delete()
+        return deleted
+
+
+class CacheStore(ClaimCheckStore):
+    """
+    Expiration is left to the cache. The cache must be shared by web & worker processes.
+    """
+
+    def __init__(self, cache_alias: str = None):
+        self.cache_alias = cache_alias or SLACK_CLAIM_CHECK_CACHE_ALIAS
+
+    @property
+    def cache(self):
+        return caches[self.cache_alias]
+
+    def put(self, key, data, ttl, team_id=None):
+        self.cache.set(f"slack_app:claim:{key}", data, ttl)
+
+    def get(self, key):
+        return self.cache.get(f"slack_app:claim:{key}")
+
+    def delete(self, key):
+        self.cache.delete(f"slack_app:claim:{key}")
+
+
+class FileSystemStore(ClaimCheckStore):
+    """
+    The directory must be shared by web & worker processes. The file's modification time marks its expiration.
+    """
+
+    def __init__(self, directory: str = None):
+        self.directory = directory or SLACK_CLAIM_CHECK_DIRECTORY or os.path.join(tempfile.gettempdir(), 'slack_app')
+        os.makedirs(self.directory, exist_ok=True)
+
+    def get_path(self, key: str) -> str:
+        return os.path.join(self.directory, f"{key}.json")
+
+    def put(self, key, data, ttl, team_id=None):
+        path = self.get_path(key)
+        with open(f"{path}.tmp", 'wb') as f:
+            f.write(data)
+        expires_at = time.time() + ttl
+        os.utime(f"{path}.tmp", (expires_at, expires_at))
+        # readers never see a partially written file
+        os.replace(f"{path}.tmp", path)
+
+    def get(self, key):
+        path = self.get_path(key)
+        try:
+            if os.path.getmtime(path) <= time.time():
+                return None
+            with open(path, 'rb') as f:
+                return f.read()
+        except FileNotFoundError:
+            return None
+
+    def delete(self, key):
+        try:
+            os.remove(self.get_path(key))
+        except FileNotFoundError:
+            pass
+
+    def cleanup(self):
+        now = time.time()
+        removed = 0
+        with os.scandir(self.directory) as entries:
+            for entry in entries:
+                try:
+                    if entry.name.endswith('.json') and entry.stat().st_mtime <= now:
+                        os.remove(entry.path)
+                        removed += 1
+                except FileNotFoundError:
+                    pass
+        return removed
+
+
+_store = None
+
+
+def get_store() -> ClaimCheckStore:
+    global _store
+    if _store is None:
+        store = SLACK_CLAIM_CHECK_STORE
+        _store = import_string(store)() if isinstance(store, str) else store
+    return _store
+
+
+def is_claim(event_data) -> bool:
+    return isinstance(event_data, dict) and CLAIM_KEY in event_data and len(event_data) == 1
+
+
+def check_in(event_data: dict, team_id: Optional[str] = None) -> dict:
+    """
+    Returns a reference to the stored event data if it's large enough, the event data itself otherwise
+    """
+    if not SLACK_CLAIM_CHECK_ENABLED:
+        return event_data
+
+    data = json.dumps(event_data, separators=(',', ':')).encode('utf-8')
+    if len(data) < SLACK_CLAIM_CHECK_THRESHOLD:
+        return event_data
+
+    key = uuid.uuid4().hex
+    try:
+        get_store().put(key, data, SLACK_CLAIM_CHECK_TTL, team_id=team_id)
+    except Exception:
+        # rather pass the whole event through the broker than lose it
+        logger.warning("Unable to store Slack event payload, sending it inline", exc_info=True)
+        return event_data
+
+    metrics.incr('slack_claim_checks')
+    metrics.observe('slack_claim_check_bytes', len(data), buckets=(1024 * 16, 1024 * 64, 1024 * 256, 1024 * 1024))
+    return {CLAIM_KEY: key}
+
+
+def on_checked_in(event_data, fn):
+    """
+    Calls `fn`, publishing the event, once the event data returned by `check_in` can be checked out by workers
+    """
+    if is_claim(event_data):
+        get_store().on_commit(fn)
+    else:
+        fn()
+
+
+def check_out(event_data) -> dict:
+    """
+    Counterpart of `check_in` used by the worker, returns the stored event data as a plain dict
+    """
+    if not is_claim(event_data):
+        return event_data
+
+    key = event_data[CLAIM_KEY]
+    with metrics.timer('slack_claim_check_fetch_seconds'):
+        stored = get_store().get(key)
+    if stored is None:
+        metrics.incr('slack_claim_check_missing')
+        raise LookupError(f"Claimed Slack event payload {key} has expired or was removed")
+    return loads(stored)
+
+
+def cleanup() -> int:
+    return get_store().cleanup()
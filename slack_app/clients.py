@@ -0,0 +1,131 @@
+"""
+Registry of long-lived Slack WebClients keyed by token.
+
+All of the package's outbound calls go through `get_client`. Clients send their requests over keep-alive
+connections pooled per host and shared by all clients (`api_http_client`), so calls don't pay for a TCP & TLS
+handshake each. The registry is a bounded LRU; clients are evicted explicitly once their token stops being valid
+(the workspace is re-installed or deleted).
+
+Sync clients are shared by threads: slackclient builds the request state of every call from scratch and only reads
+the client's attributes, don't change them on a shared client.
+"""
+import json
+import threading
+from collections import OrderedDict
+from urllib.parse import urlencode
+
+import slack
+
+from .settings import SLACK_CLIENT_REGISTRY_SIZE, SLACK_API_TIMEOUT, SLACK_API_BASE_URL, SLACK_API_MAX_CONNECTIONS
+from .transport import PooledHttpClient
+
+
+try:
+    from slack_sdk.web.async_client import AsyncWebClient
+
+    # opens an aiohttp session per call, so a client isn't bound to an event loop
+    ASYNC_CLIENTS_SHARED = True
+except ImportError:
+    # slackclient 2.x provides the asyncio flavour through the same class, such a client sticks to the event loop
+    # of its first call, so every caller gets its own
+    def AsyncWebClient(**kwargs):
+        return slack.WebClient(run_async=True, **kwargs)
+
+    ASYNC_CLIENTS_SHARED = False
+
+api_http_client = PooledHttpClient(SLACK_API_TIMEOUT, SLACK_API_MAX_CONNECTIONS)
+
+
+class PooledWebClient(slack.WebClient):
+    """
+    WebClient sending its requests through `api_http_client` instead of opening a connection per call
+    """
+
+    def _perform_urllib_http_request(self, *, url, args):
+        if args['data'] or self.proxy is not None or self.ssl is not None or not url.lower().startswith('http'):
+            # file uploads, proxies & custom SSL contexts are left to urllib
+            return super()._perform_urllib_http_request(url=url, args=args)
+
+        headers = dict(args['headers'])
+        if args['json']:
+            body = json.dumps(args['json']).encode('utf-8')
+            headers['Content-Type'] = 'application/json;charset=utf-8'
+        elif args['params']:
+            body = urlencode(args['params']).encode('utf-8')
+            headers['Content-Type'] = 'application/x-www-form-urlencoded'
+        else:
+            body = None
+
+        response = api_http_client.request('POST', url, body=body, headers=headers)
+        return {'status': response.status, 'headers': response.headers, 'body': response.body.decode('utf-8')}
+
+
+class SlackClientRegistry:
+
+    def __init__(self, maxsize: int, client_class=PooledWebClient, **client_kwargs):
+        self.maxsize = maxsize
+        self.client_class = client_class
+        self.client_kwargs = client_kwargs
+        self._clients = OrderedDict()
+        self._lock = threading.Lock()
+
+    def create_client(self, token: str):
+        return self.client_class(token=token, **self.client_kwargs)
+
+    def get(self, token: str):
+        with self._lock:
+            client = self._clients.get(token)
+            if client is not None:
+                self._clients.move_to_end(token)
+                return client
+
+            client = self._clients[token] = self.create_client(token)
+            while len(self._clients) > self.maxsize:
+                self._clients.popitem(last=False)
+
+            return client
+
+    def evict(self, token: str):
+        with self._lock:
+            self._clients.pop(token, None)
+
+    def clear(self):
+        with self._lock:
+            self._clients.clear()
+
+    def __len__(self):
+        return len(self._clients)
+
+
+def _client_kwargs() -> dict:
+    kwargs = {"timeout": SLACK_API_TIMEOUT}
+    if SLACK_API_BASE_URL:
+        kwargs["base_url"] = SLACK_API_BASE_URL
+    return kwargs
+
+
+client_registry = SlackClientRegistry(SLACK_CLIENT_REGISTRY_SIZE, **_client_kwargs())
+async_client_registry = SlackClientRegistry(SLACK_CLIENT_REGISTRY_SIZE, client_class=AsyncWebClient, **_client_kwargs())
+
+
+def get_client(token: str = "") -> slack.WebClient:
+    """
+    Returns a shared WebClient for a bot/user token. An empty token is used for OAuth calls.
+    """
+    return client_registry.get(token or "")
+
+
+def get_async_client(token: str = ""):
+    """
+    Returns an AsyncWebClient for a bot/user token, to be used by coroutine handlers.
+    It's shared when slack_sdk is installed.
+    """
+    if not ASYNC_CLIENTS_SHARED:
+        return async_client_registry.create_client(token or "")
+    return async_client_registry.get(token or "")
+
+
+def evict_client(token: str):
+    if token:
+        client_registry.evict(token)
+        async_client_registry.evict(token)
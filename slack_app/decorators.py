@@ -1,41 +1,84 @@
 from functools import wraps
 
-import slack
+from asgiref.sync import sync_to_async
 from django.core.exceptions import ImproperlyConfigured
 from django.http import HttpResponseBadRequest
 
-from .signals import slack_event_received, refresh_home
-from .models import SlackUserMapping, SlackWorkspace
+from . import metrics
+from .home import publish_app_home, coalesce_app_home
+from .ratelimit import PRIORITY_HIGH, PRIORITY_NORMAL
+from .signals import refresh_home
+from .router import event_router
+from .signature import get_signature_verifier
 
-from .helpers import is_verified_slack_request, slack_interactivity_callbacks, slack_commands
+from .interactivity import interactivity_index, get_routing_field
+from .helpers import is_verified_slack_request, slack_interactivity_callbacks, slack_commands, SlackHandler
 
 
-def slack_command(name, require_linked_account=True):
+def slack_command(name, require_linked_account=True, deferred=False, ack=None):
+    """
+    :param deferred: acknowledge the command immediately, run the handler on a worker and post
+                     its response to the command's `response_url`, see deferred.py
+    :param ack: response (dict or HttpResponse) sent right away to Slack for deferred commands
+    """
     def _decorator(handler_func):
         if slack_commands.get(name, None):
             raise ImproperlyConfigured(f"You are trying to connect one slash command to multiple functions.")
-        slack_commands[name] = (handler_func, require_linked_account)
+        slack_commands[name] = SlackHandler(handler_func, require_linked_account, deferred, ack)
         return handler_func
 
     return _decorator
 
 
-def slack_interactivity(interactivity_type, require_linked_account=True):
+def slack_interactivity(interactivity_type, require_linked_account=True, deferred=False, ack=None,
+                        action_id=None, block_id=None, callback_id=None, prefix=False):
+    """
+    :param deferred: acknowledge the payload immediately, run the handler on a worker and post
+                     its response to the payload's `response_url` (if any), see deferred.py
+    :param ack: response (dict or HttpResponse) sent right away to Slack for deferred payloads
+    :param action_id: handle only payloads of this `action_id` (of the first action), a string or compiled regex,
+                      the same goes for `block_id` & `callback_id`. Handlers without them get the rest of the type.
+    :param prefix: the string given as `action_id`/`block_id`/`callback_id` is a prefix
+    """
+    try:
+        field, value = get_routing_field(action_id, block_id, callback_id)
+    except ValueError as err:
+        raise ImproperlyConfigured(str(err))
+
     def _decorator(handler_func):
-        if slack_interactivity_callbacks.get(interactivity_type, None):
-            raise ImproperlyConfigured(f"You are trying to connect '{interactivity_type}' in multiple functions.")
-        slack_interactivity_callbacks[interactivity_type] = (handler_func, require_linked_account)
+        name = interactivity_index.get_name(interactivity_type, field, value, prefix)
+        if slack_interactivity_callbacks.get(name, None):
+            raise ImproperlyConfigured(f"You are trying to connect '{name}' in multiple functions.")
+        slack_interactivity_callbacks[name] = SlackHandler(handler_func, require_linked_account, deferred, ack)
+        interactivity_index.add(interactivity_type, field, value, prefix)
         return handler_func
 
     return _decorator
 
 
+def verify_request(request) -> bool:
+    with metrics.timer('slack_signature_verification_seconds'):
+        verified = is_verified_slack_request(request)
+    if not verified:
+        metrics.incr('slack_signature_verification_failures')
+    return verified
+
+
+async def averify_request(request) -> bool:
+    if get_signature_verifier().replay_store is None:
+        # HMAC only, not worth a thread
+        return verify_request(request)
+    # the replay check is a blocking cache call
+    return await sync_to_async(verify_request, thread_sensitive=False)(request)
+
+
 def slack_verify_request(view_func):
     def wrapped_view(request, *args, **kwargs):
-        if is_verified_slack_request(request):
-            return view_func(request, *args, **kwargs)
-        else:
-            return HttpResponseBadRequest("Slack signature verification failed")
+        with metrics.timer('slack_request_duration_seconds', view=view_func.__name__):
+            if verify_request(request):
+                return view_func(request, *args, **kwargs)
+            else:
+                return HttpResponseBadRequest("Slack signature verification failed")
 
     # we verify that the request is coming from Slack, csrf is irrelevant, but most importantly not provided at all
     view_func.csrf_exempt = True
@@ -43,28 +86,34 @@ def slack_verify_request(view_func):
     return wraps(view_func)(wrapped_view)
 
 
-def on_slack_signal(*event_types, inject_slack_models=False):
+def async_slack_verify_request(view_func):
+    """
+    `slack_verify_request` for async views, see async_views.py
+    """
+    async def wrapped_view(request, *args, **kwargs):
+        with metrics.timer('slack_request_duration_seconds', view=view_func.__name__):
+            if await averify_request(request):
+                return await view_func(request, *args, **kwargs)
+            else:
+                return HttpResponseBadRequest("Slack signature verification failed")
+
+    view_func.csrf_exempt = True
+
+    return wraps(view_func)(wrapped_view)
+
+
+def on_slack_signal(*event_types, inject_slack_models=False, batch=False):
+    """
+    Registers a receiver for the given Slack event types. Receivers get a shared `slack_context`
+    (see `router.SlackEventContext`) and, if `inject_slack_models` is set, `slack_user_mapping`
+    and `slack_workspace` resolved once per event.
+
+    With `batch=True` the receiver is called as `receiver(sender, event_type, events)` with a list
+    of SlackEventContext instead, a whole batch at once when event batching is enabled.
+    """
     def decorator_receiver(receiver_func):
-        @wraps(receiver_func)
-        def signal_receiver(sender, event_type, event_data, signal, **kwargs):
-            if event_type in event_types:
-                try:
-                    slack_user_mapping = SlackUserMapping.objects.get(pk=event_data.get('user'))
-                except SlackUserMapping.DoesNotExist:
-                    slack_user_mapping = None
-
-                try:
-                    slack_workspace = SlackWorkspace.objects.get(pk=kwargs.get('team_id'))
-                except SlackWorkspace.DoesNotExist:
-                    slack_workspace = None
-
-                slack_models = {
-                    "slack_user_mapping": slack_user_mapping,
-                    "slack_workspace": slack_workspace,
-                } if inject_slack_models else {}
-                return receiver_func(sender, event_data=event_data, event_type=event_type, **slack_models, **kwargs)
-
-        slack_event_received.connect(signal_receiver, weak=False)
+        event_router.register(event_types, receiver_func, inject_slack_models=inject_slack_models, batch=batch)
+        return receiver_func
 
     return decorator_receiver
 
@@ -80,27 +129,35 @@ def slack_app_home(receiver_func):
         slack_workspace=None,
         **kwargs
     ):
-        if event_type == 'app_home_opened':
-            slack_user_mapping = SlackUserMapping.objects.get(pk=event_data.get('user'))
-            slack_workspace = SlackWorkspace.objects.get(pk=kwargs.get('team_id'))
-
-        blocks, title = receiver_func(
-            sender,
-            event_data=event_data,
-            event_type=event_type,
-            slack_user_mapping=slack_user_mapping,
-            slack_workspace=slack_workspace,
-            **kwargs,
-        )
-
-        client = slack.WebClient(token=slack_workspace.bot_access_token)
-        client.views_publish(user_id=slack_user_mapping.slack_user_id, view={
-            "type": 'home',
-            "title": title,
-            "blocks": blocks
-        })
-
-    slack_event_received.connect(signal_receiver, weak=False)
+        if slack_user_mapping is None or slack_workspace is None:
+            # the user or the workspace is not known to us, there is nothing to publish
+            return
+
+        def publish():
+            blocks, title = receiver_func(
+                sender,
+                event_data=event_data,
+                event_type=event_type,
+                slack_user_mapping=slack_user_mapping,
+                slack_workspace=slack_workspace,
+                **kwargs,
+            )
+
+            publish_app_home(
+                slack_workspace,
+                slack_user_mapping,
+                view={
+                    "type": 'home',
+                    "title": title,
+                    "blocks": blocks
+                },
+                # somebody is looking at the App Home right now, refreshes can wait
+                priority=PRIORITY_HIGH if event_type == 'app_home_opened' else PRIORITY_NORMAL,
+            )
+
+        coalesce_app_home(slack_workspace.id, slack_user_mapping.slack_user_id, publish)
+
+    event_router.register(('app_home_opened',), signal_receiver, inject_slack_models=True)
     refresh_home.connect(signal_receiver, weak=False)
 
     return signal_receiver
@@ -0,0 +1,156 @@
+"""
+Deferred execution of slash commands & interactivity handlers.
+
+Slack expects an answer within 3 seconds. Handlers registered with `deferred=True` are acknowledged
+right away, executed on a Celery worker (or a bounded in-process thread pool) and their response
+is posted to the payload's `response_url`.
+
+Deferred handlers get `None` instead of the request, which is gone by the time they run.
+"""
+import json
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional
+
+from django.db import close_old_connections
+from django.http import HttpResponse, JsonResponse
+
+from . import metrics
+from .cache import get_user_mapping, get_workspace
+from .payloads import CommandPayload, parse_interactivity_payload
+from .helpers import slack_commands, slack_interactivity_callbacks, run_handler
+from .settings import SLACK_DEFERRED_BACKEND, SLACK_DEFERRED_MAX_WORKERS, SLACK_DEFERRED_MAX_QUEUE, \
+    SLACK_RESPONSE_URL_RETRIES
+from .transport import http_client
+
+logger = logging.getLogger(__name__)
+
+COMMAND = 'command'
+INTERACTIVITY = 'interactivity'
+
+_registries = {
+    COMMAND: slack_commands,
+    INTERACTIVITY: slack_interactivity_callbacks,
+}
+
+
+class BoundedExecutor:
+    """
+    Thread pool refusing new work once `max_workers + max_queue` items are pending.
+    """
+
+    def __init__(self, max_workers: int, max_queue: int):
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='slack-deferred')
+        self.slots = threading.BoundedSemaphore(max_workers + max_queue)
+
+    def submit(self, fn, *args) -> bool:
+        if not self.slots.acquire(blocking=False):
+            return False
+
+        future = self.executor.submit(fn, *args)
+        future.add_done_callback(lambda f: self.slots.release())
+        return True
+
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_executor() -> BoundedExecutor:
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = BoundedExecutor(SLACK_DEFERRED_MAX_WORKERS, SLACK_DEFERRED_MAX_QUEUE)
+        return _executor
+
+
+def ack_response(ack) -> HttpResponse:
+    if ack is None:
+        return HttpResponse()
+    if isinstance(ack, HttpResponse):
+        return ack
+    return JsonResponse(ack)
+
+
+def get_response_payload(response) -> Optional[bytes]:
+    """
+    Handlers return a (Json)HttpResponse or a dict, nothing is posted for an empty response
+    """
+    if response is None:
+        return None
+    if isinstance(response, dict):
+        return json.dumps(response).encode('utf-8')
+    if isinstance(response, HttpResponse) and response.status_code == 200 and response.content:
+        return response.content
+    return None
+
+
+def deliver_response(response_url: Optional[str], response):
+    payload = get_response_payload(response)
+    if not response_url or payload is None:
+        return
+
+    result = http_client.post_json(response_url, payload, retries=SLACK_RESPONSE_URL_RETRIES)
+    if result.status != 200:
+        metrics.incr('slack_deferred_delivery_failures')
+        logger.warning("Unable to post deferred response to Slack (HTTP %s): %s", result.status, result.body)
+
+
+def run_deferred_handler(kind: str, name: str, request, payload, slack_user_mapping, slack_workspace):
+    handler = _registries[kind][name]
+    try:
+        response = run_handler(handler.fn, request, payload, slack_user_mapping, slack_workspace, kind=kind)
+    except Exception:
+        metrics.incr('slack_deferred_failures', kind=kind, name=name)
+        logger.exception("Deferred Slack %s '%s' failed", kind, name)
+        return
+
+    deliver_response(payload.get('response_url'), response)
+
+
+def run_deferred_handler_in_thread(kind: str, name: str, payload, slack_user_mapping, slack_workspace):
+    """
+    Entrypoint of the thread pool, pool threads outlive requests so they manage their DB connections themselves
+    """
+    close_old_connections()
+    try:
+        run_deferred_handler(kind, name, None, payload, slack_user_mapping, slack_workspace)
+    finally:
+        close_old_connections()
+
+
+def run_deferred_handler_by_ids(kind: str, name: str, payload: dict, slack_user_id=None, team_id=None):
+    """
+    Entrypoint of the Celery task, Slack models are passed by their ids
+    """
+    slack_user_mapping = get_user_mapping(slack_user_id) if slack_user_id else None
+    slack_workspace = get_workspace(team_id) if team_id else None
+    payload = CommandPayload(payload) if kind == COMMAND else parse_interactivity_payload(payload)
+    run_deferred_handler(kind, name, None, payload, slack_user_mapping, slack_workspace)
+
+
+def defer_handler(kind: str, name: str, request, payload, slack_user_mapping, slack_workspace) -> HttpResponse:
+    """
+    Schedules the handler and returns the response acknowledging the request
+    """
+    handler = _registries[kind][name]
+
+    if SLACK_DEFERRED_BACKEND == 'celery':
+        from .tasks import run_deferred_slack_handler_task
+        run_deferred_slack_handler_task.delay(
+            kind,
+            name,
+            payload.dict() if hasattr(payload, 'dict') else payload,
+            slack_user_id=slack_user_mapping.pk if slack_user_mapping else None,
+            team_id=slack_workspace.pk if slack_workspace else None,
+        )
+    elif not get_executor().submit(
+        run_deferred_handler_in_thread, kind, name, payload, slack_user_mapping, slack_workspace
+    ):
+        # the pool is saturated, rather answer late than never
+        metrics.incr('slack_deferred_saturated', kind=kind)
+        return run_handler(handler.fn, request, payload, slack_user_mapping, slack_workspace, kind=kind)
+
+    metrics.incr('slack_deferred_scheduled', kind=kind, backend=SLACK_DEFERRED_BACKEND)
+    return ack_response(handler.ack)
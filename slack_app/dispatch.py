@@ -0,0 +1,141 @@
+"""
+In-process dispatch of Slack events (SLACK_EVENT_DISPATCH_BACKEND = 'thread'), for deployments without a broker.
+
+Events are queued in memory and `slack_event_received` is sent from a bounded pool of worker threads, after
+the request has been acknowledged. Once SLACK_EVENT_DISPATCH_MAX_QUEUE events are waiting, SLACK_EVENT_DISPATCH_OVERFLOW
+decides what happens to a new one:
+
+- `reject` answers Slack with 503, Slack retries the event later
+- `block` waits up to SLACK_EVENT_DISPATCH_BLOCK_TIMEOUT seconds for room, then rejects the event
+- `drop` acknowledges and discards the event
+
+Queued events live in the web process only: on shutdown, the queue is drained for up to
+SLACK_EVENT_DISPATCH_DRAIN_TIMEOUT seconds, events still waiting after that are lost.
+"""
+import atexit
+import logging
+import queue
+import threading
+import time
+from typing import Callable, Optional
+
+from django.db import close_old_connections
+
+from . import metrics
+from .exceptions import SlackEventRejected
+from .settings import SLACK_EVENT_DISPATCH_MAX_WORKERS, SLACK_EVENT_DISPATCH_MAX_QUEUE, \
+    SLACK_EVENT_DISPATCH_OVERFLOW, SLACK_EVENT_DISPATCH_BLOCK_TIMEOUT, SLACK_EVENT_DISPATCH_DRAIN_TIMEOUT
+
+logger = logging.getLogger(__name__)
+
+OVERFLOW_DROP = 'drop'
+OVERFLOW_BLOCK = 'block'
+OVERFLOW_REJECT = 'reject'
+
+
+class EventDispatcher:
+
+    def __init__(self, max_workers: int, max_queue: int, overflow: str = OVERFLOW_REJECT, block_timeout: float = 1.0):
+        if overflow not in (OVERFLOW_DROP, OVERFLOW_BLOCK, OVERFLOW_REJECT):
+            raise ValueError(f"Unknown overflow policy {overflow}")
+
+        self.overflow = overflow
+        self.block_timeout = block_timeout
+        self.queue = queue.Queue(maxsize=max_queue)
+        self.closed = False
+        self._stop = threading.Event()
+        self._busy = 0
+        self._lock = threading.Lock()
+        # daemon threads, so a stuck receiver can't prevent the process from exiting, see `shutdown`
+        self.workers = [
+            threading.Thread(target=self._work, name=f'slack-events-{i}', daemon=True) for i in range(max_workers)
+        ]
+        for worker in self.workers:
+            worker.start()
+
+    def submit(self, fn: Callable, kwargs: dict) -> bool:
+        """
+        Queues `fn(**kwargs)`, returns False if the event has been dropped.
+        Raises SlackEventRejected if the event should be retried by Slack.
+        """
+        if self.closed:
+            raise SlackEventRejected("Slack event dispatcher is shutting down")
+
+        try:
+            if self.overflow == OVERFLOW_BLOCK:
+                self.queue.put((fn, kwargs), timeout=self.block_timeout)
+            else:
+                self.queue.put_nowait((fn, kwargs))
+        except queue.Full:
+            metrics.incr('slack_event_dispatch_saturated', policy=self.overflow)
+            if self.overflow == OVERFLOW_DROP:
+                logger.warning("Slack event dispatch queue is full, dropping %s event", kwargs.get('event_type'))
+                return False
+            raise SlackEventRejected("Slack event dispatch queue is full")
+
+        metrics.set_gauge('slack_event_dispatch_queue_depth', self.queue.qsize())
+        return True
+
+    def _set_busy(self, delta: int):
+        with self._lock:
+            self._busy += delta
+            busy = self._busy
+        metrics.set_gauge('slack_event_dispatch_busy_workers', busy)
+
+    def _work(self):
+        while not self._stop.is_set():
+            try:
+                fn, kwargs = self.queue.get(timeout=0.5)
+            except queue.Empty:
+                continue
+
+            metrics.set_gauge('slack_event_dispatch_queue_depth', self.queue.qsize())
+            self._set_busy(1)
+            close_old_connections()
+            try:
+                fn(**kwargs)
+            except Exception:
+                metrics.incr('slack_event_dispatch_failures', event_type=kwargs.get('event_type'))
+                logger.exception("Dispatch of Slack %s event failed", kwargs.get('event_type'))
+            finally:
+                close_old_connections()
+                self._set_busy(-1)
+                self.queue.task_done()
+
+    def shutdown(self, timeout: Optional[float] = None) -> int:
+        """
+        Stops accepting events and waits for the queued ones, returns the number of events left unprocessed
+        """
+        self.closed = True
+        deadline = time.monotonic() + (timeout if timeout is not None else SLACK_EVENT_DISPATCH_DRAIN_TIMEOUT)
+        while self.queue.unfinished_tasks and time.monotonic() < deadline:
+            time.sleep(0.05)
+
+        self._stop.set()
+        for worker in self.workers:
+            worker.join(max(0.0, deadline - time.monotonic()))
+
+        left = self.queue.qsize()
+        if left:
+            metrics.incr('slack_event_dispatch_lost', left)
+            logger.warning("%s Slack events left unprocessed on shutdown", left)
+        return left
+
+
+_dispatcher = None
+_dispatcher_lock = threading.Lock()
+
+
+def get_event_dispatcher() -> EventDispatcher:
+    # created lazily, so every (forked) worker process gets its own threads
+    global _dispatcher
+    with _dispatcher_lock:
+        if _dispatcher is None:
+            _dispatcher = EventDispatcher(
+                SLACK_EVENT_DISPATCH_MAX_WORKERS,
+                SLACK_EVENT_DISPATCH_MAX_QUEUE,
+                SLACK_EVENT_DISPATCH_OVERFLOW,
+                SLACK_EVENT_DISPATCH_BLOCK_TIMEOUT,
+            )
+            atexit.register(_dispatcher.shutdown)
+        return _dispatcher
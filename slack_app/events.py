@@ -0,0 +1,69 @@
+"""
+Hands events received from Slack's Events API over to the workers.
+"""
+import time
+
+from .claimcheck import check_in, on_checked_in
+from .batching import get_event_batcher, should_batch
+from .dispatch import get_event_dispatcher
+from .idempotency import is_duplicate_event, forget_event
+from .queues import event_queue_router
+from .settings import SLACK_EVENT_DISPATCH_BACKEND
+from .tasks import receive_slack_signal_task
+
+
+def enqueue_slack_event(sender, data: dict, retry_reason=None) -> bool:
+    """
+    Enqueues an `event_callback` payload to be dispatched as `slack_event_received`.
+    Returns False if the event is a retry of an already enqueued one (or has been dropped).
+    Raises SlackEventRejected if the event can't be accepted right now, see dispatch.py.
+
+    :param retry_reason: value of X-Slack-Retry-Reason header, if any
+    """
+    event_id = data.get('event_id')
+    if is_duplicate_event(event_id, retry_reason=retry_reason):
+        return False
+
+    try:
+        return _enqueue(sender, data)
+    except Exception:
+        # the event is marked as received but went nowhere (e.g. the broker is down), let Slack's retry through
+        forget_event(event_id)
+        raise
+
+
+def _enqueue(sender, data: dict) -> bool:
+    event_data = data.pop('event')
+    event_type = event_data.pop('type')
+
+    # used by the worker to measure queue lag, see tasks.py
+    data['slack_enqueued_at'] = time.time()
+
+    if SLACK_EVENT_DISPATCH_BACKEND == 'thread':
+        # the event stays in memory, there's no broker message to keep small
+        return get_event_dispatcher().submit(
+            receive_slack_signal_task, dict(sender=sender, event_type=event_type, event_data=event_data, **data)
+        )
+
+    event_data = check_in(event_data, team_id=data.get('team_id'))
+    # a stored payload may only become visible to workers once the request's transaction commits
+    on_checked_in(event_data, lambda: _publish(sender, event_type, event_data, data))
+    return True
+
+
+def _publish(sender, event_type: str, event_data: dict, data: dict):
+    try:
+        team_id = data.get('team_id')
+        # counts against the workspace's fair share whether the event is batched or not
+        options = event_queue_router.get_options(event_type, team_id)
+        # a batch goes to the default queue, routed events and those overflowing the fair share skip batching
+        if should_batch(event_type) and not options and not event_queue_router.is_routed(event_type, team_id):
+            get_event_batcher().add(dict(sender=sender, event_type=event_type, event_data=event_data, **data))
+        else:
+            receive_slack_signal_task.apply_async(
+                kwargs=dict(sender=sender, event_type=event_type, event_data=event_data, **data), **options
+            )
+    except Exception:
+        # also when published after the commit, outside of enqueue_slack_event
+        forget_event(data.get('event_id'))
+        raise
@@ -25,3 +25,10 @@ class SlackInteractivityTypeDoesNotExist(SlackReceiverDoesNotExist):
 
 class SlackCommandDoesNotExist(SlackReceiverDoesNotExist):
     pass
+
+
+class SlackEventRejected(Exception):
+    """
+    Thrown if an event can't be accepted right now, Slack is asked to retry it later.
+    """
+    pass
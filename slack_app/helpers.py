@@ -1,19 +1,41 @@
+import asyncio
 import datetime
-import hashlib
-import hmac
-import time
+from collections import namedtuple
 from typing import Tuple
 
-from django.conf import settings
-from django.core.exceptions import ImproperlyConfigured
+from asgiref.sync import async_to_sync
 from django.http import HttpRequest
 
+from . import metrics
+from .cache import invalidate_user_mappings
 from .models import SlackWorkspace, SlackWebHook, SlackUserMapping
+from .payloads import HandlerPayload
+from .signature import get_signature_verifier
+
+# registered by @slack_command & @slack_interactivity, see deferred.py for `deferred` & `ack`
+SlackHandler = namedtuple('SlackHandler', 'fn require_linked_account deferred ack')
 
 slack_interactivity_callbacks = dict()
 slack_commands = dict()
 
 
+def run_handler(fn, request, payload, *args, kind='handler'):
+    """
+    Handlers registered by @slack_command/@slack_interactivity may be coroutines, see async_views.py
+    """
+    if isinstance(payload, HandlerPayload):
+        # handlers may json.dumps it, which doesn't use the dict's methods, see payloads.py
+        payload.fill()
+    args = (request, payload, *args)
+
+    if asyncio.iscoroutinefunction(fn):
+        with metrics.track_handler(kind, fn, count_queries=False):
+            return async_to_sync(fn)(*args)
+
+    with metrics.track_handler(kind, fn):
+        return fn(*args)
+
+
 def create_workspace_from_oauth2_response(request_user, response) -> Tuple[SlackWorkspace, SlackWebHook]:
     workspace, created = SlackWorkspace.objects.update_or_create(
         id=response.get("team").get("id"),
@@ -29,17 +51,20 @@ def create_workspace_from_oauth2_response(request_user, response) -> Tuple[Slack
 
     workspace.update_slack_metadata()
 
-    SlackUserMapping.objects.filter(slack_team_id=workspace.id).update(slack_workspace=workspace)
+    mappings = SlackUserMapping.objects.filter(slack_team_id=workspace.id)
+    mappings.update(slack_workspace=workspace)
+    invalidate_user_mappings(mappings.values_list('pk', flat=True))
     workspace.owners.add(request_user)
     webhook_data = response.get("incoming_webhook")
 
-    hook = SlackWebHook.objects.create(
-        workspace=workspace,
-        channel_id=webhook_data.get("channel_id"),
-        channel_name=webhook_data.get("channel"),
-        configuration_url=webhook_data.get("configuration_url"),
-        url=webhook_data.get("url"),
-    )
+    # re-installing into the same channel replaces the channel's webhook, broadcasts would post twice otherwise
+    hook = SlackWebHook.objects.filter(workspace=workspace, channel_id=webhook_data.get("channel_id")) \
+        .order_by('-pk').first() or SlackWebHook(workspace=workspace, channel_id=webhook_data.get("channel_id"))
+    hook.channel_name = webhook_data.get("channel")
+    hook.configuration_url = webhook_data.get("configuration_url")
+    hook.url = webhook_data.get("url")
+    hook.dead_since = None
+    hook.save()
 
     return workspace, hook
 
@@ -52,26 +77,4 @@ def is_verified_slack_request(request: HttpRequest) -> bool:
     :param request: Django request
     :return: True if request is verified, False otherwise
     """
-    try:
-        slack_signing_secret = settings.SLACK_SIGNING_SECRET
-    except AttributeError:
-        raise ImproperlyConfigured(
-            "SLACK_SIGNING_SECRET is missing in your settings.py" +
-            "Please check the readme of django-slack-integration package"
-        )
-
-    slack_signature = request.META.get('HTTP_X_SLACK_SIGNATURE')
-    slack_request_timestamp = request.META.get('HTTP_X_SLACK_REQUEST_TIMESTAMP')
-
-    if not slack_signature or not slack_request_timestamp:
-        return False
-
-    if abs(time.time() - int(slack_request_timestamp)) > 60 * 5:
-        # The request timestamp is more than five minutes from local time.
-        # It could be a replay attack, so let's ignore it.
-        return False
-
-    sig_basestring = f"v0:{slack_request_timestamp}:{request.body.decode('utf-8')}".encode("utf-8")
-    my_signature = 'v0=' + hmac.new(bytes(slack_signing_secret, 'utf-8'), sig_basestring, hashlib.sha256).hexdigest()
-
-    return hmac.compare_digest(my_signature, slack_signature)
+    return get_signature_verifier().verify_request(request)
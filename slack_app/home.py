@@ -0,0 +1,138 @@
+"""
+Coalesced, content-hashed App Home publishing used by @slack_app_home.
+
+Publishing is debounced per (workspace, user): the first request within SLACK_APP_HOME_DEBOUNCE seconds
+is published right away, the following ones are collapsed into a single trailing publish at the end
+of the window. A hash of the last view published by `publish_app_home` is kept for SLACK_APP_HOME_HASH_TIMEOUT
+seconds, so unchanged views are not sent to Slack at all. Code publishing Home views another way should call
+`forget_app_home` afterwards, otherwise an older view may be skipped as unchanged within that time.
+
+Trailing publishes wait in a timer thread of the process. They're run right away when the process exits normally,
+a process that gets killed loses them. Failures are logged and counted as `slack_app_home_trailing_failures`.
+"""
+import atexit
+import hashlib
+import json
+import logging
+import math
+import threading
+from typing import Callable
+
+from django.core.cache import caches
+from django.db import close_old_connections
+
+from . import metrics
+from .clients import get_client
+from .models import SlackWorkspace, SlackUserMapping
+from .ratelimit import call_slack_api, PRIORITY_NORMAL
+from .settings import SLACK_APP_HOME_CACHE_ALIAS, SLACK_APP_HOME_DEBOUNCE, SLACK_APP_HOME_HASH_TIMEOUT
+
+logger = logging.getLogger(__name__)
+
+# (workspace id, user id) -> timer of the trailing publish
+_trailing = {}
+_trailing_lock = threading.Lock()
+
+
+def _cache():
+    return caches[SLACK_APP_HOME_CACHE_ALIAS]
+
+
+def _key(kind: str, workspace_id, user_id) -> str:
+    return f"slack_app:home:{kind}:{workspace_id}:{user_id}"
+
+
+def get_view_hash(view: dict) -> str:
+    return hashlib.sha256(json.dumps(view, sort_keys=True, separators=(',', ':')).encode('utf-8')).hexdigest()
+
+
+def forget_app_home(workspace_id, user_id):
+    """
+    Makes the next `publish_app_home` for the user publish even if the view hasn't changed
+    """
+    _cache().delete(_key('hash', workspace_id, user_id))
+
+
+def publish_app_home(slack_workspace: SlackWorkspace, slack_user_mapping: SlackUserMapping, view: dict,
+                     priority=PRIORITY_NORMAL) -> bool:
+    """
+    Publishes the view unless it's the same as the last published one. Returns True if it was published.
+    """
+    hash_key = _key('hash', slack_workspace.id, slack_user_mapping.slack_user_id)
+    view_hash = get_view_hash(view)
+
+    if _cache().get(hash_key) == view_hash:
+        metrics.incr('slack_app_home_publishes_saved', reason='unchanged')
+        return False
+
+    client = get_client(slack_workspace.bot_access_token)
+    call_slack_api(
+        slack_workspace.id,
+        'views.publish',
+        client.views_publish,
+        priority=priority,
+        user_id=slack_user_mapping.slack_user_id,
+        view=view,
+    )
+    _cache().set(hash_key, view_hash, SLACK_APP_HOME_HASH_TIMEOUT)
+    metrics.incr('slack_app_home_publishes')
+    return True
+
+
+def _publish_trailing(workspace_id, user_id, publish: Callable):
+    # requests coming after this point schedule another trailing publish
+    _cache().delete(_key('trailing', workspace_id, user_id))
+    try:
+        publish()
+    except Exception:
+        metrics.incr('slack_app_home_trailing_failures')
+        logger.exception("Trailing App Home publish for user %s of workspace %s failed", user_id, workspace_id)
+    finally:
+        close_old_connections()
+
+
+def _run_trailing(workspace_id, user_id, publish: Callable):
+    with _trailing_lock:
+        if _trailing.pop((workspace_id, user_id), None) is None:
+            # run by flush_trailing already
+            return
+    _publish_trailing(workspace_id, user_id, publish)
+
+
+def flush_trailing():
+    """
+    Runs the trailing publishes still waiting for the end of their window, called when the process exits
+    """
+    with _trailing_lock:
+        pending = list(_trailing.values())
+        _trailing.clear()
+
+    for timer in pending:
+        timer.cancel()
+        _publish_trailing(*timer.args)
+
+
+atexit.register(flush_trailing)
+
+
+def coalesce_app_home(workspace_id, user_id, publish: Callable):
+    """
+    Calls `publish` now, at the end of the debounce window, or not at all if a trailing publish is scheduled already
+    """
+    if not SLACK_APP_HOME_DEBOUNCE:
+        return publish()
+
+    cache = _cache()
+    # several cache backends truncate timeouts to whole seconds, a sub-second window is kept by the timer only
+    timeout = max(1, math.ceil(SLACK_APP_HOME_DEBOUNCE))
+    if cache.add(_key('cooldown', workspace_id, user_id), True, timeout):
+        return publish()
+
+    if cache.add(_key('trailing', workspace_id, user_id), True, timeout):
+        timer = threading.Timer(SLACK_APP_HOME_DEBOUNCE, _run_trailing, args=(workspace_id, user_id, publish))
+        timer.daemon = True
+        with _trailing_lock:
+            _trailing[(workspace_id, user_id)] = timer
+        timer.start()
+    else:
+        metrics.incr('slack_app_home_publishes_saved', reason='coalesced')
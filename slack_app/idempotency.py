@@ -0,0 +1,119 @@
+"""
+Drops retried deliveries of Slack events.
+
+Slack re-sends an event (with `X-Slack-Retry-Num` header) when we don't acknowledge it in time,
+the `event_id` stays the same. Seen ids are kept in the Django cache for SLACK_EVENT_DEDUP_TIMEOUT seconds,
+an in-process bounded store is used instead if the cache is unavailable.
+"""
+import logging
+
+from django.core.cache import caches
+from django.core.cache.backends.dummy import DummyCache
+
+from . import metrics
+from .cache import LocalTTLCache
+from .settings import SLACK_EVENT_DEDUP_ENABLED, SLACK_EVENT_DEDUP_CACHE_ALIAS, SLACK_EVENT_DEDUP_TIMEOUT, \
+    SLACK_EVENT_DEDUP_LOCAL_SIZE, SLACK_EVENT_DEDUP_AT_EXECUTION
+
+logger = logging.getLogger(__name__)
+
+STAGE_RECEIVED = 'received'
+STAGE_EXECUTED = 'executed'
+
+
+class EventIdStore:
+
+    def __init__(self, cache_alias: str, timeout: int, local_size: int):
+        self.cache_alias = cache_alias
+        self.timeout = timeout
+        self.local = LocalTTLCache(local_size, timeout)
+
+    def _local_add(self, key: str) -> bool:
+        if self.local.get(key):
+            return False
+        self.local.set(key, True)
+        return True
+
+    def add(self, key: str) -> bool:
+        """
+        Remembers the key, returns False if it has been seen already.
+        """
+        cache = caches[self.cache_alias] if self.cache_alias else None
+        if cache is None or isinstance(cache, DummyCache):
+            return self._local_add(key)
+
+        try:
+            return cache.add(key, True, self.timeout)
+        except Exception:
+            logger.warning("Deduplication cache is unavailable, falling back to in-process store", exc_info=True)
+            return self._local_add(key)
+
+    def contains(self, key: str) -> bool:
+        cache = caches[self.cache_alias] if self.cache_alias else None
+        if cache is None or isinstance(cache, DummyCache):
+            return bool(self.local.get(key))
+
+        try:
+            return cache.get(key) is not None
+        except Exception:
+            logger.warning("Deduplication cache is unavailable, falling back to in-process store", exc_info=True)
+            return bool(self.local.get(key))
+
+    def discard(self, key: str):
+        self.local.delete(key)
+        cache = caches[self.cache_alias] if self.cache_alias else None
+        if cache is None or isinstance(cache, DummyCache):
+            return
+
+        try:
+            cache.delete(key)
+        except Exception:
+            logger.warning("Deduplication cache is unavailable", exc_info=True)
+
+
+event_id_store = EventIdStore(SLACK_EVENT_DEDUP_CACHE_ALIAS, SLACK_EVENT_DEDUP_TIMEOUT, SLACK_EVENT_DEDUP_LOCAL_SIZE)
+
+
+def is_duplicate_event(event_id, stage=STAGE_RECEIVED, retry_reason=None) -> bool:
+    """
+    Returns True if the event has already passed the given stage.
+
+    :param stage: STAGE_RECEIVED in the view before enqueueing, STAGE_EXECUTED in the worker
+    """
+    if not SLACK_EVENT_DEDUP_ENABLED or not event_id:
+        return False
+
+    if event_id_store.add(f"slack_app:event:{stage}:{event_id}"):
+        return False
+
+    metrics.incr('slack_events_duplicates_dropped', stage=stage, reason=retry_reason or 'unknown')
+    return True
+
+
+def forget_event(event_id, stage=STAGE_RECEIVED):
+    """
+    Lets a retry of the event through again, e.g. when it couldn't be enqueued
+    """
+    if SLACK_EVENT_DEDUP_ENABLED and event_id:
+        event_id_store.discard(f"slack_app:event:{stage}:{event_id}")
+
+
+def is_duplicate_execution(event_id) -> bool:
+    """
+    Returns True if receivers of the event have already run successfully, see `mark_executed`.
+    The key is only saved once they succeed, so a failed task can be retried; two deliveries executed
+    at the same time may both run (at-least-once).
+    """
+    if not SLACK_EVENT_DEDUP_ENABLED or not SLACK_EVENT_DEDUP_AT_EXECUTION or not event_id:
+        return False
+
+    if not event_id_store.contains(f"slack_app:event:{STAGE_EXECUTED}:{event_id}"):
+        return False
+
+    metrics.incr('slack_events_duplicates_dropped', stage=STAGE_EXECUTED, reason='executed')
+    return True
+
+
+def mark_executed(event_id):
+    if SLACK_EVENT_DEDUP_ENABLED and SLACK_EVENT_DEDUP_AT_EXECUTION and event_id:
+        event_id_store.add(f"slack_app:event:{STAGE_EXECUTED}:{event_id}")
@@ -0,0 +1,133 @@
+"""
+Routing of interactivity payloads to handlers registered by payload type and `action_id`, `block_id`
+or `callback_id`, see `@slack_interactivity`.
+
+The index is built while handlers are registered: exact values are looked up in a dict, prefixes in a trie
+(the longest registered prefix wins), regular expressions are tried in the order of registration.
+A handler registered for the payload type only is the fallback.
+"""
+import re
+from collections import defaultdict
+from typing import Optional, Union
+
+ROUTING_FIELDS = ('action_id', 'block_id', 'callback_id')
+
+
+def get_routing_values(payload: dict) -> dict:
+    """
+    Returns values of `action_id`, `block_id` & `callback_id` of a payload, wherever the payload type keeps them
+    """
+    values = {}
+    actions = payload.get('actions')
+    if actions:
+        values['action_id'] = actions[0].get('action_id')
+        values['block_id'] = actions[0].get('block_id')
+    else:
+        # block_suggestion
+        values['action_id'] = payload.get('action_id')
+        values['block_id'] = payload.get('block_id')
+
+    view = payload.get('view')
+    # view_submission & view_closed carry it in the view, shortcuts & message actions at the top level
+    values['callback_id'] = payload.get('callback_id') or (view.get('callback_id') if view else None)
+    return values
+
+
+class PrefixTrie:
+    END = object()
+
+    def __init__(self):
+        self.root = {}
+
+    def add(self, prefix: str, value):
+        node = self.root
+        for char in prefix:
+            node = node.setdefault(char, {})
+        node[self.END] = value
+
+    def longest_match(self, key: str):
+        node = self.root
+        match = node.get(self.END)
+        for char in key:
+            node = node.get(char)
+            if node is None:
+                break
+            match = node.get(self.END, match)
+        return match
+
+
+class InteractivityIndex:
+
+    def __init__(self):
+        self.exact = {}  # (type, field, value) -> name
+        self.prefixes = defaultdict(PrefixTrie)  # (type, field) -> trie of names
+        self.patterns = defaultdict(list)  # (type, field) -> [(compiled pattern, name)]
+        self.types = {}  # type -> name
+
+    @staticmethod
+    def get_name(interactivity_type: str, field: Optional[str] = None, value=None, prefix=False) -> str:
+        """
+        Key of the handler in `slack_interactivity_callbacks`, the payload type alone for type-level handlers
+        """
+        if field is None:
+            return interactivity_type
+        if isinstance(value, re.Pattern):
+            return f"{interactivity_type}:{field}~{value.pattern}"
+        return f"{interactivity_type}:{field}{'^' if prefix else '='}{value}"
+
+    def add(self, interactivity_type: str, field: Optional[str] = None, value: Union[str, re.Pattern, None] = None,
+            prefix=False) -> str:
+        name = self.get_name(interactivity_type, field, value, prefix)
+        if field is None:
+            self.types[interactivity_type] = name
+        elif isinstance(value, re.Pattern):
+            self.patterns[(interactivity_type, field)].append((value, name))
+        elif prefix:
+            self.prefixes[(interactivity_type, field)].add(value, name)
+        else:
+            self.exact[(interactivity_type, field, value)] = name
+        return name
+
+    def resolve(self, payload: dict) -> Optional[str]:
+        """
+        Returns name of the handler of the payload, None if there is none
+        """
+        interactivity_type = payload.get('type')
+        values = get_routing_values(payload)
+
+        for field in ROUTING_FIELDS:
+            value = values.get(field)
+            if value is not None:
+                name = self.exact.get((interactivity_type, field, value))
+                if name is not None:
+                    return name
+
+        for field in ROUTING_FIELDS:
+            value = values.get(field)
+            if value is None:
+                continue
+            trie = self.prefixes.get((interactivity_type, field))
+            name = trie.longest_match(value) if trie else None
+            if name is not None:
+                return name
+            for pattern, name in self.patterns.get((interactivity_type, field), ()):
+                if pattern.match(value):
+                    return name
+
+        return self.types.get(interactivity_type)
+
+
+interactivity_index = InteractivityIndex()
+
+
+def get_routing_field(action_id=None, block_id=None, callback_id=None):
+    """
+    Returns (field, value) of `@slack_interactivity` routing arguments, at most one of them may be given
+    """
+    given = [(field, value) for field, value in zip(ROUTING_FIELDS, (action_id, block_id, callback_id))
+             if value is not None]
+    if len(given) > 1:
+        raise ValueError("Only one of action_id, block_id and callback_id can be given")
+    if not given:
+        return None, None
+    return given[0]
@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand
+
+from ...metadata import refresh_slack_metadata
+from ...settings import SLACK_METADATA_REFRESH_CONCURRENCY
+
+
+class Command(BaseCommand):
+    help = "Re-fetches Slack metadata of all workspaces and user mappings"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--concurrency', type=int, default=SLACK_METADATA_REFRESH_CONCURRENCY,
+            help="Maximum number of Slack API calls in flight",
+        )
+        parser.add_argument(
+            '--stale-after', type=int, default=0,
+            help="Skip entities refreshed within this many seconds (default: refresh everything)",
+        )
+
+    def handle(self, *args, **options):
+        result = refresh_slack_metadata(stale_after=options['stale_after'], concurrency=options['concurrency'])
+        self.stdout.write(self.style.SUCCESS(
+            f"Refreshed {result['workspaces']} workspaces and {result['user_mappings']} user mappings"
+        ))
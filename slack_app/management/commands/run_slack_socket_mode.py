@@ -0,0 +1,42 @@
+import threading
+
+from django.core.management.base import BaseCommand, CommandError
+
+from ...settings import SLACK_SOCKET_MODE_APP_TOKENS, SLACK_SOCKET_MODE_CONCURRENCY
+from ...socket_mode import create_socket_mode_client
+
+
+class Command(BaseCommand):
+    help = "Receives Slack events, commands and interactivity over Socket Mode websockets"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--app-token', action='append', dest='app_tokens',
+            help="App-level token, may be repeated (default: SLACK_SOCKET_MODE_APP_TOKENS)",
+        )
+        parser.add_argument(
+            '--concurrency', type=int, default=SLACK_SOCKET_MODE_CONCURRENCY,
+            help="Envelopes handled concurrently per connection",
+        )
+
+    def handle(self, *args, **options):
+        app_tokens = options['app_tokens'] or SLACK_SOCKET_MODE_APP_TOKENS
+        if not app_tokens:
+            raise CommandError("No app-level token, pass --app-token or set SLACK_SOCKET_MODE_APP_TOKENS")
+
+        try:
+            clients = [create_socket_mode_client(token, options['concurrency']) for token in app_tokens]
+        except ImportError as err:
+            raise CommandError(str(err))
+
+        for client in clients:
+            client.connect()
+        self.stdout.write(self.style.SUCCESS(f"Connected {len(clients)} Socket Mode connection(s)"))
+
+        try:
+            threading.Event().wait()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            for client in clients:
+                client.close()
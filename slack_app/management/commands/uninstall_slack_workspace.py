@@ -0,0 +1,59 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from ...models import SlackWorkspace
+from ...settings import SLACK_UNINSTALL_CHUNK_SIZE
+from ...uninstall import uninstall_workspace, get_pending_uninstalls, schedule_uninstall
+
+
+class Command(BaseCommand):
+    help = "Uninstalls Slack workspaces in chunks, resuming interrupted uninstalls"
+
+    def add_arguments(self, parser):
+        parser.add_argument('workspace_ids', nargs='*', help="Slack team ids")
+        parser.add_argument(
+            '--pending', action='store_true',
+            help="Resume every uninstall that hasn't finished",
+        )
+        parser.add_argument(
+            '--chunk-size', type=int, default=SLACK_UNINSTALL_CHUNK_SIZE,
+            help="Rows deleted per statement",
+        )
+        parser.add_argument(
+            '--background', action='store_true',
+            help="Run the uninstalls on Celery workers instead",
+        )
+
+    def handle(self, *args, **options):
+        workspace_ids = list(options['workspace_ids'])
+        if options['pending']:
+            workspace_ids += [pk for pk in get_pending_uninstalls().values_list('pk', flat=True)
+                              if pk not in workspace_ids]
+        if not workspace_ids:
+            raise CommandError("Give workspace ids or --pending")
+
+        for workspace_id in workspace_ids:
+            if options['background']:
+                workspace = SlackWorkspace.objects.filter(pk=workspace_id).first()
+                if workspace is None:
+                    self.stderr.write(f"Workspace {workspace_id} does not exist")
+                    continue
+                schedule_uninstall(workspace)
+                self.stdout.write(f"Scheduled uninstall of {workspace_id}")
+                continue
+
+            progress = uninstall_workspace(
+                workspace_id, chunk_size=options['chunk_size'], progress_callback=self.write_progress
+            )
+            if progress is None:
+                self.stderr.write(f"Workspace {workspace_id} does not exist")
+            else:
+                self.stdout.write(self.style.SUCCESS(
+                    f"Uninstalled {workspace_id}: {progress.user_mappings_deleted} user mappings, "
+                    f"{progress.webhooks_deleted} webhooks and {progress.event_payloads_deleted} event payloads deleted"
+                ))
+
+    def write_progress(self, progress):
+        self.stdout.write(
+            f"{progress.workspace_id}: {progress.user_mappings_deleted} user mappings, "
+            f"{progress.webhooks_deleted} webhooks, {progress.event_payloads_deleted} event payloads deleted"
+        )
@@ -0,0 +1,104 @@
+"""
+Background refresh of Slack metadata (names, e-mails, images) of workspaces & user mappings.
+
+Slack API calls of a batch are made concurrently (within the rate limits, see ratelimit.py),
+the results are persisted with a single `bulk_update` per batch.
+"""
+import datetime
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from typing import Iterable, Optional
+
+from django.db.models import Q, QuerySet
+from django.utils import timezone
+
+from . import metrics
+from .cache import invalidate_workspaces, invalidate_user_mappings
+from .models import SlackWorkspace, SlackUserMapping
+from .ratelimit import PRIORITY_LOW
+from .settings import SLACK_METADATA_STALE_AFTER, SLACK_METADATA_REFRESH_CONCURRENCY, \
+    SLACK_METADATA_REFRESH_BATCH_SIZE
+
+logger = logging.getLogger(__name__)
+
+
+def get_stale(queryset: QuerySet, stale_after: Optional[int] = None) -> QuerySet:
+    """
+    Filters entities not refreshed within `stale_after` seconds
+    """
+    if stale_after is None:
+        stale_after = SLACK_METADATA_STALE_AFTER
+
+    threshold = timezone.now() - datetime.timedelta(seconds=stale_after)
+    return queryset.filter(Q(metadata_refreshed_at__isnull=True) | Q(metadata_refreshed_at__lt=threshold))
+
+
+def _fetch(entity) -> bool:
+    try:
+        return entity.fetch_slack_metadata(priority=PRIORITY_LOW)
+    except Exception:
+        metrics.incr('slack_metadata_refresh_failures', model=entity.__class__.__name__)
+        logger.exception("Unable to refresh Slack metadata of %s", entity.pk)
+        return False
+
+
+def refresh_batch(entities: list, concurrency: int) -> int:
+    """
+    Fetches metadata of the entities (all of the same model) concurrently and bulk updates them
+    :return: number of updated entities
+    """
+    if not entities:
+        return 0
+
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        fetched = list(executor.map(_fetch, entities))
+
+    updated = [entity for entity, ok in zip(entities, fetched) if ok]
+    if updated:
+        model = updated[0].__class__
+        model.objects.bulk_update(updated, model.metadata_fields)
+        # bulk_update doesn't send post_save, see cache.py
+        invalidate = invalidate_workspaces if model is SlackWorkspace else invalidate_user_mappings
+        invalidate([entity.pk for entity in updated])
+
+    metrics.incr('slack_metadata_refreshed', len(updated), model=entities[0].__class__.__name__)
+    return len(updated)
+
+
+def refresh_queryset(queryset: QuerySet, concurrency: Optional[int] = None, batch_size: Optional[int] = None) -> int:
+    concurrency = concurrency or SLACK_METADATA_REFRESH_CONCURRENCY
+    batch_size = batch_size or SLACK_METADATA_REFRESH_BATCH_SIZE
+
+    total = 0
+    batch = []
+    for entity in queryset.iterator(chunk_size=batch_size):
+        batch.append(entity)
+        if len(batch) >= batch_size:
+            total += refresh_batch(batch, concurrency)
+            batch = []
+
+    return total + refresh_batch(batch, concurrency)
+
+
+def refresh_slack_metadata(slack_user_ids: Optional[Iterable[str]] = None,
+                           workspace_ids: Optional[Iterable[str]] = None,
+                           stale_after: Optional[int] = None,
+                           concurrency: Optional[int] = None) -> dict:
+    """
+    Refreshes given (or all, if None) user mappings & workspaces not refreshed within `stale_after` seconds
+    """
+    # mappings created from slash commands have no token to call users.identity with
+    mappings = SlackUserMapping.objects.exclude(access_token='')
+    workspaces = SlackWorkspace.objects.all()
+
+    if slack_user_ids is not None:
+        mappings = mappings.filter(pk__in=list(slack_user_ids))
+    if workspace_ids is not None:
+        workspaces = workspaces.filter(pk__in=list(workspace_ids))
+
+    result = {}
+    if slack_user_ids is not None or workspace_ids is None:
+        result['user_mappings'] = refresh_queryset(get_stale(mappings, stale_after), concurrency=concurrency)
+    if workspace_ids is not None or slack_user_ids is None:
+        result['workspaces'] = refresh_queryset(get_stale(workspaces, stale_after), concurrency=concurrency)
+    return result
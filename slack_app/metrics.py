@@ -0,0 +1,226 @@
+"""
+Lightweight in-process metrics used across the package (handler latency, cache hits, outbound calls, ...).
+
+Metrics are kept in this process and can be exposed in Prometheus text format by the `metrics/` endpoint
+(see SLACK_METRICS_ENDPOINT_ENABLED). Exporters listed in SLACK_METRICS_EXPORTERS additionally receive
+every recorded value, e.g. to push them to StatsD.
+"""
+import bisect
+import socket
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from typing import List
+
+from django.db import connection
+from django.utils.module_loading import import_string
+
+from .settings import SLACK_METRICS_EXPORTERS
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+SIZE_BUCKETS = (1, 2, 5, 10, 25, 50, 100, 250, 500, 1000)
+
+_lock = threading.Lock()
+_counters = defaultdict(int)
+_gauges = {}
+_histograms = {}  # key -> [buckets, bucket counts, count, sum]
+
+
+class MetricsExporter:
+    """
+    Base class of exporters receiving every recorded value
+    """
+
+    def incr(self, name: str, value, labels: dict):
+        pass
+
+    def set_gauge(self, name: str, value, labels: dict):
+        pass
+
+    def observe(self, name: str, value: float, labels: dict):
+        pass
+
+
+class StatsdExporter(MetricsExporter):
+    """
+    Sends metrics to StatsD over UDP, labels are sent as DogStatsD tags
+    """
+
+    def __init__(self, host='localhost', port=8125, prefix='slack_app.'):
+        self.address = (host, port)
+        self.prefix = prefix
+        self.socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+
+    def send(self, name: str, value, metric_type: str, labels: dict):
+        tags = ','.join(f"{key}:{value}" for key, value in labels.items())
+        line = f"{self.prefix}{name}:{value}|{metric_type}" + (f"|#{tags}" if tags else "")
+        try:
+            self.socket.sendto(line.encode('utf-8'), self.address)
+        except OSError:
+            pass
+
+    def incr(self, name, value, labels):
+        self.send(name, value, 'c', labels)
+
+    def set_gauge(self, name, value, labels):
+        self.send(name, value, 'g', labels)
+
+    def observe(self, name, value, labels):
+        self.send(name, round(value * 1000, 3) if name.endswith('_seconds') else value, 'ms', labels)
+
+
+def _load_exporters() -> List[MetricsExporter]:
+    return [import_string(path)() if isinstance(path, str) else path for path in SLACK_METRICS_EXPORTERS]
+
+
+exporters = _load_exporters()
+
+
+def _key(name, labels):
+    return name, tuple(sorted(labels.items()))
+
+
+def incr(name: str, value=1, **labels):
+    with _lock:
+        _counters[_key(name, labels)] += value
+    for exporter in exporters:
+        exporter.incr(name, value, labels)
+
+
+def set_gauge(name: str, value, **labels):
+    with _lock:
+        _gauges[_key(name, labels)] = value
+    for exporter in exporters:
+        exporter.set_gauge(name, value, labels)
+
+
+def observe(name: str, value: float, buckets=LATENCY_BUCKETS, **labels):
+    with _lock:
+        histogram = _histograms.get(_key(name, labels))
+        if histogram is None:
+            histogram = _histograms[_key(name, labels)] = [buckets, [0] * (len(buckets) + 1), 0, 0.0]
+        histogram[1][bisect.bisect_left(histogram[0], value)] += 1
+        histogram[2] += 1
+        histogram[3] += value
+    for exporter in exporters:
+        exporter.observe(name, value, labels)
+
+
+@contextmanager
+def timer(name: str, **labels):
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe(name, time.perf_counter() - started, **labels)
+
+
+def get_handler_name(fn) -> str:
+    return f"{fn.__module__}.{getattr(fn, '__qualname__', fn.__name__)}"
+
+
+@contextmanager
+def track_handler(kind: str, fn, count_queries=True):
+    """
+    Records latency, errors and number of DB queries of a command/interactivity/event handler
+    """
+    labels = {'kind': kind, 'handler': get_handler_name(fn)}
+    queries = 0
+
+    def count(execute, sql, params, many, context):
+        nonlocal queries
+        queries += 1
+        return execute(sql, params, many, context)
+
+    started = time.perf_counter()
+    try:
+        if count_queries:
+            with connection.execute_wrapper(count):
+                yield
+        else:
+            yield
+    except Exception:
+        incr('slack_handler_errors', **labels)
+        raise
+    finally:
+        observe('slack_handler_duration_seconds', time.perf_counter() - started, **labels)
+        if count_queries:
+            observe('slack_handler_queries', queries, buckets=SIZE_BUCKETS, **labels)
+
+
+def get_counter(name: str, **labels):
+    with _lock:
+        return _counters.get(_key(name, labels), 0)
+
+
+def get_counters() -> dict:
+    with _lock:
+        return dict(_counters)
+
+
+def get_gauges() -> dict:
+    with _lock:
+        return dict(_gauges)
+
+
+def get_summaries() -> dict:
+    """
+    Returns (count, sum) of every histogram
+    """
+    with _lock:
+        return {key: (histogram[2], histogram[3]) for key, histogram in _histograms.items()}
+
+
+def get_histograms() -> dict:
+    with _lock:
+        return {
+            key: (buckets, list(counts), count, total) for key, (buckets, counts, count, total) in _histograms.items()
+        }
+
+
+def reset():
+    with _lock:
+        _counters.clear()
+        _gauges.clear()
+        _histograms.clear()
+
+
+def _format_labels(labels, **extra) -> str:
+    labels = list(labels) + list(extra.items())
+    if not labels:
+        return ''
+    escaped = (str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for _, value in labels)
+    return '{' + ','.join(f'{key}="{value}"' for (key, _), value in zip(labels, escaped)) + '}'
+
+
+def render_prometheus() -> str:
+    """
+    Renders all metrics of this process in Prometheus text exposition format
+    """
+    lines = []
+    typed = set()
+
+    def add_type(name, metric_type):
+        if name not in typed:
+            typed.add(name)
+            lines.append(f"# TYPE {name} {metric_type}")
+
+    for (name, labels), value in sorted(get_counters().items()):
+        add_type(f"{name}_total", 'counter')
+        lines.append(f"{name}_total{_format_labels(labels)} {value}")
+
+    for (name, labels), value in sorted(get_gauges().items()):
+        add_type(name, 'gauge')
+        lines.append(f"{name}{_format_labels(labels)} {value}")
+
+    for (name, labels), (buckets, counts, count, total) in sorted(get_histograms().items()):
+        add_type(name, 'histogram')
+        cumulative = 0
+        for bound, bucket_count in zip(list(buckets) + ['+Inf'], counts):
+            cumulative += bucket_count
+            lines.append(f"{name}_bucket{_format_labels(labels, le=bound)} {cumulative}")
+        lines.append(f"{name}_sum{_format_labels(labels)} {total}")
+        lines.append(f"{name}_count{_format_labels(labels)} {count}")
+
+    return '\n'.join(lines) + '\n'
@@ -0,0 +1,125 @@
+"""
+SlackUserMapping.workspace_* duplicate SlackWorkspace, their values are moved to the workspace and dropped in 0004.
+
+Workspaces are processed in chunks, each in its own transaction, so the migration doesn't hold locks on the whole
+user table. Values already present on a workspace (fetched by team.info) win. Mappings without a workspace (the app
+isn't installed in it) keep their values in `workspace_data`.
+"""
+from django.db import migrations, models, transaction
+
+CHUNK_SIZE = 500
+
+# SlackUserMapping field -> SlackWorkspace field
+FIELDS = {
+    'workspace_name': 'name',
+    'workspace_domain': 'domain',
+    'workspace_image_34': 'image_34',
+    'workspace_image_44': 'image_44',
+    'workspace_image_68': 'image_68',
+    'workspace_image_88': 'image_88',
+    'workspace_image_102': 'image_102',
+    'workspace_image_132': 'image_132',
+    'workspace_image_230': 'image_230',
+    'workspace_image_original': 'image_original',
+}
+
+
+def chunks(queryset):
+    last_pk = None
+    while True:
+        chunk = queryset.order_by('pk')
+        if last_pk is not None:
+            chunk = chunk.filter(pk__gt=last_pk)
+        chunk = list(chunk[:CHUNK_SIZE])
+        if not chunk:
+            return
+        yield chunk
+        last_pk = chunk[-1].pk
+
+
+def copy_to_workspace(apps, schema_editor):
+    SlackWorkspace = apps.get_model('slack_app', 'SlackWorkspace')
+    SlackUserMapping = apps.get_model('slack_app', 'SlackUserMapping')
+
+    for workspaces in chunks(SlackWorkspace.objects.only('pk', *FIELDS.values())):
+        changed = []
+        for workspace in workspaces:
+            source = SlackUserMapping.objects.filter(slack_workspace_id=workspace.pk) \
+                .exclude(workspace_name__isnull=True).exclude(workspace_name='') \
+                .order_by(models.F('metadata_refreshed_at').desc(nulls_last=True)) \
+                .values(*FIELDS).first()
+            if source is None:
+                continue
+
+            updated = False
+            for mapping_field, workspace_field in FIELDS.items():
+                if not getattr(workspace, workspace_field) and source[mapping_field]:
+                    setattr(workspace, workspace_field, source[mapping_field])
+                    updated = True
+            if updated:
+                changed.append(workspace)
+
+        with transaction.atomic():
+            SlackWorkspace.objects.bulk_update(changed, list(FIELDS.values()))
+
+    unlinked = SlackUserMapping.objects.filter(slack_workspace__isnull=True).only('pk', *FIELDS)
+    for mappings in chunks(unlinked):
+        for mapping in mappings:
+            mapping.workspace_data = {
+                workspace_field: getattr(mapping, mapping_field) for mapping_field, workspace_field in FIELDS.items()
+            }
+        with transaction.atomic():
+            SlackUserMapping.objects.bulk_update(mappings, ['workspace_data'])
+
+
+def copy_to_user_mappings(apps, schema_editor):
+    SlackWorkspace = apps.get_model('slack_app', 'SlackWorkspace')
+    SlackUserMapping = apps.get_model('slack_app', 'SlackUserMapping')
+
+    for workspaces in chunks(SlackWorkspace.objects.only('pk', *FIELDS.values())):
+        with transaction.atomic():
+            for workspace in workspaces:
+                SlackUserMapping.objects.filter(slack_workspace_id=workspace.pk).update(**{
+                    mapping_field: getattr(workspace, workspace_field)
+                    for mapping_field, workspace_field in FIELDS.items()
+                })
+
+    unlinked = SlackUserMapping.objects.filter(slack_workspace__isnull=True, workspace_data__isnull=False) \
+        .only('pk', 'workspace_data')
+    for mappings in chunks(unlinked):
+        for mapping in mappings:
+            for mapping_field, workspace_field in FIELDS.items():
+                setattr(mapping, mapping_field, mapping.workspace_data.get(workspace_field))
+        with transaction.atomic():
+            SlackUserMapping.objects.bulk_update(mappings, list(FIELDS))
+
+    # the columns are required again
+    SlackUserMapping.objects.filter(workspace_name__isnull=True).update(workspace_name='')
+    SlackUserMapping.objects.filter(workspace_domain__isnull=True).update(workspace_domain='')
+
+
+class Migration(migrations.Migration):
+    atomic = False
+
+    dependencies = [
+        ('slack_app', '0002_metadata_refreshed_at'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='slackusermapping',
+            name='workspace_name',
+            field=models.CharField(max_length=255, null=True),
+        ),
+        migrations.AlterField(
+            model_name='slackusermapping',
+            name='workspace_domain',
+            field=models.CharField(max_length=255, null=True),
+        ),
+        migrations.AddField(
+            model_name='slackusermapping',
+            name='workspace_data',
+            field=models.JSONField(null=True),
+        ),
+        migrations.RunPython(copy_to_workspace, copy_to_user_mappings),
+    ]
@@ -0,0 +1,51 @@
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('slack_app', '0003_move_workspace_fields_to_workspace'),
+    ]
+
+    operations = [
+        migrations.RemoveField(
+            model_name='slackusermapping',
+            name='workspace_name',
+        ),
+        migrations.RemoveField(
+            model_name='slackusermapping',
+            name='workspace_domain',
+        ),
+        migrations.RemoveField(
+            model_name='slackusermapping',
+            name='workspace_image_34',
+        ),
+        migrations.RemoveField(
+            model_name='slackusermapping',
+            name='workspace_image_44',
+        ),
+        migrations.RemoveField(
+            model_name='slackusermapping',
+            name='workspace_image_68',
+        ),
+        migrations.RemoveField(
+            model_name='slackusermapping',
+            name='workspace_image_88',
+        ),
+        migrations.RemoveField(
+            model_name='slackusermapping',
+            name='workspace_image_102',
+        ),
+        migrations.RemoveField(
+            model_name='slackusermapping',
+            name='workspace_image_132',
+        ),
+        migrations.RemoveField(
+            model_name='slackusermapping',
+            name='workspace_image_230',
+        ),
+        migrations.RemoveField(
+            model_name='slackusermapping',
+            name='workspace_image_original',
+        ),
+    ]
@@ -0,0 +1,28 @@
+from django.db import migrations, models
+import uuid
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('slack_app', '0004_remove_slackusermapping_workspace_fields'),
+    ]
+
+    operations = [
+        # looked up by connect_account
+        migrations.AlterField(
+            model_name='slackusermapping',
+            name='nonce',
+            field=models.UUIDField(default=uuid.uuid4, max_length=36, unique=True),
+        ),
+        # bulk update of mappings once a workspace is installed
+        migrations.AlterField(
+            model_name='slackusermapping',
+            name='slack_team_id',
+            field=models.CharField(db_index=True, max_length=255),
+        ),
+        migrations.AddIndex(
+            model_name='slackwebhook',
+            index=models.Index(fields=['workspace', 'channel_id'], name='slack_app_webhook_channel_idx'),
+        ),
+    ]
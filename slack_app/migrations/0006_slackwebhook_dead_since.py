@@ -0,0 +1,16 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('slack_app', '0005_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='slackwebhook',
+            name='dead_since',
+            field=models.DateTimeField(null=True),
+        ),
+    ]
@@ -0,0 +1,41 @@
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('slack_app', '0006_slackwebhook_dead_since'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SlackBroadcast',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('key', models.CharField(max_length=255, unique=True)),
+                ('message', models.JSONField()),
+                ('created', models.DateTimeField(auto_now_add=True)),
+                ('finished_at', models.DateTimeField(null=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='SlackBroadcastProgress',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('last_slack_user_id', models.CharField(max_length=255, null=True)),
+                ('sent', models.PositiveIntegerField(default=0)),
+                ('failed', models.PositiveIntegerField(default=0)),
+                ('finished', models.BooleanField(default=False)),
+                ('broadcast', models.ForeignKey(
+                    on_delete=django.db.models.deletion.CASCADE, related_name='progress', to='slack_app.slackbroadcast'
+                )),
+                ('workspace', models.ForeignKey(
+                    on_delete=django.db.models.deletion.CASCADE, related_name='+', to='slack_app.slackworkspace'
+                )),
+            ],
+            options={
+                'unique_together': {('broadcast', 'workspace')},
+            },
+        ),
+    ]
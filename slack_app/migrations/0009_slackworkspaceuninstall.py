@@ -0,0 +1,23 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('slack_app', '0008_slackeventpayload'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SlackWorkspaceUninstall',
+            fields=[
+                ('workspace_id', models.CharField(max_length=255, primary_key=True, serialize=False)),
+                ('workspace_name', models.CharField(blank=True, max_length=255)),
+                ('started', models.DateTimeField(auto_now_add=True)),
+                ('slack_uninstalled_at', models.DateTimeField(null=True)),
+                ('user_mappings_deleted', models.PositiveIntegerField(default=0)),
+                ('webhooks_deleted', models.PositiveIntegerField(default=0)),
+                ('finished_at', models.DateTimeField(null=True)),
+            ],
+        ),
+    ]
@@ -0,0 +1,20 @@
+# Generated by Django 4.2.30 on 2026-10-18 07:13
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('slack_app', '0009_slackworkspaceuninstall'),
+    ]
+
+    operations = [
+        # the field of 0001_initial (django.contrib.postgres JSONField, NOT NULL) is the built-in JSONField since
+        # Django 3.1, the model had lost it by mistake
+        migrations.AlterField(
+            model_name='slackworkspace',
+            name='response',
+            field=models.JSONField(null=True),
+        ),
+    ]
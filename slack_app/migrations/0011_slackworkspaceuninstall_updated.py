@@ -0,0 +1,19 @@
+# Generated by Django 4.2.30 on 2026-10-18 07:22
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('slack_app', '0010_slackworkspace_response'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='slackworkspaceuninstall',
+            name='updated',
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 4.2.30 on 2026-10-18 07:54
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('slack_app', '0011_slackworkspaceuninstall_updated'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='slackeventpayload',
+            name='team_id',
+            field=models.CharField(db_index=True, max_length=255, null=True),
+        ),
+        migrations.AddField(
+            model_name='slackworkspaceuninstall',
+            name='event_payloads_deleted',
+            field=models.PositiveIntegerField(default=0),
+        ),
+    ]
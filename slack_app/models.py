@@ -1,15 +1,20 @@
+import logging
 import uuid
-import slack
 
 from django.conf import settings
 from django.contrib.auth import get_user_model, user_logged_in
-from django.db.models.fields import json
 
-from django.db import models
-from django.db.models.signals import pre_delete
+from django.db import models, transaction
+from django.db.models.signals import pre_delete, post_init, post_save
 from django.dispatch import receiver
+from django.utils import timezone
 from slack.errors import SlackApiError
 
+from .clients import get_client, evict_client
+from .ratelimit import call_slack_api, PRIORITY_NORMAL
+
+logger = logging.getLogger(__name__)
+
 User = get_user_model()
 
 
@@ -21,7 +26,7 @@ class SlackWorkspace(models.Model):
     bot_user_id = models.CharField(max_length=255)
     last_changed = models.DateTimeField(auto_now_add=True)
     created = models.DateTimeField(auto_now_add=True)
-    response = json
+    response = models.JSONField(null=True)
 
     owners = models.ManyToManyField(User, related_name='owned_slack_workspaces')
 
@@ -39,16 +44,41 @@ class SlackWorkspace(models.Model):
     enterprise_id = models.CharField(max_length=128, null=True)
     enterprise_name = models.CharField(max_length=128, null=True)
 
+    metadata_refreshed_at = models.DateTimeField(null=True)
+
+    token_field = 'bot_access_token'
+
+    # fields written by fetch_slack_metadata, used for bulk updates
+    metadata_fields = [
+        'name', 'domain', 'enterprise_id', 'enterprise_name', 'image_34', 'image_44', 'image_68', 'image_88',
+        'image_102', 'image_132', 'image_230', 'image_original', 'image_default', 'metadata_refreshed_at',
+    ]
+
+    def uninstall(self):
+        """
+        Removes the app from Slack & deletes the workspace in the background, see uninstall.py
+        """
+        from .uninstall import schedule_uninstall
+        return schedule_uninstall(self)
+
     def get_bot_scopes(self):
         return self.scope.split(',') if self.scope else []
 
-    def update_slack_metadata(self):
+    def update_slack_metadata(self, priority=PRIORITY_NORMAL):
         """
         Called to re-fetch data about this entity from Slack API
         :return:
         """
-        client = slack.WebClient(token=self.bot_access_token)
-        res = client.team_info()
+        if self.fetch_slack_metadata(priority=priority):
+            self.save()
+
+    def fetch_slack_metadata(self, priority=PRIORITY_NORMAL) -> bool:
+        """
+        Re-fetches data about this entity from Slack API without saving it
+        :return: True if the entity was updated
+        """
+        client = get_client(self.bot_access_token)
+        res = call_slack_api(self.id, 'team.info', client.team_info, priority=priority)
 
         if res.get('ok'):
             team_data = res.get("team")
@@ -67,12 +97,33 @@ class SlackWorkspace(models.Model):
             self.image_230 = team_data.get("icon").get("image_230")
             self.image_original = team_data.get("icon").get("image_original")
             self.image_default = team_data.get("icon").get("image_default", False)
-            self.save()
+            self.metadata_refreshed_at = timezone.now()
+            return True
+
+        return False
 
     def __str__(self):
         return self.name
 
 
+class SlackWebHookQuerySet(models.QuerySet):
+
+    def alive(self):
+        return self.filter(dead_since__isnull=True)
+
+    def broadcast(self, payload, queryset=None, concurrency=None, retries=None) -> list:
+        """
+        Posts `payload` to every live webhook of `queryset` (all of them by default) concurrently,
+        see webhooks.py
+
+        :return: list of WebhookDelivery
+        """
+        from .webhooks import broadcast
+
+        queryset = self.all() if queryset is None else queryset
+        return broadcast(payload, queryset.filter(dead_since__isnull=True), concurrency=concurrency, retries=retries)
+
+
 class SlackWebHook(models.Model):
     workspace = models.ForeignKey(SlackWorkspace, on_delete=models.CASCADE, related_name='webhooks')
     channel_name = models.CharField(max_length=255)
@@ -81,13 +132,23 @@ class SlackWebHook(models.Model):
     url = models.URLField(max_length=255)
     created = models.DateTimeField(auto_now_add=True)
 
+    # set once Slack reports the hook is gone (channel archived, app removed, ...)
+    dead_since = models.DateTimeField(null=True)
+
+    objects = SlackWebHookQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['workspace', 'channel_id'], name='slack_app_webhook_channel_idx'),
+        ]
+
     def __str__(self):
         return f"{self.channel_name}@{self.workspace.name}"
 
 
 class SlackUserMapping(models.Model):
     slack_user_id = models.CharField(max_length=255, db_index=True, primary_key=True)
-    slack_team_id = models.CharField(max_length=255)
+    slack_team_id = models.CharField(max_length=255, db_index=True)
 
     # user can be null till it's unassigned
     user = models.ForeignKey(User, on_delete=models.CASCADE, null=True, related_name='slack_accounts')
@@ -96,7 +157,7 @@ class SlackUserMapping(models.Model):
     slack_workspace = models.ForeignKey(SlackWorkspace, on_delete=models.CASCADE, related_name='slack_users', null=True)
 
     access_token = models.CharField(max_length=255)
-    nonce = models.UUIDField(max_length=36, default=uuid.uuid4)
+    nonce = models.UUIDField(max_length=36, default=uuid.uuid4, unique=True)
 
     slack_email = models.EmailField(null=True)
     image_24 = models.URLField(null=True)
@@ -107,28 +168,64 @@ class SlackUserMapping(models.Model):
     image_512 = models.URLField(null=True)
     image_1024 = models.URLField(null=True)
 
-    workspace_name = models.CharField(max_length=255)
-    workspace_domain = models.CharField(max_length=255)
-    workspace_image_34 = models.URLField(null=True)
-    workspace_image_44 = models.URLField(null=True)
-    workspace_image_68 = models.URLField(null=True)
-    workspace_image_88 = models.URLField(null=True)
-    workspace_image_102 = models.URLField(null=True)
-    workspace_image_132 = models.URLField(null=True)
-    workspace_image_230 = models.URLField(null=True)
-    workspace_image_original = models.URLField(null=True)
-
-    def update_slack_metadata(self):
+    # workspace data of mappings whose workspace isn't installed (no `slack_workspace`), NULL otherwise
+    workspace_data = models.JSONField(null=True)
+
+    metadata_refreshed_at = models.DateTimeField(null=True)
+
+    token_field = 'access_token'
+
+    # fields written by fetch_slack_metadata, used for bulk updates
+    metadata_fields = [
+        'slack_email', 'image_24', 'image_32', 'image_48', 'image_72', 'image_192', 'image_512', 'image_1024',
+        'workspace_data', 'metadata_refreshed_at',
+    ]
+
+    # SlackWorkspace fields kept in `workspace_data`
+    workspace_fields = [
+        'name', 'domain', 'image_34', 'image_44', 'image_68', 'image_88', 'image_102', 'image_132', 'image_230',
+        'image_original',
+    ]
+
+    # workspace data used to be copied into every mapping, it's read from `slack_workspace` now
+    # (use select_related('slack_workspace') when reading them for many mappings)
+    def _get_workspace_field(field_name):
+        def getter(self):
+            if self.slack_workspace_id:
+                return getattr(self.slack_workspace, field_name)
+            return (self.workspace_data or {}).get(field_name)
+        return property(getter)
+
+    workspace_name = _get_workspace_field('name')
+    workspace_domain = _get_workspace_field('domain')
+    workspace_image_34 = _get_workspace_field('image_34')
+    workspace_image_44 = _get_workspace_field('image_44')
+    workspace_image_68 = _get_workspace_field('image_68')
+    workspace_image_88 = _get_workspace_field('image_88')
+    workspace_image_102 = _get_workspace_field('image_102')
+    workspace_image_132 = _get_workspace_field('image_132')
+    workspace_image_230 = _get_workspace_field('image_230')
+    workspace_image_original = _get_workspace_field('image_original')
+    del _get_workspace_field
+
+    def update_slack_metadata(self, priority=PRIORITY_NORMAL):
         """
         Called to re-fetch data about this entity from Slack API
         :return:
         """
-        client = slack.WebClient(token=self.access_token)
-        res = client.users_identity()
+        if self.fetch_slack_metadata(priority=priority):
+            self.save()
+
+    def fetch_slack_metadata(self, priority=PRIORITY_NORMAL) -> bool:
+        """
+        Re-fetches data about this entity from Slack API without saving it
+        :return: True if the entity was updated
+        """
+        client = get_client(self.access_token)
+        res = call_slack_api(self.slack_team_id, 'users.identity', client.users_identity, priority=priority)
 
         if res.get('ok'):
             user_data = res.get("user")
-            team_data = res.get("team")
 
             self.name = user_data.get("name")
             self.slack_email = user_data.get("email")
@@ -141,48 +238,140 @@ class SlackUserMapping(models.Model):
             self.image_512 = user_data.get("image_512")
             self.image_1024 = user_data.get("image_1024")
 
-            self.workspace_name = team_data.get("name")
-            self.workspace_domain = team_data.get("domain")
-            self.workspace_image_34 = team_data.get("image_34")
-            self.workspace_image_44 = team_data.get("image_44")
-            self.workspace_image_68 = team_data.get("image_68")
-            self.workspace_image_88 = team_data.get("image_88")
-            self.workspace_image_102 = team_data.get("image_102")
-            self.workspace_image_132 = team_data.get("image_132")
-            self.workspace_image_230 = team_data.get("image_230")
-            self.workspace_image_original = team_data.get("image_original")
+            if not self.slack_workspace_id:
+                team_data = res.get("team") or {}
+                self.workspace_data = {field: team_data.get(field) for field in self.workspace_fields}
 
-            self.save()
+            self.metadata_refreshed_at = timezone.now()
+            return True
+
+        return False
 
     def __str__(self):
         username = self.user.username if self.user else 'Unassigned Account'
         return username
 
 
+class SlackBroadcast(models.Model):
+    """
+    Direct message sent to many Slack users, see broadcast.py
+    """
+    key = models.CharField(max_length=255, unique=True)
+    message = models.JSONField()
+    created = models.DateTimeField(auto_now_add=True)
+    finished_at = models.DateTimeField(null=True)
+
+    def __str__(self):
+        return self.key
+
+
+class SlackBroadcastProgress(models.Model):
+    """
+    Checkpoint of a broadcast within a workspace, recipients are processed in the order of their Slack user id
+    """
+    broadcast = models.ForeignKey(SlackBroadcast, on_delete=models.CASCADE, related_name='progress')
+    workspace = models.ForeignKey(SlackWorkspace, on_delete=models.CASCADE, related_name='+')
+    last_slack_user_id = models.CharField(max_length=255, null=True)
+    sent = models.PositiveIntegerField(default=0)
+    failed = models.PositiveIntegerField(default=0)
+    finished = models.BooleanField(default=False)
+
+    class Meta:
+        unique_together = [('broadcast', 'workspace')]
+
+
+class SlackEventPayload(models.Model):
+    """
+    Large Slack event stored by the claim-check, see claimcheck.py
+    """
+    key = models.CharField(max_length=32, primary_key=True)
+    data = models.BinaryField()
+    expires_at = models.DateTimeField(db_index=True)
+    team_id = models.CharField(max_length=255, null=True, db_index=True)  # deleted by the workspace's uninstall
+
+
+class SlackWorkspaceUninstall(models.Model):
+    """
+    Progress of a workspace uninstall, see uninstall.py. Kept once the workspace is gone.
+    """
+    workspace_id = models.CharField(max_length=255, primary_key=True)
+    workspace_name = models.CharField(max_length=255, blank=True)
+    started = models.DateTimeField(auto_now_add=True)
+    updated = models.DateTimeField(default=timezone.now)  # last progress
+    slack_uninstalled_at = models.DateTimeField(null=True)
+    user_mappings_deleted = models.PositiveIntegerField(default=0)
+    webhooks_deleted = models.PositiveIntegerField(default=0)
+    event_payloads_deleted = models.PositiveIntegerField(default=0)
+    finished_at = models.DateTimeField(null=True)
+
+    def __str__(self):
+        return self.workspace_name or self.workspace_id
+
+
 @receiver(pre_delete, sender=SlackWorkspace)
 def post_delete_slack_workspace(instance, *args, **kwargs):
     """
     Once the application is removed from Django, let's remove it from Slack's workspace
+    (unless the uninstall pipeline did so already, see uninstall.py)
     """
-    client = slack.WebClient(token=instance.bot_access_token)
+    if getattr(instance, '_slack_uninstalled', False):
+        return
+
+    client = get_client(instance.bot_access_token)
     try:
-        client.api_call('apps.uninstall', params={
+        call_slack_api(instance.id, 'apps.uninstall', client.api_call, 'apps.uninstall', params={
             "client_id": settings.SLACK_CLIENT_ID,
             "client_secret": settings.SLACK_CLIENT_SECRET,
         })
     except SlackApiError:
         # for now fail silently
         pass
+    finally:
+        evict_client(instance.bot_access_token)
+
+
+@receiver(pre_delete, sender=SlackUserMapping)
+def evict_slack_user_mapping_client(instance, *args, **kwargs):
+    evict_client(instance.access_token)
+
+
+@receiver(post_init, sender=SlackWorkspace)
+@receiver(post_init, sender=SlackUserMapping)
+def remember_slack_token(sender, instance, **kwargs):
+    # __dict__ is used to avoid loading a deferred field
+    instance._loaded_slack_token = instance.__dict__.get(sender.token_field)
+
+
+@receiver(post_save, sender=SlackWorkspace)
+@receiver(post_save, sender=SlackUserMapping)
+def evict_changed_slack_token(sender, instance, **kwargs):
+    """
+    Once a token is replaced (e.g. the app is re-installed), the client using the old one is useless
+    """
+    loaded_token = getattr(instance, '_loaded_slack_token', None)
+    current_token = instance.__dict__.get(sender.token_field)
+    if loaded_token and loaded_token != current_token:
+        evict_client(loaded_token)
+    instance._loaded_slack_token = current_token
 
 
 @receiver(user_logged_in)
 def refetch_user_slack_metadata(sender, user, request, **kwargs):
     """
-    We will re-fetch user's data after a successful login.
+    We will re-fetch user's data after a successful login, in the background and only if they are stale.
     """
-    for slack_user in user.slack_accounts.all():
+    from .metadata import get_stale
+    from .tasks import refresh_slack_metadata_task
+
+    slack_user_ids = list(get_stale(user.slack_accounts.all()).values_list('pk', flat=True))
+    if not slack_user_ids:
+        return
+
+    def schedule_refresh():
         try:
-            slack_user.update_slack_metadata()
-        except:
-            # for now fail silently, since this is login related, we should catch all errors just to be sure
-            pass
+            refresh_slack_metadata_task.delay(slack_user_ids=slack_user_ids)
+        except Exception:
+            # since this is login related, we should catch all errors (e.g. broker being down) just to be sure
+            logger.exception("Unable to schedule Slack metadata refresh of %s", slack_user_ids)
+
+    transaction.on_commit(schedule_refresh)
@@ -0,0 +1,354 @@
+"""
+Payloads of slash commands, interactivity and events passed to handlers.
+
+Command & interactivity handlers get `HandlerPayload`s: dicts, so handlers written for the plain dict (or the
+command's QueryDict) they used to get keep working, including mutating it, `json.dumps` and passing it to Celery.
+The dict is filled from the raw payload on first use, properties read the raw payload till then. They expose the
+commonly used fields and only look the values up on access, no nested objects are built.
+
+Events are read-only `SlackPayload` mappings holding the raw payload, decoded on the first access only. Both decode
+with `orjson` when it's installed.
+"""
+import json
+from collections.abc import Mapping
+from typing import Optional, Union
+
+try:
+    import orjson
+
+    JSON_BACKEND = 'orjson'
+
+    def loads(data: Union[str, bytes]):
+        return orjson.loads(data)
+except ImportError:
+    JSON_BACKEND = 'json'
+
+    def loads(data: Union[str, bytes]):
+        return json.loads(data)
+
+
+def decode(raw) -> dict:
+    """
+    :param raw: JSON (str or bytes), a dict or a QueryDict
+    """
+    if isinstance(raw, (str, bytes, bytearray, memoryview)):
+        return loads(raw)
+    if hasattr(raw, 'getlist'):
+        # QueryDict, the last value of each key, as QueryDict.get returns
+        return raw.dict()
+    return raw
+
+
+class SlackPayload(Mapping):
+    __slots__ = ('_raw', '_data')
+
+    def __init__(self, raw):
+        """
+        :param raw: JSON (str or bytes), a dict or a QueryDict
+        """
+        self._raw = raw
+        self._data = None
+
+    @property
+    def data(self) -> dict:
+        if self._data is None:
+            self._data = decode(self._raw)
+        return self._data
+
+    def __getitem__(self, key):
+        return self.data[key]
+
+    def __iter__(self):
+        return iter(self.data)
+
+    def __len__(self):
+        return len(self.data)
+
+    def dict(self) -> dict:
+        """
+        Plain dict of the payload, e.g. to be sent to Celery
+        """
+        return dict(self.data)
+
+    def __repr__(self):
+        return f"{self.__class__.__name__}({self.data!r})"
+
+
+class HandlerPayload(dict):
+    """
+    Dict of the payload, filled from the raw payload on the first access through the dict API. Till then properties
+    read the raw payload if it's a mapping (the command's QueryDict, an already decoded interactivity payload), so
+    nothing is copied for code which doesn't need the dict.
+
+    `json.dumps`, orjson & Celery's serializers read a dict's storage directly, without calling its methods, so
+    `fill()` it before handing it over to such code. `run_handler` does so for handlers.
+    """
+    __slots__ = ('_raw', '_filled')
+
+    def __init__(self, raw):
+        """
+        :param raw: JSON (str or bytes), a dict or a QueryDict
+        """
+        super().__init__()
+        self._raw = raw
+        self._filled = False
+
+    def fill(self) -> 'HandlerPayload':
+        if not self._filled:
+            raw = self._raw
+            if isinstance(raw, (str, bytes, bytearray, memoryview)):
+                raw = loads(raw)
+            # QueryDict.items() yields the last value of each key, as QueryDict.get returns
+            dict.update(self, raw.items() if hasattr(raw, 'getlist') else raw)
+            self._filled = True
+        return self
+
+    @property
+    def data(self):
+        """
+        Mapping read by the properties, the raw payload till the dict is filled
+        """
+        if self._filled or isinstance(self._raw, (str, bytes, bytearray, memoryview)):
+            return self.fill()
+        return self._raw
+
+    def dict(self) -> dict:
+        """
+        Plain dict of the payload, e.g. to be sent to Celery
+        """
+        data = self.data
+        if data is self:
+            return dict.copy(self)
+        return dict(data.items()) if hasattr(data, 'getlist') else dict(data)
+
+    def __reduce__(self):
+        return self.__class__, (self.dict(),)
+
+    def __repr__(self):
+        return f"{self.__class__.__name__}({dict.__repr__(self.fill())})"
+
+    def _filled_first(name):
+        method = getattr(dict, name)
+
+        def filled_first(self, *args, **kwargs):
+            return method(self.fill(), *args, **kwargs)
+
+        filled_first.__name__ = name
+        return filled_first
+
+    __getitem__ = _filled_first('__getitem__')
+    __setitem__ = _filled_first('__setitem__')
+    __delitem__ = _filled_first('__delitem__')
+    __contains__ = _filled_first('__contains__')
+    __iter__ = _filled_first('__iter__')
+    __reversed__ = _filled_first('__reversed__')
+    __len__ = _filled_first('__len__')
+    __eq__ = _filled_first('__eq__')
+    __ne__ = _filled_first('__ne__')
+    __or__ = _filled_first('__or__')
+    __ror__ = _filled_first('__ror__')
+    __ior__ = _filled_first('__ior__')
+    get = _filled_first('get')
+    keys = _filled_first('keys')
+    values = _filled_first('values')
+    items = _filled_first('items')
+    copy = _filled_first('copy')
+    pop = _filled_first('pop')
+    popitem = _filled_first('popitem')
+    setdefault = _filled_first('setdefault')
+    update = _filled_first('update')
+    clear = _filled_first('clear')
+    del _filled_first
+
+
+class CommandPayload(HandlerPayload):
+    """
+    https://api.slack.com/interactivity/slash-commands#app_command_handling
+    """
+    __slots__ = ()
+
+    def getlist(self, key) -> list:
+        if hasattr(self._raw, 'getlist'):
+            return self._raw.getlist(key)
+        return [self.data[key]] if key in self.data else []
+
+    @property
+    def command(self) -> Optional[str]:
+        return self.data.get('command')
+
+    @property
+    def text(self) -> str:
+        return self.data.get('text', '')
+
+    @property
+    def team_id(self) -> Optional[str]:
+        return self.data.get('team_id')
+
+    @property
+    def user_id(self) -> Optional[str]:
+        return self.data.get('user_id')
+
+    @property
+    def channel_id(self) -> Optional[str]:
+        return self.data.get('channel_id')
+
+    @property
+    def response_url(self) -> Optional[str]:
+        return self.data.get('response_url')
+
+    @property
+    def trigger_id(self) -> Optional[str]:
+        return self.data.get('trigger_id')
+
+    def get_form(self):
+        """
+        Bound SlackCommandForm, to validate the payload
+        """
+        from .forms import SlackCommandForm
+        return SlackCommandForm(self._raw if hasattr(self._raw, 'getlist') else self.data)
+
+
+class InteractivityPayload(HandlerPayload):
+    """
+    https://api.slack.com/reference/interaction-payloads
+    """
+    __slots__ = ()
+
+    @property
+    def type(self) -> Optional[str]:
+        return self.data.get('type')
+
+    @property
+    def team_id(self) -> Optional[str]:
+        return (self.data.get('team') or {}).get('id')
+
+    @property
+    def user_id(self) -> Optional[str]:
+        return (self.data.get('user') or {}).get('id')
+
+    @property
+    def response_url(self) -> Optional[str]:
+        return self.data.get('response_url')
+
+    @property
+    def trigger_id(self) -> Optional[str]:
+        return self.data.get('trigger_id')
+
+    @property
+    def callback_id(self) -> Optional[str]:
+        return self.data.get('callback_id')
+
+
+class BlockActionsPayload(InteractivityPayload):
+    __slots__ = ()
+
+    @property
+    def actions(self) -> list:
+        return self.data.get('actions') or []
+
+    @property
+    def action(self) -> dict:
+        """
+        The first action, Slack sends one action per payload
+        """
+        actions = self.actions
+        return actions[0] if actions else {}
+
+    @property
+    def action_id(self) -> Optional[str]:
+        return self.action.get('action_id')
+
+    @property
+    def block_id(self) -> Optional[str]:
+        return self.action.get('block_id')
+
+    @property
+    def value(self):
+        action = self.action
+        if 'value' in action:
+            return action['value']
+        return (action.get('selected_option') or {}).get('value')
+
+    @property
+    def state_values(self) -> dict:
+        return (self.data.get('state') or {}).get('values') or {}
+
+
+class ViewPayload(InteractivityPayload):
+    """
+    view_submission & view_closed
+    """
+    __slots__ = ()
+
+    @property
+    def view(self) -> dict:
+        return self.data.get('view') or {}
+
+    @property
+    def callback_id(self) -> Optional[str]:
+        return self.view.get('callback_id')
+
+    @property
+    def private_metadata(self) -> Optional[str]:
+        return self.view.get('private_metadata')
+
+    @property
+    def state_values(self) -> dict:
+        return (self.view.get('state') or {}).get('values') or {}
+
+    def get_value(self, block_id: str, action_id: str):
+        """
+        Submitted value of an input element, the selected option's value for selects
+        """
+        element = self.state_values.get(block_id, {}).get(action_id) or {}
+        if 'value' in element:
+            return element['value']
+        if element.get('selected_option'):
+            return element['selected_option'].get('value')
+        return element.get('selected_date') or element.get('selected_user') or element.get('selected_channel') \
+            or element.get('selected_conversation') or element.get('selected_options')
+
+
+INTERACTIVITY_PAYLOAD_CLASSES = {
+    'block_actions': BlockActionsPayload,
+    'view_submission': ViewPayload,
+    'view_closed': ViewPayload,
+}
+
+
+def parse_interactivity_payload(raw) -> InteractivityPayload:
+    """
+    The JSON is decoded right away, its type selects the class, the payload dict is only filled on access
+
+    :param raw: value of the `payload` form field (JSON) or an already decoded dict
+    """
+    data = decode(raw)
+    payload_class = INTERACTIVITY_PAYLOAD_CLASSES.get(data.get('type'), InteractivityPayload)
+    return payload_class(data)
+
+
+class EventPayload(SlackPayload):
+    """
+    https://api.slack.com/types/event
+    """
+    __slots__ = ()
+
+    @property
+    def type(self) -> Optional[str]:
+        return self.data.get('type')
+
+    @property
+    def event(self) -> dict:
+        return self.data.get('event') or {}
+
+    @property
+    def event_type(self) -> Optional[str]:
+        return self.event.get('type')
+
+    @property
+    def event_id(self) -> Optional[str]:
+        return self.data.get('event_id')
+
+    @property
+    def team_id(self) -> Optional[str]:
+        return self.data.get('team_id')
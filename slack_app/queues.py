@@ -0,0 +1,85 @@
+"""
+Routing of Slack events to Celery queues & priorities.
+
+SLACK_EVENT_ROUTES maps event types (`*` for the rest) to `apply_async` options, SLACK_EVENT_WORKSPACE_ROUTES does
+the same per workspace and wins over the event type. E.g. to keep `app_home_opened` fast during a flood of messages,
+route it to a queue served by its own workers:
+
+    SLACK_EVENT_ROUTES = {"app_home_opened": {"queue": "slack_priority", "priority": 9}}
+
+Per-workspace fairness (SLACK_EVENT_FAIR_SHARE events/sec) moves events of a workspace exceeding its share
+to SLACK_EVENT_OVERFLOW_QUEUE, so a noisy workspace delays only itself. The share is counted per web process.
+"""
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Optional
+
+from . import metrics
+from .settings import SLACK_EVENT_ROUTES, SLACK_EVENT_WORKSPACE_ROUTES, SLACK_EVENT_FAIR_SHARE, \
+    SLACK_EVENT_FAIR_SHARE_BURST, SLACK_EVENT_OVERFLOW_QUEUE
+
+
+class WorkspaceFairness:
+    """
+    Token bucket per workspace, refilled at `rate` tokens per second up to `burst`
+    """
+
+    def __init__(self, rate: float, burst: float, clock: Callable[[], float] = time.monotonic, max_workspaces=10000):
+        self.rate = rate
+        self.burst = burst
+        self.clock = clock
+        self.max_workspaces = max_workspaces
+        self._buckets = OrderedDict()  # team id -> (tokens, updated), least recently seen first
+        self._lock = threading.Lock()
+
+    def allow(self, team_id: str) -> bool:
+        now = self.clock()
+        with self._lock:
+            tokens, updated = self._buckets.get(team_id, (self.burst, now))
+            tokens = min(self.burst, tokens + (now - updated) * self.rate)
+            allowed = tokens >= 1
+            self._buckets[team_id] = (tokens - 1 if allowed else tokens, now)
+            self._buckets.move_to_end(team_id)
+            if len(self._buckets) > self.max_workspaces:
+                # the least recently seen workspace, the closest to full burst again
+                self._buckets.popitem(last=False)
+            return allowed
+
+
+class EventQueueRouter:
+
+    def __init__(self, routes: dict, workspace_routes: dict, fairness: Optional[WorkspaceFairness] = None,
+                 overflow_queue: Optional[str] = None):
+        self.routes = routes
+        self.workspace_routes = workspace_routes
+        self.fairness = fairness
+        self.overflow_queue = overflow_queue
+
+    def is_routed(self, event_type: str, team_id: Optional[str] = None) -> bool:
+        return event_type in self.routes or '*' in self.routes \
+            or (team_id in self.workspace_routes if team_id else False)
+
+    def get_options(self, event_type: str, team_id: Optional[str] = None) -> dict:
+        """
+        Returns `apply_async` options (queue, priority, ...) of the event
+        """
+        options = dict(self.routes.get(event_type) or self.routes.get('*') or {})
+        if team_id and team_id in self.workspace_routes:
+            options.update(self.workspace_routes[team_id])
+
+        if self.fairness is not None and team_id and event_type not in self.routes \
+                and not self.fairness.allow(team_id):
+            # explicitly routed (priority) event types are never moved
+            options['queue'] = self.overflow_queue
+            metrics.incr('slack_events_overflowed', event_type=event_type)
+
+        return options
+
+
+event_queue_router = EventQueueRouter(
+    SLACK_EVENT_ROUTES,
+    SLACK_EVENT_WORKSPACE_ROUTES,
+    WorkspaceFairness(SLACK_EVENT_FAIR_SHARE, SLACK_EVENT_FAIR_SHARE_BURST) if SLACK_EVENT_FAIR_SHARE else None,
+    SLACK_EVENT_OVERFLOW_QUEUE,
+)
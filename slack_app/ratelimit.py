@@ -0,0 +1,286 @@
+"""
+Outbound scheduler honouring Slack's tiered rate limits.
+https://api.slack.com/docs/rate-limits
+
+Every Slack Web API call made by the package goes through `call_slack_api`. Calls of a bucket per
+(workspace, method tier) are counted in windows of about WINDOW seconds, each allowing its share of the tier's
+rate per minute; calls over it wait for the next window. After an HTTP 429 the whole bucket waits for `Retry-After`.
+Tiers limited per channel (chat.postMessage) get a bucket per `scope` and share a workspace-wide budget on top.
+
+Counters live in the Django cache and are updated with `add` & `incr`, so they're shared by web and Celery
+processes, and atomic across them on backends with atomic increments (Redis, Memcached, local memory).
+
+Waiters of a bucket are served by priority within a process. Low priority calls (background metadata refreshes,
+broadcasts) also leave a reserve of the window to interactive ones.
+"""
+import heapq
+import itertools
+import threading
+import time
+from typing import Callable, Optional
+
+from django.core.cache import caches
+from slack.errors import SlackApiError
+
+from . import metrics
+from .settings import SLACK_RATE_LIMIT_ENABLED, SLACK_RATE_LIMIT_CACHE_ALIAS, SLACK_RATE_LIMIT_TIERS, \
+    SLACK_RATE_LIMIT_METHOD_TIERS, SLACK_RATE_LIMIT_MAX_RETRIES, SLACK_RATE_LIMIT_LOW_PRIORITY_RESERVE
+
+PRIORITY_HIGH = 0
+PRIORITY_NORMAL = 1
+PRIORITY_LOW = 2
+
+# seconds, bursts are limited to the share of a tier's rate per window
+WINDOW = 10
+
+# requests per minute
+TIERS = {
+    1: 1,
+    2: 20,
+    3: 50,
+    4: 100,
+    'post_message': 60,  # chat.postMessage allows ~1 message per second per channel
+    'post_message_workspace': 300,  # ... and several hundred messages per minute per workspace
+    **SLACK_RATE_LIMIT_TIERS,
+}
+
+# tier of a per-channel limit -> tier of the workspace-wide budget its calls count against as well
+WORKSPACE_TIERS = {
+    'post_message': 'post_message_workspace',
+}
+
+METHOD_TIERS = {
+    'apps.uninstall': 1,
+    'apps.connections.open': 1,
+    'team.info': 3,
+    'conversations.open': 3,
+    'users.identity': 4,
+    'views.publish': 4,
+    'oauth.access': 4,
+    'oauth.v2.access': 4,
+    'chat.postMessage': 'post_message',
+    **SLACK_RATE_LIMIT_METHOD_TIERS,
+}
+DEFAULT_TIER = 3
+
+
+def get_retry_after(err: SlackApiError) -> Optional[float]:
+    """
+    Returns number of seconds to wait if the error is Slack's HTTP 429, None otherwise
+    """
+    response = getattr(err, 'response', None)
+    if response is None or getattr(response, 'status_code', None) != 429:
+        return None
+
+    headers = getattr(response, 'headers', None) or {}
+    retry_after = headers.get('Retry-After') or headers.get('retry-after') or 1
+    return float(retry_after)
+
+
+class Bucket:
+    """
+    Calls allowed per window of `period` seconds
+    """
+
+    def __init__(self, key: str, rate: int):
+        self.key = key
+        self.limit = max(1, int(rate * WINDOW / 60))
+        self.period = self.limit * 60 / rate
+
+
+class BucketWaiters:
+    """
+    Waiters of a bucket within this process
+    """
+
+    def __init__(self):
+        self.condition = threading.Condition()
+        self.heap = []  # (priority, sequence)
+        self.users = 0
+
+
+class SlackApiScheduler:
+
+    def __init__(self, cache_alias: str, max_retries: int, low_priority_reserve: float):
+        self.cache_alias = cache_alias
+        self.max_retries = max_retries
+        self.low_priority_reserve = low_priority_reserve
+        self._lock = threading.Lock()  # guards _waiters & _queue_depth only, never held during cache I/O
+        self._waiters = {}  # bucket key -> BucketWaiters
+        self._queue_depth = 0
+        self._sequence = itertools.count()
+
+    @property
+    def cache(self):
+        return caches[self.cache_alias]
+
+    def get_bucket(self, workspace_id, method: str, scope=None) -> Bucket:
+        tier = METHOD_TIERS.get(method, DEFAULT_TIER)
+        key = f"slack_app:ratelimit:{workspace_id or '-'}:{tier}"
+        if scope:
+            key = f"{key}:{scope}"
+        return Bucket(key, TIERS[tier])
+
+    def get_buckets(self, workspace_id, method: str, scope=None) -> list:
+        """
+        Buckets a call has to get through: its own and the workspace-wide budget of its tier, if there is one
+        """
+        buckets = [self.get_bucket(workspace_id, method, scope)]
+        workspace_tier = WORKSPACE_TIERS.get(METHOD_TIERS.get(method, DEFAULT_TIER))
+        if workspace_tier is not None:
+            key = f"slack_app:ratelimit:{workspace_id or '-'}:{workspace_tier}"
+            buckets.append(Bucket(key, TIERS[workspace_tier]))
+        return buckets
+
+    def get_reserve(self, bucket: Bucket, priority) -> int:
+        if priority < PRIORITY_LOW:
+            return 0
+        # a bucket of a single call per window can't leave anything aside
+        return min(int(bucket.limit * self.low_priority_reserve), bucket.limit - 1)
+
+    def _take(self, bucket: Bucket, reserve: int = 0) -> float:
+        """
+        Counts a call in the current window. Returns 0 on success, otherwise number of seconds to wait.
+        """
+        now = time.time()
+        blocked_until = self.cache.get(f"{bucket.key}:blocked")
+        if blocked_until and blocked_until > now:
+            return blocked_until - now
+
+        window = int(now // bucket.period)
+        key = f"{bucket.key}:{window}"
+        timeout = int(bucket.period) + 1
+        if self.cache.add(key, 1, timeout):
+            count = 1
+        else:
+            try:
+                count = self.cache.incr(key)
+            except ValueError:
+                # the window has just expired
+                self.cache.add(key, 1, timeout)
+                count = 1
+
+        if count <= bucket.limit - reserve:
+            return 0
+
+        # give the call back, so waiting calls don't use up the window of others
+        try:
+            self.cache.decr(key)
+        except ValueError:
+            pass
+        return (window + 1) * bucket.period - now
+
+    def _enter(self, key: str) -> BucketWaiters:
+        with self._lock:
+            waiters = self._waiters.get(key)
+            if waiters is None:
+                waiters = self._waiters[key] = BucketWaiters()
+            waiters.users += 1
+            self._queue_depth += 1
+            depth = self._queue_depth
+        metrics.set_gauge('slack_outbound_queue_depth', depth)
+        return waiters
+
+    def _leave(self, key: str, waiters: BucketWaiters):
+        with self._lock:
+            waiters.users -= 1
+            if not waiters.users:
+                del self._waiters[key]
+            self._queue_depth -= 1
+            depth = self._queue_depth
+        metrics.set_gauge('slack_outbound_queue_depth', depth)
+
+    def acquire(self, workspace_id, method: str, priority=PRIORITY_NORMAL, scope=None) -> float:
+        """
+        Blocks till the call is allowed to go out. Returns number of seconds spent waiting.
+        """
+        started = time.monotonic()
+        for bucket in self.get_buckets(workspace_id, method, scope):
+            self._acquire(bucket, priority)
+
+        waited = time.monotonic() - started
+        metrics.observe('slack_outbound_wait_seconds', waited, method=method)
+        return waited
+
+    def _acquire(self, bucket: Bucket, priority):
+        reserve = self.get_reserve(bucket, priority)
+        ticket = (priority, next(self._sequence))
+
+        waiters = self._enter(bucket.key)
+        with waiters.condition:
+            heapq.heappush(waiters.heap, ticket)
+            # a call of higher priority may take the turn of the current head
+            waiters.condition.notify_all()
+        try:
+            while True:
+                with waiters.condition:
+                    while waiters.heap[0] != ticket:
+                        waiters.condition.wait(timeout=1)
+
+                # only the head of the bucket talks to the cache, without holding any lock
+                wait = self._take(bucket, reserve)
+                if wait <= 0:
+                    break
+
+                with waiters.condition:
+                    waiters.condition.wait(timeout=min(wait, 1))
+        finally:
+            with waiters.condition:
+                waiters.heap.remove(ticket)
+                heapq.heapify(waiters.heap)
+                waiters.condition.notify_all()
+            self._leave(bucket.key, waiters)
+
+    def block(self, workspace_id, method: str, seconds: float, scope=None):
+        # a 429 doesn't tell which limit was hit, the workspace-wide budget waits as well
+        for bucket in self.get_buckets(workspace_id, method, scope):
+            self.cache.set(f"{bucket.key}:blocked", time.time() + seconds, int(seconds) + 1)
+
+    def call(self, workspace_id, method: str, func: Callable, *args, priority=PRIORITY_NORMAL, scope=None, **kwargs):
+        attempt = 0
+        while True:
+            self.acquire(workspace_id, method, priority, scope)
+            try:
+                return func(*args, **kwargs)
+            except SlackApiError as err:
+                retry_after = get_retry_after(err)
+                if retry_after is None:
+                    raise
+
+                metrics.incr('slack_outbound_rate_limited', method=method)
+                self.block(workspace_id, method, retry_after, scope)
+                attempt += 1
+                if attempt > self.max_retries:
+                    raise
+
+
+scheduler = SlackApiScheduler(
+    SLACK_RATE_LIMIT_CACHE_ALIAS,
+    SLACK_RATE_LIMIT_MAX_RETRIES,
+    SLACK_RATE_LIMIT_LOW_PRIORITY_RESERVE,
+)
+
+
+def timed_call(method: str, func: Callable, *args, **kwargs):
+    try:
+        with metrics.timer('slack_api_call_seconds', method=method):
+            return func(*args, **kwargs)
+    except SlackApiError as err:
+        error = err.response.get('error') if getattr(err, 'response', None) is not None else None
+        metrics.incr('slack_api_errors', method=method, error=error or 'unknown')
+        raise
+
+
+def call_slack_api(workspace_id, method: str, func: Callable, *args, priority=PRIORITY_NORMAL, scope=None, **kwargs):
+    """
+    Calls `func` (a bound WebClient method for the Slack API `method`) within the workspace's rate budget.
+
+    :param workspace_id: Slack team id, None for calls made before we know it (OAuth)
+    :param method: Slack API method name, e.g. 'views.publish'
+    :param scope: optional extra bucket key, e.g. a channel id for chat.postMessage
+    """
+    if not SLACK_RATE_LIMIT_ENABLED:
+        return timed_call(method, func, *args, **kwargs)
+
+    return scheduler.call(workspace_id, method, timed_call, method, func, *args, priority=priority, scope=scope,
+                          **kwargs)
@@ -0,0 +1,126 @@
+"""
+Routes `slack_event_received` to the receivers registered with `on_slack_signal`.
+
+A single signal receiver looks up the matching receivers by event type and builds one SlackEventContext
+per event, so Slack models are resolved at most once per event and only if some receiver asked for them.
+"""
+import threading
+from collections import defaultdict
+from typing import Callable, Iterable, List, Optional, Tuple
+
+from django.utils.functional import cached_property
+
+from . import metrics
+from .cache import get_user_mapping, get_workspace
+from .models import SlackUserMapping, SlackWorkspace
+from .signals import slack_event_received, slack_event_batch_received
+
+
+class SlackEventContext:
+    """
+    Shared by all receivers of a single event. Slack models are resolved lazily on the first access.
+    """
+
+    def __init__(self, sender, event_type: str, event_data: dict, **data):
+        self.sender = sender
+        self.event_type = event_type
+        self.event_data = event_data
+        self.data = data
+
+    @property
+    def team_id(self) -> Optional[str]:
+        return self.data.get('team_id')
+
+    @property
+    def user_id(self) -> Optional[str]:
+        user = self.event_data.get('user')
+        # a few events (e.g. user_change) carry the whole user object
+        return user.get('id') if isinstance(user, dict) else user
+
+    @cached_property
+    def slack_user_mapping(self) -> Optional[SlackUserMapping]:
+        return get_user_mapping(self.user_id) if self.user_id else None
+
+    @cached_property
+    def slack_workspace(self) -> Optional[SlackWorkspace]:
+        return get_workspace(self.team_id) if self.team_id else None
+
+    def get_slack_models(self) -> dict:
+        return {
+            "slack_user_mapping": self.slack_user_mapping,
+            "slack_workspace": self.slack_workspace,
+        }
+
+
+class SlackEventRouter:
+    """
+    Index of event receivers by event type.
+    """
+
+    def __init__(self):
+        self._receivers = defaultdict(list)
+        self._lock = threading.Lock()
+
+    def register(self, event_types: Iterable[str], receiver_func: Callable, inject_slack_models=False, batch=False):
+        with self._lock:
+            for event_type in event_types:
+                self._receivers[event_type].append((receiver_func, inject_slack_models, batch))
+
+    def get_receivers(self, event_type: str) -> List[Tuple[Callable, bool, bool]]:
+        return self._receivers.get(event_type, [])
+
+    def dispatch(self, sender, event_type: str, event_data: dict, slack_batch=False, **kwargs) -> list:
+        """
+        :param slack_batch: the event is a part of a batch, receivers accepting lists get it from `dispatch_batch`
+        """
+        kwargs.pop('signal', None)
+        receivers = self.get_receivers(event_type)
+        if not receivers:
+            return []
+
+        context = SlackEventContext(sender, event_type, event_data, **kwargs)
+        responses = []
+        for receiver_func, inject_slack_models, batch in receivers:
+            if batch and slack_batch:
+                continue
+
+            with metrics.track_handler('event', receiver_func):
+                if batch:
+                    response = receiver_func(sender, event_type=event_type, events=[context])
+                else:
+                    slack_models = context.get_slack_models() if inject_slack_models else {}
+                    response = receiver_func(
+                        sender,
+                        event_data=event_data,
+                        event_type=event_type,
+                        slack_context=context,
+                        **slack_models,
+                        **kwargs
+                    )
+            responses.append((receiver_func, response))
+
+        return responses
+
+    def dispatch_batch(self, sender, events: List[dict], **kwargs) -> list:
+        """
+        Calls receivers registered with `batch=True` once per event type with all events of that type
+        """
+        contexts = defaultdict(list)
+        for event in events:
+            contexts[event['event_type']].append(SlackEventContext(**event))
+
+        responses = []
+        for event_type, event_contexts in contexts.items():
+            for receiver_func, inject_slack_models, batch in self.get_receivers(event_type):
+                if batch:
+                    with metrics.track_handler('event', receiver_func):
+                        response = receiver_func(sender, event_type=event_type, events=event_contexts)
+                    responses.append((receiver_func, response))
+
+        return responses
+
+
+event_router = SlackEventRouter()
+
+slack_event_received.connect(event_router.dispatch, weak=False, dispatch_uid='slack_app.event_router')
+slack_event_batch_received.connect(event_router.dispatch_batch, weak=False, dispatch_uid='slack_app.event_router')
@@ -2,3 +2,112 @@ from django.conf import settings
 
 SLACK_LOGIN_OAUTH_REDIRECT_URL = getattr(settings, 'SLACK_LOGIN_OAUTH_REDIRECT_URL', "/")
 SLACK_INSTALL_OAUTH_REDIRECT_URL = getattr(settings, 'SLACK_INSTALL_OAUTH_REDIRECT_URL', "/")
+
+# Two-tier lookup cache for workspaces and linked user mappings used by commands & interactivity
+SLACK_LOOKUP_CACHE_ENABLED = getattr(settings, 'SLACK_LOOKUP_CACHE_ENABLED', True)
+SLACK_LOOKUP_CACHE_ALIAS = getattr(settings, 'SLACK_LOOKUP_CACHE_ALIAS', 'default')  # None disables the shared tier
+SLACK_LOOKUP_CACHE_TIMEOUT = getattr(settings, 'SLACK_LOOKUP_CACHE_TIMEOUT', 300)
+SLACK_LOOKUP_CACHE_LOCAL_TIMEOUT = getattr(settings, 'SLACK_LOOKUP_CACHE_LOCAL_TIMEOUT', 10)
+SLACK_LOOKUP_CACHE_LOCAL_SIZE = getattr(settings, 'SLACK_LOOKUP_CACHE_LOCAL_SIZE', 1024)
+
+# Shared Slack WebClients
+SLACK_CLIENT_REGISTRY_SIZE = getattr(settings, 'SLACK_CLIENT_REGISTRY_SIZE', 256)
+SLACK_API_TIMEOUT = getattr(settings, 'SLACK_API_TIMEOUT', 30)
+SLACK_API_BASE_URL = getattr(settings, 'SLACK_API_BASE_URL', None)  # e.g. a local stand-in of Slack Web API
+SLACK_API_MAX_CONNECTIONS = getattr(settings, 'SLACK_API_MAX_CONNECTIONS', 32)  # keep-alive connections to Slack API
+
+# Outbound Slack API scheduling, see ratelimit.py
+SLACK_RATE_LIMIT_ENABLED = getattr(settings, 'SLACK_RATE_LIMIT_ENABLED', True)
+SLACK_RATE_LIMIT_CACHE_ALIAS = getattr(settings, 'SLACK_RATE_LIMIT_CACHE_ALIAS', 'default')
+SLACK_RATE_LIMIT_TIERS = getattr(settings, 'SLACK_RATE_LIMIT_TIERS', {})  # tier -> requests per minute
+SLACK_RATE_LIMIT_METHOD_TIERS = getattr(settings, 'SLACK_RATE_LIMIT_METHOD_TIERS', {})  # method -> tier
+SLACK_RATE_LIMIT_MAX_RETRIES = getattr(settings, 'SLACK_RATE_LIMIT_MAX_RETRIES', 3)
+SLACK_RATE_LIMIT_LOW_PRIORITY_RESERVE = getattr(settings, 'SLACK_RATE_LIMIT_LOW_PRIORITY_RESERVE', 0.2)
+
+# Slack request signatures, see signature.py. SLACK_SIGNING_SECRETS (current one first) replaces
+# SLACK_SIGNING_SECRET while a secret is being rotated
+SLACK_SIGNATURE_MAX_AGE = getattr(settings, 'SLACK_SIGNATURE_MAX_AGE', 60 * 5)
+SLACK_SIGNATURE_REPLAY_CACHE_ENABLED = getattr(settings, 'SLACK_SIGNATURE_REPLAY_CACHE_ENABLED', False)
+SLACK_SIGNATURE_REPLAY_CACHE_ALIAS = getattr(settings, 'SLACK_SIGNATURE_REPLAY_CACHE_ALIAS', 'default')
+SLACK_SIGNATURE_REPLAY_CACHE_LOCAL_SIZE = getattr(settings, 'SLACK_SIGNATURE_REPLAY_CACHE_LOCAL_SIZE', 10000)
+
+# Deduplication of Slack event retries, see idempotency.py
+SLACK_EVENT_DEDUP_ENABLED = getattr(settings, 'SLACK_EVENT_DEDUP_ENABLED', True)
+SLACK_EVENT_DEDUP_CACHE_ALIAS = getattr(settings, 'SLACK_EVENT_DEDUP_CACHE_ALIAS', 'default')
+SLACK_EVENT_DEDUP_TIMEOUT = getattr(settings, 'SLACK_EVENT_DEDUP_TIMEOUT', 60 * 60)
+SLACK_EVENT_DEDUP_LOCAL_SIZE = getattr(settings, 'SLACK_EVENT_DEDUP_LOCAL_SIZE', 10000)
+SLACK_EVENT_DEDUP_AT_EXECUTION = getattr(settings, 'SLACK_EVENT_DEDUP_AT_EXECUTION', False)
+
+# Micro-batched event ingestion, see batching.py
+SLACK_EVENT_BATCHING_ENABLED = getattr(settings, 'SLACK_EVENT_BATCHING_ENABLED', False)
+SLACK_EVENT_BATCH_TYPES = getattr(settings, 'SLACK_EVENT_BATCH_TYPES', None)  # None batches all event types
+SLACK_EVENT_BATCH_SIZE = getattr(settings, 'SLACK_EVENT_BATCH_SIZE', 100)
+SLACK_EVENT_BATCH_LATENCY = getattr(settings, 'SLACK_EVENT_BATCH_LATENCY', 0.5)  # seconds
+
+# Queues & priorities of Slack events, see queues.py
+SLACK_EVENT_ROUTES = getattr(settings, 'SLACK_EVENT_ROUTES', {})  # event type (or '*') -> apply_async options
+SLACK_EVENT_WORKSPACE_ROUTES = getattr(settings, 'SLACK_EVENT_WORKSPACE_ROUTES', {})  # team id -> apply_async options
+SLACK_EVENT_FAIR_SHARE = getattr(settings, 'SLACK_EVENT_FAIR_SHARE', None)  # events/sec per workspace, None disables
+SLACK_EVENT_FAIR_SHARE_BURST = getattr(settings, 'SLACK_EVENT_FAIR_SHARE_BURST', 100)
+SLACK_EVENT_OVERFLOW_QUEUE = getattr(settings, 'SLACK_EVENT_OVERFLOW_QUEUE', 'slack_overflow')
+
+# Dispatch of Slack events, see dispatch.py
+SLACK_EVENT_DISPATCH_BACKEND = getattr(settings, 'SLACK_EVENT_DISPATCH_BACKEND', 'celery')  # 'celery' or 'thread'
+SLACK_EVENT_DISPATCH_MAX_WORKERS = getattr(settings, 'SLACK_EVENT_DISPATCH_MAX_WORKERS', 10)  # thread backend only
+SLACK_EVENT_DISPATCH_MAX_QUEUE = getattr(settings, 'SLACK_EVENT_DISPATCH_MAX_QUEUE', 1000)  # thread backend only
+SLACK_EVENT_DISPATCH_OVERFLOW = getattr(settings, 'SLACK_EVENT_DISPATCH_OVERFLOW', 'reject')  # drop, block or reject
+SLACK_EVENT_DISPATCH_BLOCK_TIMEOUT = getattr(settings, 'SLACK_EVENT_DISPATCH_BLOCK_TIMEOUT', 1.0)  # seconds
+SLACK_EVENT_DISPATCH_DRAIN_TIMEOUT = getattr(settings, 'SLACK_EVENT_DISPATCH_DRAIN_TIMEOUT', 10)  # seconds
+
+# Claim-check of large event payloads, see claimcheck.py
+SLACK_CLAIM_CHECK_ENABLED = getattr(settings, 'SLACK_CLAIM_CHECK_ENABLED', False)
+SLACK_CLAIM_CHECK_THRESHOLD = getattr(settings, 'SLACK_CLAIM_CHECK_THRESHOLD', 16 * 1024)  # bytes of JSON
+SLACK_CLAIM_CHECK_STORE = getattr(settings, 'SLACK_CLAIM_CHECK_STORE', 'slack_app.claimcheck.DatabaseStore')
+SLACK_CLAIM_CHECK_TTL = getattr(settings, 'SLACK_CLAIM_CHECK_TTL', 60 * 60 * 24)
+SLACK_CLAIM_CHECK_CACHE_ALIAS = getattr(settings, 'SLACK_CLAIM_CHECK_CACHE_ALIAS', 'default')  # CacheStore
+SLACK_CLAIM_CHECK_DIRECTORY = getattr(settings, 'SLACK_CLAIM_CHECK_DIRECTORY', None)  # FileSystemStore
+
+# Pooled HTTP client used for response_url & incoming webhooks, see transport.py
+SLACK_HTTP_TIMEOUT = getattr(settings, 'SLACK_HTTP_TIMEOUT', 10)
+SLACK_HTTP_MAX_CONNECTIONS_PER_HOST = getattr(settings, 'SLACK_HTTP_MAX_CONNECTIONS_PER_HOST', 10)
+
+# Deferred commands & interactivity, see deferred.py
+SLACK_DEFERRED_BACKEND = getattr(settings, 'SLACK_DEFERRED_BACKEND', 'celery')  # 'celery' or 'thread'
+SLACK_DEFERRED_MAX_WORKERS = getattr(settings, 'SLACK_DEFERRED_MAX_WORKERS', 10)
+SLACK_DEFERRED_MAX_QUEUE = getattr(settings, 'SLACK_DEFERRED_MAX_QUEUE', 100)
+SLACK_RESPONSE_URL_RETRIES = getattr(settings, 'SLACK_RESPONSE_URL_RETRIES', 3)
+
+# App Home publishing, see home.py
+SLACK_APP_HOME_CACHE_ALIAS = getattr(settings, 'SLACK_APP_HOME_CACHE_ALIAS', 'default')
+SLACK_APP_HOME_DEBOUNCE = getattr(settings, 'SLACK_APP_HOME_DEBOUNCE', 1.0)  # seconds, 0 disables debouncing
+SLACK_APP_HOME_HASH_TIMEOUT = getattr(settings, 'SLACK_APP_HOME_HASH_TIMEOUT', 60 * 10)
+
+# Background Slack metadata refresh, see metadata.py
+SLACK_METADATA_STALE_AFTER = getattr(settings, 'SLACK_METADATA_STALE_AFTER', 60 * 60 * 24)  # seconds
+SLACK_METADATA_REFRESH_CONCURRENCY = getattr(settings, 'SLACK_METADATA_REFRESH_CONCURRENCY', 4)
+SLACK_METADATA_REFRESH_BATCH_SIZE = getattr(settings, 'SLACK_METADATA_REFRESH_BATCH_SIZE', 500)
+
+# Incoming webhook broadcasts, see webhooks.py
+SLACK_WEBHOOK_BROADCAST_CONCURRENCY = getattr(settings, 'SLACK_WEBHOOK_BROADCAST_CONCURRENCY', 16)
+SLACK_WEBHOOK_RETRIES = getattr(settings, 'SLACK_WEBHOOK_RETRIES', 3)
+
+# Direct message broadcasts, see broadcast.py
+SLACK_BROADCAST_CONCURRENCY = getattr(settings, 'SLACK_BROADCAST_CONCURRENCY', 8)  # workspaces at once
+SLACK_BROADCAST_WORKSPACE_CONCURRENCY = getattr(settings, 'SLACK_BROADCAST_WORKSPACE_CONCURRENCY', 4)
+SLACK_BROADCAST_BATCH_SIZE = getattr(settings, 'SLACK_BROADCAST_BATCH_SIZE', 100)  # recipients per checkpoint
+
+# Workspace uninstall, see uninstall.py
+SLACK_UNINSTALL_CHUNK_SIZE = getattr(settings, 'SLACK_UNINSTALL_CHUNK_SIZE', 1000)  # rows deleted per statement
+# seconds without progress before an unfinished uninstall is scheduled again
+SLACK_UNINSTALL_STALE_AFTER = getattr(settings, 'SLACK_UNINSTALL_STALE_AFTER', 60 * 10)
+
+# Socket Mode, see socket_mode.py
+SLACK_SOCKET_MODE_APP_TOKENS = getattr(settings, 'SLACK_SOCKET_MODE_APP_TOKENS', [])
+SLACK_SOCKET_MODE_CONCURRENCY = getattr(settings, 'SLACK_SOCKET_MODE_CONCURRENCY', 10)
+# prefix of links in replies, e.g. https://example.com, there is no request to build them from
+SLACK_SOCKET_MODE_BASE_URL = getattr(settings, 'SLACK_SOCKET_MODE_BASE_URL', '')
+
+# Metrics, see metrics.py
+SLACK_METRICS_EXPORTERS = getattr(settings, 'SLACK_METRICS_EXPORTERS', [])  # dotted paths of MetricsExporter classes
+SLACK_METRICS_ENDPOINT_ENABLED = getattr(settings, 'SLACK_METRICS_ENDPOINT_ENABLED', False)
+SLACK_METRICS_TOKEN = getattr(settings, 'SLACK_METRICS_TOKEN', None)  # required as a Bearer token if set
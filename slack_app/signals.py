@@ -7,4 +7,5 @@ https://api.slack.com/events-api#responding_to_events
 That's why, we've chosen to implement this using Django's signals.
 """
 slack_event_received = django.dispatch.Signal()
+slack_event_batch_received = django.dispatch.Signal()  # see batching.py
 refresh_home = django.dispatch.Signal()
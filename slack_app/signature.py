@@ -0,0 +1,119 @@
+"""
+Verification of Slack request signatures.
+https://api.slack.com/authentication/verifying-requests-from-slack
+
+Keyed HMAC state is computed once per signing secret and copied for every request, the raw body is hashed
+as is. Several secrets may be configured at once (SLACK_SIGNING_SECRETS), so a secret can be rotated
+without rejecting requests signed by the previous one.
+
+Optionally, verified (timestamp, signature) pairs are remembered for SLACK_SIGNATURE_MAX_AGE seconds
+and the same pair is rejected the next time (SLACK_SIGNATURE_REPLAY_CACHE_ENABLED).
+"""
+import hashlib
+import hmac
+import threading
+import time
+from typing import Iterable, Optional
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.http import HttpRequest
+
+from . import metrics
+from .idempotency import EventIdStore
+from .settings import SLACK_SIGNATURE_MAX_AGE, SLACK_SIGNATURE_REPLAY_CACHE_ENABLED, \
+    SLACK_SIGNATURE_REPLAY_CACHE_ALIAS, SLACK_SIGNATURE_REPLAY_CACHE_LOCAL_SIZE
+
+VERSION = b'v0'
+
+
+class SignatureVerifier:
+
+    def __init__(self, signing_secrets: Iterable[str], max_age: int = 60 * 5, replay_store: EventIdStore = None):
+        """
+        :param signing_secrets: current secret first, the ones being rotated out after it
+        :param max_age: max difference of the request timestamp and local time in seconds
+        :param replay_store: remembers verified signatures, None disables replay detection
+        """
+        self.keys = [
+            hmac.new(secret.encode('utf-8'), VERSION + b':', hashlib.sha256)
+            for secret in signing_secrets if secret
+        ]
+        if not self.keys:
+            raise ImproperlyConfigured("At least one Slack signing secret is required")
+        self.max_age = max_age
+        self.replay_store = replay_store
+
+    def get_signature(self, key, timestamp: bytes, body) -> bytes:
+        mac = key.copy()
+        mac.update(timestamp)
+        mac.update(b':')
+        mac.update(body)
+        return VERSION + b'=' + mac.hexdigest().encode('ascii')
+
+    def verify(self, signature: Optional[str], timestamp: Optional[str], body) -> bool:
+        """
+        :param signature: value of `X-Slack-Signature` header
+        :param timestamp: value of `X-Slack-Request-Timestamp` header
+        :param body: raw request body (bytes or memoryview)
+        """
+        if not signature or not timestamp:
+            return False
+
+        try:
+            if abs(time.time() - int(timestamp)) > self.max_age:
+                # The request timestamp is too far from local time. It could be a replay attack, so let's ignore it.
+                return False
+            signature = signature.encode('ascii')
+            timestamp = timestamp.encode('ascii')
+        except (ValueError, UnicodeEncodeError):
+            return False
+
+        if not any(hmac.compare_digest(self.get_signature(key, timestamp, body), signature) for key in self.keys):
+            return False
+
+        if self.replay_store is not None and not self.replay_store.add(
+            f"slack_app:signature:{timestamp.decode()}:{signature.decode()}"
+        ):
+            metrics.incr('slack_signature_replays')
+            return False
+
+        return True
+
+    def verify_request(self, request: HttpRequest) -> bool:
+        return self.verify(
+            request.META.get('HTTP_X_SLACK_SIGNATURE'),
+            request.META.get('HTTP_X_SLACK_REQUEST_TIMESTAMP'),
+            request.body,
+        )
+
+
+def get_signing_secrets() -> list:
+    secrets = getattr(settings, 'SLACK_SIGNING_SECRETS', None)
+    if secrets:
+        return list(secrets)
+
+    try:
+        return [settings.SLACK_SIGNING_SECRET]
+    except AttributeError:
+        raise ImproperlyConfigured(
+            "SLACK_SIGNING_SECRET is missing in your settings.py" +
+            "Please check the readme of django-slack-integration package"
+        )
+
+
+_verifier = None
+_verifier_lock = threading.Lock()
+
+
+def get_signature_verifier() -> SignatureVerifier:
+    global _verifier
+    with _verifier_lock:
+        if _verifier is None:
+            # a timestamp is accepted from MAX_AGE in the past to MAX_AGE in the future, so a signature stays
+            # valid for up to twice MAX_AGE and has to be remembered that long
+            replay_store = EventIdStore(
+                SLACK_SIGNATURE_REPLAY_CACHE_ALIAS, 2 * SLACK_SIGNATURE_MAX_AGE, SLACK_SIGNATURE_REPLAY_CACHE_LOCAL_SIZE
+            ) if SLACK_SIGNATURE_REPLAY_CACHE_ENABLED else None
+            _verifier = SignatureVerifier(get_signing_secrets(), SLACK_SIGNATURE_MAX_AGE, replay_store)
+        return _verifier
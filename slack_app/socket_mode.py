@@ -0,0 +1,134 @@
+"""
+Socket Mode ingress, an alternative to the HTTP endpoints in urls.py.
+https://api.slack.com/apis/connections/socket
+
+`run_slack_socket_mode` management command holds a websocket per app-level token and feeds the envelopes into
+the same registries the views use (`@slack_command`, `@slack_interactivity`, `on_slack_signal`). Envelopes
+are handled concurrently by the client's thread pool. Events are acknowledged once enqueued, an event that
+can't be enqueued isn't acknowledged, so Slack delivers it again. Deferred handlers are acknowledged before
+they run. Other handlers answer in the acknowledgement, the same way the views answer the HTTP request,
+because e.g. a `view_submission` can't respond any other way.
+
+Handlers get `None` instead of the request. Requires `slack_sdk`, which is an optional dependency.
+"""
+import json
+import logging
+from typing import Optional
+
+from django.db import close_old_connections
+from django.urls import reverse
+
+from . import metrics
+from .deferred import COMMAND, INTERACTIVITY, ack_response, get_response_payload, run_deferred_handler
+from .events import enqueue_slack_event
+from .exceptions import SlackAppNotInstalledProperlyException, SlackAccountNotLinkedException, SlackEventRejected
+from .interactivity import interactivity_index
+from .payloads import CommandPayload, parse_interactivity_payload
+from .helpers import slack_commands, slack_interactivity_callbacks, run_handler
+from .settings import SLACK_API_BASE_URL, SLACK_SOCKET_MODE_BASE_URL
+from .views import get_slack_user_and_workspace, app_not_installed_response
+
+logger = logging.getLogger(__name__)
+
+SENDER = 'socket_mode'
+
+
+def get_ack_payload(response) -> Optional[dict]:
+    payload = get_response_payload(response)
+    return json.loads(payload) if payload else None
+
+
+def account_not_linked_payload(slack_user_mapping) -> dict:
+    url = SLACK_SOCKET_MODE_BASE_URL + reverse('slack_app:connect_account', kwargs={'nonce': slack_user_mapping.nonce})
+    return {
+        "text": "Hi, it seems like you haven't linked your Slack account to your Scrumie account. " +
+                f"You can do so <{url}|here>"
+    }
+
+
+class SocketModeDispatcher:
+    """
+    Socket Mode request listener, see `slack_sdk.socket_mode.SocketModeClient.socket_mode_request_listeners`
+    """
+
+    def __call__(self, client, request):
+        try:
+            with metrics.timer('slack_socket_mode_envelope_seconds', type=request.type):
+                self.dispatch(client, request)
+        except Exception:
+            metrics.incr('slack_socket_mode_errors', type=request.type)
+            logger.exception("Unable to handle Socket Mode envelope %s", request.envelope_id)
+        finally:
+            close_old_connections()
+
+    def ack(self, client, request, payload: Optional[dict] = None):
+        from slack_sdk.socket_mode.response import SocketModeResponse
+        client.send_socket_mode_response(SocketModeResponse(envelope_id=request.envelope_id, payload=payload))
+
+    def dispatch(self, client, request):
+        if request.type == 'events_api':
+            if request.payload.get('type') == 'event_callback':
+                event_id = request.payload.get('event_id')
+                try:
+                    enqueue_slack_event(SENDER, request.payload, retry_reason=request.retry_reason)
+                except SlackEventRejected:
+                    # not acknowledged, Slack retries it the same way as a 503 of the HTTP endpoint
+                    logger.warning("Slack event %s rejected by the dispatcher", event_id)
+                    return
+            self.ack(client, request)
+        elif request.type == 'slash_commands':
+            payload = CommandPayload(request.payload)
+            name = (payload.command or '').lstrip('/')
+            self.handle(client, request, payload, COMMAND, name, slack_commands.get(name))
+        elif request.type == 'interactive':
+            payload = parse_interactivity_payload(request.payload)
+            name = interactivity_index.resolve(payload)
+            self.handle(client, request, payload, INTERACTIVITY, name,
+                        slack_interactivity_callbacks.get(name) if name else None)
+        else:
+            # e.g. `hello` & `disconnect` are handled by the client itself
+            self.ack(client, request)
+
+    def handle(self, client, request, payload, kind: str, name: str, callback):
+        if callback is None or not callback.fn:
+            logger.warning("Slack %s '%s' is not registered", kind, name)
+            self.ack(client, request)
+            return
+
+        if callback.require_linked_account:
+            try:
+                mapping, workspace = get_slack_user_and_workspace(payload.team_id, payload.user_id)
+            except SlackAppNotInstalledProperlyException:
+                self.ack(client, request, get_ack_payload(app_not_installed_response()))
+                return
+            except SlackAccountNotLinkedException as err:
+                self.ack(client, request, account_not_linked_payload(err.slack_user_mapping))
+                return
+        else:
+            mapping = None
+            workspace = None
+
+        if callback.deferred:
+            self.ack(client, request, get_ack_payload(ack_response(callback.ack)))
+            run_deferred_handler(kind, name, None, payload, mapping, workspace)
+            return
+
+        response = run_handler(callback.fn, None, payload, mapping, workspace, kind=kind)
+        self.ack(client, request, get_ack_payload(response))
+
+
+def create_socket_mode_client(app_token: str, concurrency: int = 10):
+    """
+    :param app_token: app-level token (xapp-...) with `connections:write` scope
+    """
+    try:
+        from slack_sdk import WebClient
+        from slack_sdk.socket_mode import SocketModeClient
+    except ImportError:
+        raise ImportError("Socket Mode requires slack_sdk, install it with `pip install slack_sdk`")
+
+    # SLACK_API_BASE_URL points apps.connections.open (and so the websocket) to a local stand-in of Slack
+    web_client = WebClient(base_url=SLACK_API_BASE_URL) if SLACK_API_BASE_URL else WebClient()
+    client = SocketModeClient(app_token=app_token, web_client=web_client, concurrency=concurrency)
+    client.socket_mode_request_listeners.append(SocketModeDispatcher())
+    return client
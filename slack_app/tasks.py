@@ -1,9 +1,79 @@
+import time
+
 from celery import shared_task
 
-from .signals import slack_event_received
+from . import claimcheck, metrics
+from .claimcheck import check_out
+from .deferred import run_deferred_handler_by_ids
+from .idempotency import is_duplicate_execution, mark_executed
+from .metadata import refresh_slack_metadata
+from .signals import slack_event_received, slack_event_batch_received
+from .uninstall import uninstall_workspace
+
+
+def observe_queue_lag(event_type, enqueued_at):
+    if enqueued_at:
+        metrics.observe('slack_event_queue_lag_seconds', max(0, time.time() - enqueued_at), event_type=event_type)
+
+
+@shared_task
+def receive_slack_signal_task(sender, event_type, event_data, slack_enqueued_at=None, **data):
+    observe_queue_lag(event_type, slack_enqueued_at)
+
+    if is_duplicate_execution(data.get('event_id')):
+        return
+
+    slack_event_received.send(sender=sender, event_type=event_type, event_data=check_out(event_data), **data)
+    mark_executed(data.get('event_id'))
 
 
 @shared_task
-def receive_slack_signal_task(sender, event_type, event_data, **data):
-    slack_event_received.send(sender=sender, event_type=event_type, event_data=event_data, **data)
+def receive_slack_signal_batch_task(events):
+    """
+    Batch-aware variant of `receive_slack_signal_task`, see batching.py.
+    Each event is sent as `slack_event_received`, receivers accepting lists get them via `slack_event_batch_received`.
+    """
+    for event in events:
+        observe_queue_lag(event.get('event_type'), event.pop('slack_enqueued_at', None))
+
+    events = [event for event in events if not is_duplicate_execution(event.get('event_id'))]
+    for event in events:
+        event['event_data'] = check_out(event['event_data'])
+
+    for event in events:
+        slack_event_received.send(slack_batch=True, **event)
+
+    if events:
+        slack_event_batch_received.send(sender=events[0].get('sender'), events=events)
+
+    for event in events:
+        mark_executed(event.get('event_id'))
 
+
+@shared_task
+def run_deferred_slack_handler_task(kind, name, payload, slack_user_id=None, team_id=None):
+    """
+    Runs a handler registered with `deferred=True`, see deferred.py
+    """
+    run_deferred_handler_by_ids(kind, name, payload, slack_user_id=slack_user_id, team_id=team_id)
+
+
+@shared_task
+def cleanup_slack_claim_checks_task():
+    """
+    Removes expired payloads of the claim-check, see claimcheck.py
+    """
+    return claimcheck.cleanup()
+
+
+@shared_task
+def uninstall_slack_workspace_task(workspace_id):
+    """
+    Uninstalls the workspace in chunks, see uninstall.py. Running it again resumes it.
+    """
+    uninstall_workspace(workspace_id)
+
+
+@shared_task
+def refresh_slack_metadata_task(slack_user_ids=None, workspace_ids=None):
+    refresh_slack_metadata(slack_user_ids=slack_user_ids, workspace_ids=workspace_ids)
@@ -0,0 +1,189 @@
+"""
+Local stand-in for Slack Web API, response_url and incoming webhook endpoints.
+
+    server = FakeSlackServer()
+    server.start()
+    settings.SLACK_API_BASE_URL = server.api_url
+
+and for the Socket Mode websocket, `apps.connections.open` of the Web API stand-in returns its URL:
+
+    socket_mode = FakeSocketModeServer().start()
+    server = FakeSlackServer(socket_mode_url=socket_mode.url).start()
+    envelope_id = socket_mode.send("events_api", {...})
+    ack = socket_mode.wait_for_ack(envelope_id)
+"""
+import json
+import threading
+import time
+import uuid
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+TEAM = {
+    "id": "T0BENCH",
+    "name": "Benchmark",
+    "domain": "benchmark",
+    "icon": {"image_34": "https://example.com/34.png", "image_default": True},
+}
+
+RESPONSES = {
+    "team.info": {"ok": True, "team": TEAM},
+    "users.identity": {
+        "ok": True,
+        "user": {"id": "U0BENCH", "name": "bench", "email": "bench@example.com"},
+        "team": TEAM,
+    },
+    "views.publish": {"ok": True, "view": {"id": "V0BENCH"}},
+    "chat.postMessage": {"ok": True, "channel": "D0BENCH", "ts": "1.0"},
+    "conversations.open": {"ok": True, "channel": {"id": "D0BENCH"}},
+    "apps.uninstall": {"ok": True},
+    "oauth.access": {"ok": True, "access_token": "xoxp-bench", "user_id": "U0BENCH", "team_id": "T0BENCH",
+                     "user": {"name": "bench"}},
+    "oauth.v2.access": {"ok": True, "access_token": "xoxb-bench", "bot_user_id": "B0BENCH", "scope": "commands",
+                        "team": {"id": "T0BENCH", "name": "Benchmark"}},
+}
+
+
+class FakeSlackHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'  # keep-alive
+    # headers & body in one write: written separately, Nagle's algorithm and the client's delayed ACK
+    # hold the body of every response on a kept-alive connection for ~40 ms
+    wbufsize = -1
+    disable_nagle_algorithm = True
+
+    def log_message(self, format, *args):
+        pass
+
+    def _reply(self, status: int, data: dict):
+        body = json.dumps(data).encode('utf-8')
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _handle(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        if length:
+            self.rfile.read(length)
+
+        path = self.path.split('?')[0]
+        self.server.calls[path] += 1
+
+        if path == '/api/apps.connections.open':
+            self._reply(200, {"ok": True, "url": self.server.socket_mode_url})
+        elif path.startswith('/api/'):
+            method = path[len('/api/'):]
+            self._reply(200, RESPONSES.get(method, {"ok": False, "error": "unknown_method"}))
+        else:
+            # response_url & incoming webhooks
+            self._reply(200, {"ok": True})
+
+    do_GET = _handle
+    do_POST = _handle
+
+
+class FakeSlackServer:
+
+    def __init__(self, host='127.0.0.1', port=0, socket_mode_url=None):
+        self.httpd = ThreadingHTTPServer((host, port), FakeSlackHandler)
+        self.httpd.daemon_threads = True
+        self.httpd.calls = Counter()
+        self.httpd.socket_mode_url = socket_mode_url
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+
+    @property
+    def url(self) -> str:
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    @property
+    def api_url(self) -> str:
+        return f"{self.url}/api/"
+
+    @property
+    def calls(self) -> Counter:
+        return self.httpd.calls
+
+    def start(self):
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+class FakeSocketModeServer:
+    """
+    Sends envelopes to the connected Socket Mode client and collects its acknowledgements.
+    Requires `websockets`.
+    """
+
+    def __init__(self, host='127.0.0.1', port=0):
+        from websockets.sync.server import serve
+
+        self.server = serve(self._handle, host, port)
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.connection = None
+        self.connected = threading.Event()
+        self.acks = {}
+        self._acked = threading.Condition()
+
+    @property
+    def url(self) -> str:
+        host, port = self.server.socket.getsockname()[:2]
+        return f"ws://{host}:{port}/link/"
+
+    def _handle(self, connection):
+        from websockets.exceptions import ConnectionClosed
+
+        self.connection = connection
+        connection.send(json.dumps({"type": "hello", "num_connections": 1, "debug_info": {"host": "fake"}}))
+        self.connected.set()
+        try:
+            for message in connection:
+                ack = json.loads(message)
+                with self._acked:
+                    self.acks[ack.get("envelope_id")] = ack
+                    self._acked.notify_all()
+        except ConnectionClosed:
+            # slack_sdk closes the socket without a close frame
+            pass
+
+    def wait_for_connection(self, timeout: float = 5) -> bool:
+        return self.connected.wait(timeout)
+
+    def send(self, envelope_type: str, payload: dict, **fields) -> str:
+        """
+        Sends an envelope, returns its id
+        """
+        envelope_id = str(uuid.uuid4())
+        self.connection.send(json.dumps({
+            "envelope_id": envelope_id,
+            "type": envelope_type,
+            "payload": payload,
+            "accepts_response_payload": envelope_type != "events_api",
+            **fields,
+        }))
+        return envelope_id
+
+    def wait_for_ack(self, envelope_id: str, timeout: float = 5):
+        """
+        Returns the acknowledgement of the envelope, None if there is none within `timeout` seconds
+        """
+        deadline = time.monotonic() + timeout
+        with self._acked:
+            while envelope_id not in self.acks:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return None
+                self._acked.wait(remaining)
+            return self.acks[envelope_id]
+
+    def start(self):
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
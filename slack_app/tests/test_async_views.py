@@ -0,0 +1,37 @@
+import asyncio
+import threading
+import time
+from unittest import mock
+
+from django.test import SimpleTestCase
+
+from slack_app import decorators
+from slack_app.async_views import arun_handler
+
+
+class AsyncViewsTest(SimpleTestCase):
+
+    async def test_sync_handlers_run_in_parallel(self):
+        def handler(request, payload, slack_user_mapping, slack_workspace):
+            time.sleep(0.3)
+            return threading.get_ident()
+
+        started = time.monotonic()
+        threads = await asyncio.gather(*[arun_handler(handler, None, {}, None, None) for _ in range(3)])
+
+        self.assertLess(time.monotonic() - started, 0.6)
+        self.assertEqual(len(set(threads)), 3)
+
+    async def test_replay_check_off_the_event_loop(self):
+        verifier = mock.Mock(replay_store=object())
+        threads = []
+
+        def verify_request(request):
+            threads.append(threading.get_ident())
+            return True
+
+        with mock.patch.object(decorators, "get_signature_verifier", return_value=verifier), \
+                mock.patch.object(decorators, "verify_request", verify_request):
+            self.assertTrue(await decorators.averify_request(None))
+
+        self.assertNotEqual(threads, [threading.get_ident()])
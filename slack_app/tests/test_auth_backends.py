@@ -0,0 +1,136 @@
+import threading
+from unittest import mock, skipIf
+
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import TestCase, TransactionTestCase, override_settings
+
+from slack_app import auth_backends
+from slack_app.auth_backends import get_next_username, create_user_with_unique_username, SlackAuthenticationBackend
+from slack_app.models import SlackUserMapping
+
+User = get_user_model()
+
+
+class GetNextUsernameTest(TestCase):
+
+    def test_free_base(self):
+        self.assertEqual(get_next_username("alice"), "alice")
+
+    def test_next_suffix(self):
+        for username in ["alice", "alice-1", "alice-7"]:
+            User.objects.create(username=username)
+        self.assertEqual(get_next_username("alice"), "alice-8")
+
+    def test_ignores_other_names_with_the_same_prefix(self):
+        for username in ["al", "alice", "alice-3", "al-x"]:
+            User.objects.create(username=username)
+
+        with self.assertNumQueries(1):
+            self.assertEqual(get_next_username("al"), "al-1")
+        self.assertEqual(get_next_username("ali"), "ali")
+
+    def test_keeps_a_base_that_fits(self):
+        base = "a" * User._meta.get_field("username").max_length
+        self.assertEqual(get_next_username(base), base)
+
+    def test_shortens_the_base_only_for_the_suffix(self):
+        max_length = User._meta.get_field("username").max_length
+        User.objects.create(username="a" * max_length)
+        User.objects.create(username="b" * (max_length - 2))
+
+        self.assertEqual(get_next_username("a" * max_length), "a" * (max_length - 8))
+        self.assertEqual(get_next_username("b" * (max_length - 2)), "b" * (max_length - 2) + "-1")
+
+
+class ConcurrentUsernameTest(TransactionTestCase):
+
+    def test_concurrent_creation_gets_distinct_usernames(self):
+        """
+        Both threads look the name up before either inserts it, the second insert fails and is retried
+        """
+        User.objects.create(username="bob")
+        # what both lookups return before either thread inserts. Looked up outside the threads' transactions,
+        # SQLite's table locks wouldn't let the first one commit otherwise.
+        stale = get_next_username("bob")
+        first_created = threading.Event()
+        looked_up = set()
+        created, errors = [], []
+
+        def racing_get_next_username(base):
+            name = threading.current_thread().name
+            if name in looked_up:
+                return get_next_username(base)
+
+            looked_up.add(name)
+            if name == "second":
+                first_created.wait(timeout=5)
+            return stale
+
+        def create():
+            try:
+                created.append(create_user_with_unique_username("bob").username)
+            except Exception as e:
+                errors.append(e)
+            finally:
+                if threading.current_thread().name == "first":
+                    first_created.set()
+                connection.close()
+
+        threads = [threading.Thread(target=create, name=name) for name in ("first", "second")]
+        with mock.patch.object(auth_backends, "get_next_username", racing_get_next_username):
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join(10)
+
+        self.assertEqual(errors, [])
+        self.assertEqual(sorted(created), ["bob-1", "bob-2"])
+        self.assertEqual(set(User.objects.values_list("username", flat=True)), {"bob", "bob-1", "bob-2"})
+
+
+@skipIf(connection.vendor == "sqlite", "SQLite fails concurrent write transactions with 'database is locked'")
+@override_settings(SLACK_CLIENT_ID="client-id", SLACK_CLIENT_SECRET="client-secret")
+class ConcurrentLoginTest(TransactionTestCase):
+    THREADS = 8
+
+    def test_concurrent_first_logins_create_distinct_users(self):
+        """
+        Slack users sharing a name log in for the first time at once, each gets their own Django user
+        """
+        barrier = threading.Barrier(self.THREADS)
+        users, errors = [], []
+
+        def oauth_access(workspace_id, method, func, *args, **kwargs):
+            barrier.wait(timeout=10)
+            return mock.Mock(data={
+                "ok": True,
+                "user_id": f"U{kwargs['code']}",
+                "team_id": "T1",
+                "access_token": "xoxp-token",
+                "user": {"name": "dave"},
+            })
+
+        def login(code):
+            try:
+                users.append(SlackAuthenticationBackend().authenticate(None, code=code))
+            except Exception as e:
+                errors.append(e)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=login, args=(str(i),)) for i in range(self.THREADS)]
+        with mock.patch.object(auth_backends, "call_slack_api", oauth_access), \
+                mock.patch.object(auth_backends, "get_client"):
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join(30)
+
+        self.assertEqual(errors, [])
+        self.assertEqual(len({user.pk for user in users}), self.THREADS)
+        self.assertEqual(
+            set(User.objects.values_list("username", flat=True)),
+            {"dave"} | {f"dave-{n}" for n in range(1, self.THREADS)}
+        )
+        self.assertEqual(SlackUserMapping.objects.filter(user__isnull=False).count(), self.THREADS)
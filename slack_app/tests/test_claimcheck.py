@@ -0,0 +1,81 @@
+import json
+from unittest import mock
+
+from django.core.cache import caches
+from django.test import TestCase
+
+from slack_app import claimcheck, events, tasks
+from slack_app.claimcheck import CLAIM_KEY, DatabaseStore
+from slack_app.models import SlackEventPayload
+
+EVENT_DATA = {"user": "U0CLAIM", "text": "x" * 2048, "blocks": []}
+
+
+class ClaimCheckTest(TestCase):
+
+    def setUp(self):
+        caches['default'].clear()
+        self.addCleanup(caches['default'].clear)
+        for patcher in [
+            mock.patch.object(claimcheck, "SLACK_CLAIM_CHECK_ENABLED", True),
+            mock.patch.object(claimcheck, "SLACK_CLAIM_CHECK_THRESHOLD", 1024),
+            mock.patch.object(claimcheck, "_store", DatabaseStore()),
+            mock.patch.object(events, "SLACK_EVENT_DISPATCH_BACKEND", "celery"),
+            mock.patch.object(events, "should_batch", return_value=False),
+        ]:
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def event(self, event_id: str) -> dict:
+        return {
+            "type": "event_callback", "team_id": "T0CLAIM", "event_id": event_id,
+            "event": {"type": "message", **EVENT_DATA},
+        }
+
+    def test_published_after_the_payload_is_committed(self):
+        with mock.patch.object(events, "receive_slack_signal_task") as task:
+            with self.captureOnCommitCallbacks(execute=True) as callbacks:
+                self.assertTrue(events.enqueue_slack_event("test", self.event("Ev0CLAIM")))
+                task.apply_async.assert_not_called()
+
+        self.assertEqual(len(callbacks), 1)
+        event_data = task.apply_async.call_args.kwargs["kwargs"]["event_data"]
+        self.assertEqual(list(event_data), [CLAIM_KEY])
+        self.assertTrue(SlackEventPayload.objects.filter(key=event_data[CLAIM_KEY]).exists())
+
+    def test_small_events_are_published_right_away(self):
+        event = self.event("Ev1CLAIM")
+        event["event"]["text"] = "hi"
+        with mock.patch.object(events, "receive_slack_signal_task") as task:
+            with self.captureOnCommitCallbacks() as callbacks:
+                events.enqueue_slack_event("test", event)
+                task.apply_async.assert_called_once()
+
+        self.assertEqual(callbacks, [])
+
+    def test_event_is_forgotten_if_publishing_after_the_commit_fails(self):
+        with mock.patch.object(events, "receive_slack_signal_task") as task:
+            task.apply_async.side_effect = [ConnectionError("broker"), None]
+            with self.assertRaises(ConnectionError), self.captureOnCommitCallbacks(execute=True):
+                events.enqueue_slack_event("test", self.event("Ev2CLAIM"))
+
+            with self.captureOnCommitCallbacks(execute=True):
+                self.assertTrue(events.enqueue_slack_event("test", self.event("Ev2CLAIM"), retry_reason="http_error"))
+
+    def test_receivers_get_a_plain_dict(self):
+        received = []
+
+        def receiver(sender, event_type, event_data, **kwargs):
+            event_data["seen"] = True
+            received.append(json.loads(json.dumps(event_data)))
+
+        claim = claimcheck.check_in(dict(EVENT_DATA))
+        with mock.patch.object(tasks.slack_event_received, "receivers", []):
+            tasks.slack_event_received.connect(receiver, weak=False)
+            tasks.receive_slack_signal_task("test", "message", claim, event_id="Ev3CLAIM")
+
+        self.assertEqual(received, [{**EVENT_DATA, "seen": True}])
+
+    def test_expired_payload(self):
+        with self.assertRaises(LookupError):
+            claimcheck.check_out({CLAIM_KEY: "missing"})
@@ -0,0 +1,36 @@
+from unittest import mock
+
+from django.test import SimpleTestCase
+
+from slack_app import events
+from slack_app.exceptions import SlackEventRejected
+
+
+class EnqueueSlackEventTest(SimpleTestCase):
+
+    def event(self, event_id: str, text: str = "hi") -> dict:
+        return {
+            "type": "event_callback", "team_id": "T0EVENTS", "event_id": event_id,
+            "event": {"type": "message", "user": "U0EVENTS", "text": text},
+        }
+
+    def test_thread_backend_skips_claim_check(self):
+        dispatcher = mock.Mock()
+        dispatcher.submit.return_value = True
+        with mock.patch.object(events, "SLACK_EVENT_DISPATCH_BACKEND", "thread"), \
+                mock.patch.object(events, "get_event_dispatcher", return_value=dispatcher), \
+                mock.patch.object(events, "check_in") as check_in:
+            self.assertTrue(events.enqueue_slack_event("test", self.event("Ev0THREAD", "x" * 100000)))
+
+        check_in.assert_not_called()
+        fn, kwargs = dispatcher.submit.call_args[0]
+        self.assertEqual(kwargs["event_data"], {"user": "U0EVENTS", "text": "x" * 100000})
+
+    def test_rejected_event_is_accepted_again(self):
+        dispatcher = mock.Mock()
+        dispatcher.submit.side_effect = [SlackEventRejected("full"), True]
+        with mock.patch.object(events, "SLACK_EVENT_DISPATCH_BACKEND", "thread"), \
+                mock.patch.object(events, "get_event_dispatcher", return_value=dispatcher):
+            with self.assertRaises(SlackEventRejected):
+                events.enqueue_slack_event("test", self.event("Ev1THREAD"))
+            self.assertTrue(events.enqueue_slack_event("test", self.event("Ev1THREAD"), retry_reason="http_error"))
@@ -0,0 +1,45 @@
+import threading
+from unittest import mock
+
+from django.test import SimpleTestCase
+
+from slack_app import home
+
+
+class CoalesceAppHomeTest(SimpleTestCase):
+
+    def setUp(self):
+        patcher = mock.patch.object(home, "SLACK_APP_HOME_DEBOUNCE", 0.1)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.addCleanup(home.flush_trailing)
+
+    def test_trailing_failure_is_logged_and_counted(self):
+        def publish():
+            raise RuntimeError("views.publish failed")
+
+        with mock.patch.object(home, "SLACK_APP_HOME_DEBOUNCE", 30):
+            home.coalesce_app_home("T0HOME", "U0FAIL", lambda: None)
+            home.coalesce_app_home("T0HOME", "U0FAIL", publish)
+
+        with mock.patch.object(home.metrics, "incr") as incr, self.assertLogs("slack_app.home", "ERROR"):
+            home.flush_trailing()
+        incr.assert_called_once_with("slack_app_home_trailing_failures")
+
+    def test_trailing_publish_runs_at_the_end_of_the_window(self):
+        published = threading.Event()
+        home.coalesce_app_home("T0HOME", "U0TIMER", lambda: None)
+        home.coalesce_app_home("T0HOME", "U0TIMER", published.set)
+        self.assertTrue(published.wait(2))
+
+    def test_flush_runs_pending_trailing_publishes(self):
+        published = []
+        with mock.patch.object(home, "SLACK_APP_HOME_DEBOUNCE", 30):
+            home.coalesce_app_home("T0HOME", "U0EXIT", lambda: published.append("leading"))
+            home.coalesce_app_home("T0HOME", "U0EXIT", lambda: published.append("trailing"))
+
+        self.assertEqual(published, ["leading"])
+        home.flush_trailing()
+        self.assertEqual(published, ["leading", "trailing"])
+        home.flush_trailing()
+        self.assertEqual(published, ["leading", "trailing"])
@@ -0,0 +1,295 @@
+"""
+Lookups served by the indexes of 0005_indexes. The test database is created by the migrations, so these run
+against the schema deployments have.
+"""
+import hashlib
+import hmac
+import json
+import re
+import time
+from collections import defaultdict
+from unittest import mock
+from urllib.parse import urlencode
+
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.http import HttpResponse, JsonResponse
+from django.test import TestCase, RequestFactory, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from slack_app import auth_backends, cache, decorators, events, models, signature, views
+from slack_app.auth_backends import SlackAuthenticationBackend
+from slack_app.cache import get_workspace, get_or_create_user_mapping, lookup_cache
+from slack_app.decorators import on_slack_signal
+from slack_app.helpers import create_workspace_from_oauth2_response, slack_commands, slack_interactivity_callbacks
+from slack_app.interactivity import InteractivityIndex
+from slack_app.models import SlackWorkspace, SlackUserMapping, SlackWebHook
+from slack_app.router import event_router
+from slack_app.signature import SignatureVerifier
+from slack_app.tasks import receive_slack_signal_task
+
+TEAM_ID = "T0INDEX"
+SIGNING_SECRET = "index-signing-secret"
+
+
+class IndexTestCase(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.workspace = SlackWorkspace.objects.create(
+            id=TEAM_ID, name="Index", scope="commands", bot_access_token="xoxb-index", bot_user_id="B0INDEX",
+        )
+        cls.user = get_user_model().objects.create(username="index")
+        # enough rows for the planner to prefer an index over scanning
+        SlackUserMapping.objects.bulk_create([
+            SlackUserMapping(slack_user_id=f"U{i:06d}", slack_team_id=f"T{i % 50:06d}", access_token="xoxp")
+            for i in range(500)
+        ])
+        cls.mapping = SlackUserMapping.objects.create(
+            slack_user_id="U0INDEX", slack_team_id=TEAM_ID, slack_workspace=cls.workspace, user=cls.user,
+        )
+        SlackWebHook.objects.bulk_create([
+            SlackWebHook(workspace=cls.workspace, channel_id=f"C{i:06d}", channel_name=f"channel-{i}",
+                         configuration_url="https://example.com", url=f"https://hooks.slack.com/{i}")
+            for i in range(500)
+        ])
+        with connection.cursor() as cursor:
+            cursor.execute("ANALYZE")
+
+    def setUp(self):
+        self.addCleanup(self.clear_lookup_cache)
+        self.clear_lookup_cache()
+
+    def clear_lookup_cache(self):
+        lookup_cache.local.clear()
+        if lookup_cache.shared is not None:
+            lookup_cache.shared.clear()
+
+    def explain(self, sql: str, params=None) -> str:
+        with connection.cursor() as cursor:
+            if connection.vendor == 'postgresql':
+                cursor.execute("SET enable_seqscan = off")
+                cursor.execute(f"EXPLAIN {sql}", params)
+                return "\n".join(row[0] for row in cursor.fetchall())
+            if connection.vendor == 'sqlite':
+                cursor.execute(f"EXPLAIN QUERY PLAN {sql}", params)
+                return "\n".join(row[-1] for row in cursor.fetchall())
+        self.skipTest(f"No plan assertions for {connection.vendor}")
+
+    def assertUsesIndex(self, queryset, index_name: str = None):
+        if connection.vendor == 'postgresql':
+            with connection.cursor() as cursor:
+                cursor.execute("SET enable_seqscan = off")
+            plan = queryset.explain()
+            self.assertIn("Index", plan)
+        elif connection.vendor == 'sqlite':
+            plan = queryset.explain()
+            self.assertRegex(plan, r"USING (COVERING )?INDEX|USING (INTEGER )?PRIMARY KEY")
+            self.assertNotRegex(plan, r"\bSCAN slack_app")
+        else:
+            self.skipTest(f"No plan assertions for {connection.vendor}")
+
+        if index_name is not None:
+            self.assertIn(index_name, plan)
+
+    def assertQueriesUseIndexes(self, queries: CaptureQueriesContext) -> str:
+        """
+        Checks that none of the captured queries scans a whole table of the app, returns their plans
+        """
+        plans = []
+        for query in queries.captured_queries:
+            sql = query['sql']
+            if not re.match(r"\s*(SELECT|UPDATE|DELETE)\b", sql) or 'slack_app_' not in sql:
+                continue
+            plan = self.explain(sql)
+            self.assertNotRegex(plan, r"\bSCAN slack_app|Seq Scan on slack_app", f"{sql}\n{plan}")
+            plans.append(plan)
+        return "\n".join(plans)
+
+    def assertIndexSearch(self, plans: str, column: str):
+        self.assertRegex(plans, rf"USING (COVERING )?INDEX \S+ \({column}=|Index Cond: \(+{column}\)?(::\w+)? =")
+
+
+class IndexedLookupTest(IndexTestCase):
+
+    def test_webhook_by_channel(self):
+        queryset = SlackWebHook.objects.filter(workspace=self.workspace, channel_id="C000042")
+        self.assertUsesIndex(queryset, "slack_app_webhook_channel_idx")
+        with self.assertNumQueries(1):
+            self.assertEqual(queryset.get().channel_name, "channel-42")
+
+    def test_mapping_by_nonce(self):
+        queryset = SlackUserMapping.objects.filter(nonce=self.mapping.nonce)
+        self.assertUsesIndex(queryset)
+        with self.assertNumQueries(1):
+            self.assertEqual(queryset.get(), self.mapping)
+
+    def test_mappings_by_team(self):
+        queryset = SlackUserMapping.objects.filter(slack_team_id=TEAM_ID)
+        self.assertUsesIndex(queryset)
+        with self.assertNumQueries(1):
+            self.assertEqual(list(queryset), [self.mapping])
+
+    def test_workspace_by_id(self):
+        self.assertUsesIndex(SlackWorkspace.objects.filter(id=TEAM_ID))
+        with self.assertNumQueries(1):
+            self.assertEqual(get_workspace(TEAM_ID), self.workspace)
+        with self.assertNumQueries(0):
+            self.assertEqual(get_workspace(TEAM_ID), self.workspace)
+
+    def test_user_mapping(self):
+        self.assertUsesIndex(SlackUserMapping.objects.filter(slack_user_id="U0INDEX", slack_workspace=self.workspace))
+        with self.assertNumQueries(1):
+            mapping, created = get_or_create_user_mapping("U0INDEX", self.workspace)
+        self.assertEqual((mapping, created), (self.mapping, False))
+        with self.assertNumQueries(0):
+            get_or_create_user_mapping("U0INDEX", self.workspace)
+
+    def test_lookups_without_cache(self):
+        with mock.patch.object(cache, 'SLACK_LOOKUP_CACHE_ENABLED', False):
+            with self.assertNumQueries(2):
+                get_workspace(TEAM_ID)
+                get_or_create_user_mapping("U0INDEX", self.workspace)
+            with self.assertNumQueries(2):
+                get_workspace(TEAM_ID)
+                get_or_create_user_mapping("U0INDEX", self.workspace)
+
+
+@override_settings(
+    ROOT_URLCONF="slack_app.tests.urls", SLACK_CLIENT_ID="client-id", SLACK_CLIENT_SECRET="client-secret",
+)
+class RequestPathTest(IndexTestCase):
+    """
+    Query counts of the views, the event router and the auth backend, each query has to be an index search
+    """
+
+    def setUp(self):
+        super().setUp()
+        index = InteractivityIndex()
+        for patcher in [
+            mock.patch.object(signature, "_verifier", SignatureVerifier([SIGNING_SECRET])),
+            mock.patch.object(decorators, "interactivity_index", index),
+            mock.patch.object(views, "interactivity_index", index),
+            mock.patch.dict(slack_commands),
+            mock.patch.dict(slack_interactivity_callbacks),
+            mock.patch.object(event_router, "_receivers", defaultdict(list)),
+        ]:
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def post_signed(self, url: str, body: bytes, content_type: str):
+        timestamp = str(int(time.time()))
+        signature = hmac.new(SIGNING_SECRET.encode(), b"v0:" + timestamp.encode() + b":" + body, hashlib.sha256)
+        return self.client.generic(
+            "POST", url, body, content_type=content_type,
+            HTTP_X_SLACK_SIGNATURE="v0=" + signature.hexdigest(), HTTP_X_SLACK_REQUEST_TIMESTAMP=timestamp,
+        )
+
+    def test_slack_command(self):
+        @decorators.slack_command("index")
+        def index_command(request, payload, slack_user_mapping, slack_workspace):
+            return JsonResponse({"text": slack_user_mapping.user.username})
+
+        body = urlencode({"command": "/index", "text": "", "team_id": TEAM_ID, "user_id": "U0INDEX"}).encode()
+        with CaptureQueriesContext(connection) as queries:
+            response = self.post_signed(reverse("slack_app:command", kwargs={"name": "index"}), body,
+                                        "application/x-www-form-urlencoded")
+
+        self.assertEqual(response.json(), {"text": "index"})
+        self.assertEqual(len(queries), 3)  # workspace, mapping, user of the handler
+        self.assertQueriesUseIndexes(queries)
+
+    def test_slack_interactivity(self):
+        @decorators.slack_interactivity("block_actions", action_id="approve")
+        def approve(request, payload, slack_user_mapping, slack_workspace):
+            return JsonResponse({"text": slack_workspace.name})
+
+        payload = {
+            "type": "block_actions", "team": {"id": TEAM_ID}, "user": {"id": "U0INDEX"},
+            "actions": [{"action_id": "approve", "value": "1"}],
+        }
+        body = urlencode({"payload": json.dumps(payload)}).encode()
+        with CaptureQueriesContext(connection) as queries:
+            response = self.post_signed(reverse("slack_app:interactivity"), body, "application/x-www-form-urlencoded")
+
+        self.assertEqual(response.json(), {"text": "Index"})
+        self.assertEqual(len(queries), 2)  # workspace, mapping
+        self.assertQueriesUseIndexes(queries)
+
+    def test_slack_events_dispatch(self):
+        received = []
+
+        @on_slack_signal("app_mention", inject_slack_models=True)
+        def on_mention(sender, event_data, slack_user_mapping, slack_workspace, **kwargs):
+            received.append((slack_user_mapping, slack_workspace))
+
+        body = json.dumps({
+            "type": "event_callback", "team_id": TEAM_ID, "event_id": "Ev0INDEX",
+            "event": {"type": "app_mention", "user": "U0INDEX", "text": "hi"},
+        }).encode()
+        # what the worker would run
+        run_task = mock.Mock(side_effect=lambda kwargs, **options: receive_slack_signal_task(**kwargs))
+        with mock.patch.object(events.receive_slack_signal_task, "apply_async", run_task), \
+                CaptureQueriesContext(connection) as queries:
+            response = self.post_signed(reverse("slack_app:events"), body, "application/json")
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(received, [(self.mapping, self.workspace)])
+        self.assertEqual(len(queries), 2)  # workspace, mapping
+        self.assertQueriesUseIndexes(queries)
+
+    def test_connect_account(self):
+        mapping = SlackUserMapping.objects.create(slack_user_id="U1INDEX", slack_team_id=TEAM_ID)
+        request = RequestFactory().get(reverse("slack_app:connect_account", kwargs={"nonce": mapping.nonce}))
+        request.user = self.user
+
+        with mock.patch.object(views, "render", return_value=HttpResponse()), \
+                CaptureQueriesContext(connection) as queries:
+            views.connect_account(request, nonce=str(mapping.nonce))
+
+        mapping.refresh_from_db()
+        self.assertEqual(mapping.user, self.user)
+        self.assertEqual(len(queries), 2)  # mapping by nonce, its update
+        self.assertIndexSearch(self.assertQueriesUseIndexes(queries), "nonce")
+
+    def test_authenticate(self):
+        response = mock.Mock(data={
+            "ok": True, "user_id": "U0INDEX", "team_id": TEAM_ID, "access_token": "xoxp-index",
+            "user": {"name": "index"},
+        })
+        with mock.patch.object(auth_backends, "call_slack_api", return_value=response), \
+                mock.patch.object(auth_backends, "get_client"), \
+                CaptureQueriesContext(connection) as queries:
+            user = SlackAuthenticationBackend().authenticate(None, code="code")
+
+        self.assertEqual(user, self.user)
+        statements = [q['sql'] for q in queries.captured_queries if "SAVEPOINT" not in q['sql']]
+        self.assertEqual(len(statements), 4, statements)  # workspace, mapping, its update, its user
+        self.assertQueriesUseIndexes(queries)
+
+    def test_install(self):
+        SlackUserMapping.objects.bulk_create([
+            SlackUserMapping(slack_user_id=f"U{i}INSTALL", slack_team_id=TEAM_ID, access_token="xoxp")
+            for i in range(3)
+        ])
+        response = {
+            "team": {"id": TEAM_ID, "name": "Index"}, "access_token": "xoxb-index", "bot_user_id": "B0INDEX",
+            "scope": "commands,incoming-webhook",
+            "incoming_webhook": {
+                "channel_id": "C000042", "channel": "#channel-42", "url": "https://hooks.slack.com/new",
+                "configuration_url": "https://example.com",
+            },
+        }
+        with mock.patch.object(models, "call_slack_api", return_value={"ok": False}), \
+                mock.patch.object(models, "get_client"), \
+                CaptureQueriesContext(connection) as queries:
+            workspace, hook = create_workspace_from_oauth2_response(self.user, response)
+
+        self.assertEqual(workspace.slack_users.count(), 4)
+        self.assertEqual(hook.url, "https://hooks.slack.com/new")
+        self.assertEqual(SlackWebHook.objects.filter(channel_id="C000042").count(), 1)
+
+        plans = self.assertQueriesUseIndexes(queries)
+        self.assertIndexSearch(plans, "slack_team_id")
+        self.assertIn("slack_app_webhook_channel_idx", plans)
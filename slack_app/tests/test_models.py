@@ -0,0 +1,85 @@
+from unittest import mock
+
+from django.db import connection
+from django.db.migrations.executor import MigrationExecutor
+from django.test import TestCase, TransactionTestCase
+
+from slack_app import models
+from slack_app.models import SlackUserMapping, SlackWorkspace
+
+TEAM = {
+    "id": "T0MODELS",
+    "name": "Not installed",
+    "domain": "not-installed",
+    "image_34": "https://example.com/34.png",
+}
+
+
+class WorkspaceFieldsTest(TestCase):
+
+    def test_installed_workspace(self):
+        workspace = SlackWorkspace.objects.create(id="T0MODELS", name="Installed", domain="installed")
+        mapping = SlackUserMapping.objects.create(
+            slack_user_id="U0MODELS", slack_team_id="T0MODELS", slack_workspace=workspace,
+            workspace_data={"name": "Stale"},
+        )
+
+        self.assertEqual(mapping.workspace_name, "Installed")
+        self.assertEqual(mapping.workspace_domain, "installed")
+
+    def test_workspace_not_installed(self):
+        mapping = SlackUserMapping.objects.create(
+            slack_user_id="U0MODELS", slack_team_id="T0MODELS", workspace_data={"name": "Not installed"},
+        )
+
+        self.assertEqual(mapping.workspace_name, "Not installed")
+        self.assertIsNone(mapping.workspace_domain)
+        self.assertIsNone(SlackUserMapping(slack_user_id="U1MODELS").workspace_name)
+
+    def test_metadata_of_workspace_not_installed(self):
+        mapping = SlackUserMapping.objects.create(slack_user_id="U0MODELS", slack_team_id="T0MODELS")
+        identity = {"ok": True, "user": {"id": "U0MODELS", "name": "models"}, "team": TEAM}
+
+        with mock.patch.object(models, "call_slack_api", return_value=identity), \
+                mock.patch.object(models, "get_client"):
+            mapping.update_slack_metadata()
+
+        mapping.refresh_from_db()
+        self.assertEqual(mapping.workspace_name, "Not installed")
+        self.assertEqual(mapping.workspace_domain, "not-installed")
+        self.assertEqual(mapping.workspace_image_34, "https://example.com/34.png")
+
+
+class MoveWorkspaceFieldsMigrationTest(TransactionTestCase):
+    before = [("slack_app", "0002_metadata_refreshed_at")]
+    after = [("slack_app", "0004_remove_slackusermapping_workspace_fields")]
+
+    def migrate(self, targets):
+        executor = MigrationExecutor(connection)
+        executor.loader.build_graph()
+        executor.migrate(targets)
+        return executor.loader.project_state(targets).apps
+
+    def tearDown(self):
+        executor = MigrationExecutor(connection)
+        executor.migrate(executor.loader.graph.leaf_nodes())
+
+    def test_workspace_not_installed_keeps_its_data(self):
+        apps = self.migrate(self.before)
+        apps.get_model("slack_app", "SlackUserMapping").objects.create(
+            slack_user_id="U0MODELS", slack_team_id="T0MODELS", access_token="xoxp",
+            workspace_name="Not installed", workspace_domain="not-installed",
+            workspace_image_34="https://example.com/34.png",
+        )
+
+        apps = self.migrate(self.after)
+        mapping = apps.get_model("slack_app", "SlackUserMapping").objects.get(pk="U0MODELS")
+        self.assertEqual(mapping.workspace_data["name"], "Not installed")
+        self.assertEqual(mapping.workspace_data["domain"], "not-installed")
+        self.assertEqual(mapping.workspace_data["image_34"], "https://example.com/34.png")
+
+        apps = self.migrate(self.before)
+        mapping = apps.get_model("slack_app", "SlackUserMapping").objects.get(pk="U0MODELS")
+        self.assertEqual(mapping.workspace_name, "Not installed")
+        self.assertEqual(mapping.workspace_domain, "not-installed")
+        self.assertEqual(mapping.workspace_image_34, "https://example.com/34.png")
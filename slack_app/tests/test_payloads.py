@@ -0,0 +1,76 @@
+import json
+import pickle
+
+from django.http import QueryDict
+from django.test import SimpleTestCase
+
+from slack_app import helpers
+from slack_app.payloads import BlockActionsPayload, CommandPayload, HandlerPayload, parse_interactivity_payload
+
+COMMAND = "command=%2Fdeploy&text=production&team_id=T0PAYLOAD&user_id=U0PAYLOAD&channel_id=C1&channel_id=C2"
+BLOCK_ACTIONS = {"type": "block_actions", "team": {"id": "T0PAYLOAD"}, "user": {"id": "U0PAYLOAD"}, "actions": []}
+
+
+class CommandPayloadTest(SimpleTestCase):
+
+    def setUp(self):
+        self.payload = CommandPayload(QueryDict(COMMAND))
+
+    def test_properties_read_the_query_dict(self):
+        self.assertEqual(self.payload.command, "/deploy")
+        self.assertEqual(self.payload.text, "production")
+        self.assertEqual(self.payload.user_id, "U0PAYLOAD")
+        self.assertEqual(self.payload.getlist("channel_id"), ["C1", "C2"])
+        self.assertEqual(dict.__len__(self.payload), 0)
+
+    def test_filled_on_first_access(self):
+        self.assertEqual(self.payload["channel_id"], "C2")
+        self.assertEqual(dict.__len__(self.payload), 5)
+        self.assertEqual(self.payload.dict(), {
+            "command": "/deploy", "text": "production", "team_id": "T0PAYLOAD", "user_id": "U0PAYLOAD",
+            "channel_id": "C2",
+        })
+
+    def test_dict_without_filling(self):
+        self.assertEqual(self.payload.dict()["channel_id"], "C2")
+        self.assertEqual({**self.payload}["command"], "/deploy")
+        self.assertEqual(dict(self.payload)["text"], "production")
+
+    def test_mutable(self):
+        self.payload["text"] = "staging"
+        self.payload.pop("channel_id")
+
+        self.assertEqual(self.payload.text, "staging")
+        self.assertNotIn("channel_id", self.payload)
+
+    def test_pickle(self):
+        payload = pickle.loads(pickle.dumps(self.payload))
+
+        self.assertIsInstance(payload, CommandPayload)
+        self.assertEqual(payload.command, "/deploy")
+
+    def test_handlers_get_a_filled_dict(self):
+        def handler(request, payload):
+            return json.loads(json.dumps(payload))
+
+        result = helpers.run_handler(handler, None, self.payload)
+
+        self.assertEqual(result["command"], "/deploy")
+        self.assertEqual(json.loads(json.dumps(self.payload)), self.payload.dict())
+
+
+class InteractivityPayloadTest(SimpleTestCase):
+
+    def test_class_by_type(self):
+        payload = parse_interactivity_payload(json.dumps(BLOCK_ACTIONS))
+
+        self.assertIsInstance(payload, BlockActionsPayload)
+        self.assertIsInstance(payload, HandlerPayload)
+        self.assertEqual(payload.team_id, "T0PAYLOAD")
+        self.assertEqual(dict.__len__(payload), 0)
+
+    def test_filled_on_first_access(self):
+        payload = parse_interactivity_payload(json.dumps(BLOCK_ACTIONS))
+
+        self.assertEqual(payload, BLOCK_ACTIONS)
+        self.assertEqual(json.dumps(payload), json.dumps(BLOCK_ACTIONS))
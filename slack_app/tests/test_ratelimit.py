@@ -0,0 +1,69 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+from unittest import mock
+
+from django.core.cache import caches
+from django.test import SimpleTestCase
+
+from slack_app import broadcast, ratelimit
+from slack_app.ratelimit import SlackApiScheduler, PRIORITY_LOW
+
+
+class PostMessageRateLimitTest(SimpleTestCase):
+
+    def setUp(self):
+        caches['default'].clear()
+        self.addCleanup(caches['default'].clear)
+        self.scheduler = SlackApiScheduler('default', max_retries=3, low_priority_reserve=0.2)
+        patcher = mock.patch.object(ratelimit, "scheduler", self.scheduler)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_distinct_dm_channels_are_not_serialized(self):
+        """
+        A channel's bucket allows 8 low priority messages per window, 40 recipients go out without waiting for it
+        """
+        workspace = mock.Mock(id="T0RATE", bot_access_token="xoxb-rate")
+        client = mock.Mock()
+
+        started = time.monotonic()
+        with mock.patch.object(broadcast, "get_client", return_value=client), ThreadPoolExecutor(4) as executor:
+            sent = list(executor.map(
+                lambda i: broadcast.send_direct_message(workspace, f"U{i:04d}", {"text": "hi"}), range(40)
+            ))
+
+        self.assertLess(time.monotonic() - started, 2)
+        self.assertEqual(sent, [True] * 40)
+        self.assertEqual(len({call.kwargs["channel"] for call in client.chat_postMessage.call_args_list}), 40)
+
+    def test_messages_to_a_channel_share_its_bucket(self):
+        channel, workspace = self.scheduler.get_buckets("T0RATE", "chat.postMessage", scope="U0001")
+        for _ in range(channel.limit):
+            self.scheduler.acquire("T0RATE", "chat.postMessage", scope="U0001")
+
+        self.assertGreater(self.scheduler._take(channel), 0)
+        self.assertEqual(self.scheduler._take(workspace), 0)
+
+    def test_workspace_budget(self):
+        with mock.patch.dict(ratelimit.TIERS, {"post_message_workspace": 60}):
+            channel, workspace = self.scheduler.get_buckets("T0RATE", "chat.postMessage", scope="U9999")
+            for i in range(workspace.limit):
+                self.scheduler.acquire("T0RATE", "chat.postMessage", scope=f"U{i:04d}")
+
+            self.assertGreater(self.scheduler._take(workspace), 0)
+            self.assertEqual(self.scheduler._take(channel), 0)
+
+    def test_low_priority_leaves_a_reserve_of_the_workspace_budget(self):
+        channel, workspace = self.scheduler.get_buckets("T0RATE", "chat.postMessage", scope="U0001")
+        self.assertEqual(workspace.limit, 50)
+        self.assertEqual(self.scheduler.get_reserve(workspace, PRIORITY_LOW), 10)
+
+    def test_rate_limited_message_pauses_the_workspace(self):
+        self.scheduler.block("T0RATE", "chat.postMessage", 30, scope="U0001")
+
+        channel, workspace = self.scheduler.get_buckets("T0RATE", "chat.postMessage", scope="U0002")
+        self.assertGreater(self.scheduler._take(workspace), 25)
+        self.assertEqual(self.scheduler._take(channel), 0)
+
+    def test_other_methods_have_a_single_bucket(self):
+        self.assertEqual(len(self.scheduler.get_buckets("T0RATE", "views.publish")), 1)
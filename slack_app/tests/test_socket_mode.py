@@ -0,0 +1,117 @@
+import importlib.util
+import threading
+from unittest import mock, skipUnless
+
+from django.contrib.auth import get_user_model
+from django.http import JsonResponse
+from django.test import TransactionTestCase
+
+from slack_app import decorators, socket_mode
+from slack_app.exceptions import SlackEventRejected
+from slack_app.helpers import slack_commands, slack_interactivity_callbacks
+from slack_app.interactivity import InteractivityIndex
+from slack_app.models import SlackWorkspace, SlackUserMapping
+from slack_app.tests.fake_slack import FakeSlackServer, FakeSocketModeServer
+
+TEAM_ID = "T0SOCKET"
+USER_ID = "U0SOCKET"
+
+
+@skipUnless(importlib.util.find_spec("slack_sdk") and importlib.util.find_spec("websockets"),
+            "Socket Mode requires slack_sdk, the local stand-in websockets")
+class SocketModeDispatcherTest(TransactionTestCase):
+
+    def setUp(self):
+        workspace = SlackWorkspace.objects.create(
+            id=TEAM_ID, name="Socket", scope="commands", bot_access_token="xoxb-socket", bot_user_id="B0SOCKET",
+        )
+        SlackUserMapping.objects.create(
+            slack_user_id=USER_ID, slack_team_id=TEAM_ID, slack_workspace=workspace,
+            user=get_user_model().objects.create(username="socket"), access_token="xoxp-socket",
+        )
+
+        self.socket_mode = FakeSocketModeServer().start()
+        self.addCleanup(self.socket_mode.stop)
+        self.slack = FakeSlackServer(socket_mode_url=self.socket_mode.url).start()
+        self.addCleanup(self.slack.stop)
+
+        self.enqueued = threading.Event()
+        self.enqueue = mock.Mock(side_effect=lambda *args, **kwargs: self.enqueued.set())
+        index = InteractivityIndex()
+        for patcher in [
+            mock.patch.object(socket_mode, "SLACK_API_BASE_URL", self.slack.api_url),
+            mock.patch.object(socket_mode, "enqueue_slack_event", self.enqueue),
+            mock.patch.object(socket_mode, "interactivity_index", index),
+            mock.patch.object(decorators, "interactivity_index", index),
+            mock.patch.dict(slack_commands),
+            mock.patch.dict(slack_interactivity_callbacks),
+        ]:
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+        @decorators.slack_command("socket")
+        def socket_command(request, payload, slack_user_mapping, slack_workspace):
+            return JsonResponse({"text": f"Hello {slack_user_mapping.user.username}, {payload.text}"})
+
+        @decorators.slack_interactivity("block_actions", action_id="approve", require_linked_account=False)
+        def approve(request, payload, slack_user_mapping, slack_workspace):
+            return JsonResponse({"text": f"Approved {payload.actions[0]['value']}"})
+
+        self.client = socket_mode.create_socket_mode_client("xapp-socket", concurrency=2)
+        self.addCleanup(self.client.close)
+        self.client.connect()
+        self.assertTrue(self.socket_mode.wait_for_connection())
+
+    def test_events_api(self):
+        payload = {
+            "type": "event_callback", "team_id": TEAM_ID, "event_id": "Ev0SOCKET",
+            "event": {"type": "app_mention", "user": USER_ID, "text": "hi"},
+        }
+        envelope_id = self.socket_mode.send("events_api", payload, retry_attempt=1, retry_reason="timeout")
+
+        self.assertEqual(self.socket_mode.wait_for_ack(envelope_id), {"envelope_id": envelope_id})
+        self.assertTrue(self.enqueued.wait(5))
+        self.enqueue.assert_called_once_with(socket_mode.SENDER, payload, retry_reason="timeout")
+
+    def test_events_api_acknowledged_once_enqueued(self):
+        acked_when_enqueued = []
+        self.enqueue.side_effect = lambda *args, **kwargs: acked_when_enqueued.append(set(self.socket_mode.acks))
+
+        envelope_id = self.socket_mode.send("events_api", {"type": "event_callback", "event_id": "Ev1SOCKET"})
+
+        self.assertEqual(self.socket_mode.wait_for_ack(envelope_id), {"envelope_id": envelope_id})
+        self.assertEqual(len(acked_when_enqueued), 1)
+        self.assertNotIn(envelope_id, acked_when_enqueued[0])
+
+    def test_rejected_event_is_not_acknowledged(self):
+        self.enqueue.side_effect = SlackEventRejected("Slack event dispatch queue is full")
+
+        envelope_id = self.socket_mode.send("events_api", {"type": "event_callback", "event_id": "Ev2SOCKET"})
+
+        self.assertIsNone(self.socket_mode.wait_for_ack(envelope_id, timeout=1))
+        self.enqueue.assert_called_once()
+
+    def test_slash_command(self):
+        envelope_id = self.socket_mode.send("slash_commands", {
+            "command": "/socket", "text": "there", "team_id": TEAM_ID, "user_id": USER_ID,
+            "response_url": "https://hooks.slack.com/commands/socket", "trigger_id": "1.2.3",
+        })
+
+        ack = self.socket_mode.wait_for_ack(envelope_id)
+        self.assertEqual(ack, {"envelope_id": envelope_id, "payload": {"text": "Hello socket, there"}})
+
+    def test_interactive(self):
+        envelope_id = self.socket_mode.send("interactive", {
+            "type": "block_actions", "team": {"id": TEAM_ID}, "user": {"id": USER_ID}, "trigger_id": "1.2.3",
+            "actions": [{"action_id": "approve", "block_id": "request", "type": "button", "value": "42"}],
+        })
+
+        ack = self.socket_mode.wait_for_ack(envelope_id)
+        self.assertEqual(ack, {"envelope_id": envelope_id, "payload": {"text": "Approved 42"}})
+
+    def test_unknown_command_is_acknowledged(self):
+        envelope_id = self.socket_mode.send("slash_commands", {
+            "command": "/unknown", "text": "", "team_id": TEAM_ID, "user_id": USER_ID,
+        })
+
+        self.assertEqual(self.socket_mode.wait_for_ack(envelope_id), {"envelope_id": envelope_id})
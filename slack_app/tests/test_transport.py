@@ -0,0 +1,60 @@
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from django.test import SimpleTestCase
+
+from slack_app.transport import PooledHttpClient
+
+
+class Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get('Content-Length') or 0))
+        self.server.requests.append(self.path)
+        if self.path == '/slow':
+            time.sleep(0.3)
+        try:
+            self.send_response(200)
+            self.send_header("Content-Length", "2")
+            self.end_headers()
+            self.wfile.write(b"ok")
+        except BrokenPipeError:
+            # the client gave up waiting
+            return
+        # closes the connection without telling the client, as servers do with idle keep-alive connections
+        self.close_connection = self.path == '/close'
+
+
+class PooledHttpClientTest(SimpleTestCase):
+
+    def setUp(self):
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.server.daemon_threads = True
+        self.server.requests = []
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.addCleanup(self.server.server_close)
+        self.addCleanup(self.server.shutdown)
+        self.url = "http://%s:%s" % self.server.server_address[:2]
+        self.client = PooledHttpClient(timeout=0.1, max_connections_per_host=1)
+
+    def test_stale_connection_is_retried(self):
+        self.assertEqual(self.client.request('POST', f"{self.url}/close", b"{}").status, 200)
+        time.sleep(0.05)
+        self.assertEqual(self.client.request('POST', f"{self.url}/next", b"{}").status, 200)
+        self.assertEqual(self.server.requests, ['/close', '/next'])
+
+    def test_timeout_is_not_retried(self):
+        self.client.request('POST', f"{self.url}/first", b"{}")  # a kept-alive connection to reuse
+
+        with self.assertRaises(TimeoutError):
+            self.client.request('POST', f"{self.url}/slow", b"{}")
+        with self.assertRaises(TimeoutError):
+            self.client.post_json(f"{self.url}/slow", {"text": "once"})
+
+        time.sleep(0.4)
+        self.assertEqual(self.server.requests, ['/first', '/slow', '/slow'])
@@ -0,0 +1,152 @@
+from datetime import timedelta
+from unittest import mock
+
+from django.db.models import QuerySet
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from slack_app import tasks, uninstall
+from slack_app.models import SlackWorkspace, SlackWorkspaceUninstall, SlackUserMapping, SlackWebHook, \
+    SlackEventPayload
+from slack_app.uninstall import schedule_uninstall, uninstall_workspace, claim_stale_uninstall, \
+    restart_finished_uninstall
+
+
+class ScheduleUninstallTest(TestCase):
+
+    def setUp(self):
+        self.workspace = SlackWorkspace.objects.create(
+            id="T0UNINSTALL", name="Uninstall", scope="commands", bot_access_token="xoxb-uninstall",
+            bot_user_id="B0UNINSTALL",
+        )
+        patcher = mock.patch.object(tasks.uninstall_slack_workspace_task, "delay")
+        self.delay = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def schedule(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            return schedule_uninstall(self.workspace)
+
+    def test_scheduled_once(self):
+        self.schedule()
+        self.schedule()
+        self.delay.assert_called_once_with("T0UNINSTALL")
+
+    def test_stale_uninstall_is_scheduled_again(self):
+        self.schedule()
+        SlackWorkspaceUninstall.objects.update(updated=timezone.now() - timedelta(hours=1))
+
+        self.schedule()
+        self.schedule()
+        self.assertEqual(self.delay.call_count, 2)
+
+    def test_finished_uninstall_is_restarted(self):
+        self.schedule()
+        SlackWorkspaceUninstall.objects.update(
+            slack_uninstalled_at=timezone.now(), finished_at=timezone.now(), user_mappings_deleted=3
+        )
+
+        progress = self.schedule()
+        self.assertEqual(self.delay.call_count, 2)
+        self.assertIsNone(progress.finished_at)
+        self.assertIsNone(SlackWorkspaceUninstall.objects.get().slack_uninstalled_at)
+        self.assertEqual(progress.user_mappings_deleted, 0)
+
+
+@override_settings(SLACK_CLIENT_ID="client-id", SLACK_CLIENT_SECRET="client-secret")
+class UninstallWorkspaceTest(TestCase):
+
+    def setUp(self):
+        self.install()
+        SlackEventPayload.objects.create(
+            key="other", data=b"{}", expires_at=timezone.now() + timedelta(hours=1), team_id="T1UNINSTALL"
+        )
+        for patcher in [
+            mock.patch.object(uninstall, "call_slack_api"),
+            mock.patch.object(uninstall, "get_client"),
+            mock.patch.object(uninstall, "SLACK_UNINSTALL_CHUNK_SIZE", 2),
+        ]:
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self.raw_delete = QuerySet._raw_delete
+
+    def install(self):
+        workspace = SlackWorkspace.objects.create(
+            id="T0UNINSTALL", name="Uninstall", scope="commands", bot_access_token="xoxb-uninstall",
+            bot_user_id="B0UNINSTALL",
+        )
+        SlackUserMapping.objects.bulk_create([
+            SlackUserMapping(slack_user_id=f"U{i}UNINSTALL", slack_team_id=workspace.pk, slack_workspace=workspace,
+                             access_token=f"xoxp-{i}")
+            for i in range(5)
+        ])
+        SlackWebHook.objects.bulk_create([
+            SlackWebHook(workspace=workspace, channel_name="general", channel_id=f"C{i}",
+                         configuration_url="https://example.com", url=f"https://hooks.example.com/{i}")
+            for i in range(3)
+        ])
+        SlackEventPayload.objects.bulk_create([
+            SlackEventPayload(key=f"payload-{i}", data=b"{}", expires_at=timezone.now() + timedelta(hours=1),
+                              team_id=workspace.pk)
+            for i in range(3)
+        ])
+
+    def test_deletes_in_chunks(self):
+        with mock.patch.object(QuerySet, "_raw_delete", autospec=True, side_effect=self.raw_delete) as raw_delete:
+            progress = uninstall_workspace("T0UNINSTALL")
+
+        # 5 mappings, 3 webhooks & 3 event payloads in chunks of 2, workspace.delete() fast-deletes what's left
+        chunks = [call.args[0].model for call in raw_delete.call_args_list]
+        self.assertEqual(chunks[:7], [SlackUserMapping] * 3 + [SlackWebHook] * 2 + [SlackEventPayload] * 2)
+        self.assertEqual(
+            (progress.user_mappings_deleted, progress.webhooks_deleted, progress.event_payloads_deleted), (5, 3, 3)
+        )
+        self.assertIsNotNone(progress.finished_at)
+        self.assertFalse(SlackWorkspace.objects.exists())
+        self.assertFalse(SlackUserMapping.objects.exists())
+        self.assertFalse(SlackWebHook.objects.exists())
+        self.assertEqual(list(SlackEventPayload.objects.values_list("pk", flat=True)), ["other"])
+        uninstall.call_slack_api.assert_called_once()
+
+    def test_resumes_after_a_partial_failure(self):
+        def fail_second_chunk(queryset, using):
+            if raw_delete.call_count == 2:
+                raise ConnectionError("database went away")
+            return self.raw_delete(queryset, using)
+
+        with mock.patch.object(QuerySet, "_raw_delete", autospec=True, side_effect=fail_second_chunk) as raw_delete, \
+                self.assertRaises(ConnectionError):
+            uninstall_workspace("T0UNINSTALL")
+
+        progress = SlackWorkspaceUninstall.objects.get()
+        self.assertIsNotNone(progress.slack_uninstalled_at)
+        self.assertIsNone(progress.finished_at)
+        self.assertEqual(progress.user_mappings_deleted, 2)
+        self.assertEqual(SlackUserMapping.objects.count(), 3)
+
+        self.assertFalse(claim_stale_uninstall(progress))
+        SlackWorkspaceUninstall.objects.update(updated=timezone.now() - timedelta(hours=1))
+        self.assertTrue(claim_stale_uninstall(progress))
+
+        progress = uninstall_workspace("T0UNINSTALL")
+        self.assertEqual(
+            (progress.user_mappings_deleted, progress.webhooks_deleted, progress.event_payloads_deleted), (5, 3, 3)
+        )
+        self.assertIsNotNone(progress.finished_at)
+        self.assertFalse(SlackWorkspace.objects.exists())
+        # Slack isn't called again by the resumed uninstall
+        uninstall.call_slack_api.assert_called_once()
+
+    def test_workspace_installed_again(self):
+        progress = uninstall_workspace("T0UNINSTALL")
+        self.install()
+
+        self.assertTrue(restart_finished_uninstall(progress))
+        self.assertFalse(restart_finished_uninstall(progress))
+        progress = uninstall_workspace("T0UNINSTALL")
+
+        self.assertEqual(
+            (progress.user_mappings_deleted, progress.webhooks_deleted, progress.event_payloads_deleted), (5, 3, 3)
+        )
+        self.assertFalse(SlackWorkspace.objects.exists())
+        self.assertEqual(uninstall.call_slack_api.call_count, 2)
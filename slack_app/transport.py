@@ -0,0 +1,152 @@
+"""
+Minimal pooled HTTP client for posting JSON to Slack URLs (response_url, incoming webhooks).
+
+Connections are kept alive and reused per host, the number of requests in flight to a single host is bounded.
+"""
+import http.client
+import json
+import queue
+import threading
+import time
+from collections import namedtuple
+from typing import Optional
+from urllib.parse import urlsplit
+
+from . import metrics
+from .settings import SLACK_HTTP_TIMEOUT, SLACK_HTTP_MAX_CONNECTIONS_PER_HOST
+
+HttpResponse = namedtuple('HttpResponse', 'status headers body')
+
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+
+class StaleConnection(ConnectionError):
+    """
+    The request couldn't be sent over a kept-alive connection
+    """
+
+
+# raised before Slack could have received the request, so it's safe to send it again
+STALE_CONNECTION_ERRORS = (StaleConnection, http.client.RemoteDisconnected)
+
+
+class HostPool:
+
+    def __init__(self, scheme: str, netloc: str, max_connections: int, timeout: float):
+        self.scheme = scheme
+        self.netloc = netloc
+        self.timeout = timeout
+        self.idle = queue.LifoQueue(maxsize=max_connections)
+        self.semaphore = threading.BoundedSemaphore(max_connections)
+
+    def new_connection(self) -> http.client.HTTPConnection:
+        connection_class = http.client.HTTPSConnection if self.scheme == 'https' else http.client.HTTPConnection
+        return connection_class(self.netloc, timeout=self.timeout)
+
+    def get_connection(self):
+        try:
+            return self.idle.get_nowait(), True
+        except queue.Empty:
+            return self.new_connection(), False
+
+    def release(self, connection):
+        try:
+            self.idle.put_nowait(connection)
+        except queue.Full:
+            connection.close()
+
+
+class PooledHttpClient:
+
+    def __init__(self, timeout: float, max_connections_per_host: int):
+        self.timeout = timeout
+        self.max_connections_per_host = max_connections_per_host
+        self._pools = {}
+        self._lock = threading.Lock()
+
+    def get_pool(self, scheme: str, netloc: str) -> HostPool:
+        with self._lock:
+            pool = self._pools.get((scheme, netloc))
+            if pool is None:
+                pool = self._pools[(scheme, netloc)] = HostPool(
+                    scheme, netloc, self.max_connections_per_host, self.timeout
+                )
+            return pool
+
+    @staticmethod
+    def _send(connection, method: str, path: str, body: Optional[bytes], headers: Optional[dict]):
+        try:
+            connection.request(method, path, body=body, headers=headers or {})
+        except (BrokenPipeError, ConnectionResetError) as err:
+            raise StaleConnection from err
+        # RemoteDisconnected: closed without sending a single byte of the response
+        return connection.getresponse()
+
+    def request(self, method: str, url: str, body: Optional[bytes] = None,
+                headers: Optional[dict] = None) -> HttpResponse:
+        parts = urlsplit(url)
+        path = parts.path or '/'
+        if parts.query:
+            path = f"{path}?{parts.query}"
+
+        pool = self.get_pool(parts.scheme, parts.netloc)
+        with pool.semaphore:
+            connection, reused = pool.get_connection()
+            try:
+                response = self._send(connection, method, path, body, headers)
+            except STALE_CONNECTION_ERRORS:
+                connection.close()
+                if not reused:
+                    raise
+                # the server has closed an idle keep-alive connection before reading the request,
+                # let's try once more with a fresh one
+                metrics.incr('slack_http_stale_connections', host=parts.netloc)
+                connection = pool.new_connection()
+                try:
+                    response = self._send(connection, method, path, body, headers)
+                except (http.client.HTTPException, OSError):
+                    connection.close()
+                    raise
+            except (http.client.HTTPException, OSError):
+                # e.g. a timeout, the request may have been processed already, so it's never sent again
+                connection.close()
+                raise
+
+            data = response.read()
+            if response.will_close:
+                connection.close()
+            else:
+                pool.release(connection)
+
+        return HttpResponse(response.status, dict(response.getheaders()), data)
+
+    def post_json(self, url: str, payload, retries=3, backoff=0.5) -> HttpResponse:
+        """
+        Posts JSON payload, retries on connection errors (but timeouts), HTTP 429 (honouring Retry-After) and 5xx
+        """
+        body = payload if isinstance(payload, bytes) else json.dumps(payload).encode('utf-8')
+        headers = {"Content-Type": "application/json; charset=utf-8"}
+
+        attempt = 0
+        while True:
+            try:
+                response = self.request('POST', url, body=body, headers=headers)
+            except TimeoutError:
+                # the message may have been posted already
+                raise
+            except (http.client.HTTPException, OSError):
+                if attempt >= retries:
+                    raise
+                delay = backoff * 2 ** attempt
+            else:
+                if response.status not in RETRY_STATUSES or attempt >= retries:
+                    return response
+                retry_after = response.headers.get('Retry-After') or response.headers.get('retry-after')
+                delay = float(retry_after) if retry_after else backoff * 2 ** attempt
+
+            metrics.incr('slack_http_retries', host=urlsplit(url).netloc)
+            attempt += 1
+            time.sleep(delay)
+
+
+http_client = PooledHttpClient(SLACK_HTTP_TIMEOUT, SLACK_HTTP_MAX_CONNECTIONS_PER_HOST)
@@ -0,0 +1,198 @@
+"""
+Uninstall of a workspace, off the request path.
+
+Deleting a SlackWorkspace directly calls `apps.uninstall` within the request and lets Django collect & delete
+every user mapping and webhook of the workspace in one transaction. `schedule_uninstall` runs the same
+on a Celery worker instead:
+
+1. `apps.uninstall` is called (once, the time is recorded)
+2. user mappings, webhooks & event payloads stored by the claim-check are deleted in chunks of
+   SLACK_UNINSTALL_CHUNK_SIZE rows, each chunk with a single DELETE statement in its own transaction, without loading
+   the rows as objects or sending delete signals
+3. the workspace is deleted, with whatever was created in the meantime
+
+Progress is kept in SlackWorkspaceUninstall. Every step is safe to repeat, so an interrupted uninstall is resumed
+by running it again, e.g. `manage.py uninstall_slack_workspace --pending`.
+"""
+import logging
+from datetime import timedelta
+from typing import Callable, Iterable, Optional
+
+from django.conf import settings
+from django.db import router, transaction
+from django.db.models import F, QuerySet
+from django.utils import timezone
+from slack.errors import SlackApiError
+
+from . import metrics
+from .cache import lookup_cache, user_mapping_key
+from .clients import get_client, evict_client
+from .models import SlackWorkspace, SlackUserMapping, SlackWebHook, SlackWorkspaceUninstall, SlackEventPayload
+from .ratelimit import call_slack_api
+from .settings import SLACK_UNINSTALL_CHUNK_SIZE, SLACK_UNINSTALL_STALE_AFTER
+
+logger = logging.getLogger(__name__)
+
+
+def schedule_uninstall(workspace: SlackWorkspace) -> SlackWorkspaceUninstall:
+    """
+    Records the uninstall and runs it on a Celery worker once the current transaction commits.
+    An uninstall in progress isn't scheduled again, unless it's made no progress for SLACK_UNINSTALL_STALE_AFTER
+    seconds (e.g. its worker was killed).
+    """
+    from .tasks import uninstall_slack_workspace_task
+
+    progress, created = SlackWorkspaceUninstall.objects.get_or_create(
+        workspace_id=workspace.pk, defaults={'workspace_name': workspace.name or ''}
+    )
+    if created or restart_finished_uninstall(progress) or claim_stale_uninstall(progress):
+        transaction.on_commit(lambda: uninstall_slack_workspace_task.delay(workspace.pk))
+    return progress
+
+
+def claim_stale_uninstall(progress: SlackWorkspaceUninstall) -> bool:
+    """
+    Returns True if the uninstall is unfinished & stale, marking it as updated, so only one of concurrent callers gets
+    True
+    """
+    now = timezone.now()
+    claimed = SlackWorkspaceUninstall.objects.filter(
+        pk=progress.pk, finished_at__isnull=True, updated__lt=now - timedelta(seconds=SLACK_UNINSTALL_STALE_AFTER)
+    ).update(updated=now)
+    if claimed:
+        progress.updated = now
+    return bool(claimed)
+
+
+def restart_finished_uninstall(progress: SlackWorkspaceUninstall) -> bool:
+    """
+    Resets a finished uninstall of a workspace installed again since, returns True if it did
+    """
+    now = timezone.now()
+    restarted = {
+        'started': now, 'updated': now, 'slack_uninstalled_at': None, 'finished_at': None,
+        'user_mappings_deleted': 0, 'webhooks_deleted': 0, 'event_payloads_deleted': 0,
+    }
+    if not SlackWorkspaceUninstall.objects.filter(pk=progress.pk, finished_at__isnull=False).update(**restarted):
+        return False
+
+    for field, value in restarted.items():
+        setattr(progress, field, value)
+    return True
+
+
+def uninstall_from_slack(workspace: SlackWorkspace):
+    client = get_client(workspace.bot_access_token)
+    try:
+        call_slack_api(workspace.id, 'apps.uninstall', client.api_call, 'apps.uninstall', params={
+            "client_id": settings.SLACK_CLIENT_ID,
+            "client_secret": settings.SLACK_CLIENT_SECRET,
+        })
+    except SlackApiError as e:
+        # e.g. the token has been revoked already, there is nothing left to uninstall
+        metrics.incr('slack_uninstall_slack_errors')
+        logger.warning("apps.uninstall of workspace %s failed: %s", workspace.id, e)
+    finally:
+        evict_client(workspace.bot_access_token)
+
+
+def delete_in_chunks(queryset: QuerySet, chunk_size: int, fields: Iterable[str] = (),
+                     before_delete: Optional[Callable[[list], None]] = None):
+    """
+    Deletes the rows of `queryset` chunk by chunk, yields the number of rows deleted by each chunk
+
+    :param fields: values passed to `before_delete` along with the primary key of each row
+    :param before_delete: called with the rows of a chunk, e.g. to do what delete signals would do
+    """
+    model = queryset.model
+    using = router.db_for_write(model)
+    while True:
+        rows = list(queryset.values_list('pk', *fields)[:chunk_size])
+        if not rows:
+            return
+
+        if before_delete is not None:
+            before_delete(rows)
+        with transaction.atomic(using=using):
+            # a single DELETE ... WHERE pk IN (...), no cascade collection nor signals
+            deleted = model.objects.filter(pk__in=[row[0] for row in rows])._raw_delete(using)
+        yield deleted
+
+
+def forget_user_mappings(rows: list):
+    """
+    What the delete signals of SlackUserMapping do, for rows of (slack_user_id, access_token)
+    """
+    for slack_user_id, access_token in rows:
+        evict_client(access_token)
+    lookup_cache.delete_many([user_mapping_key(slack_user_id) for slack_user_id, access_token in rows])
+
+
+def uninstall_workspace(workspace_id: str, chunk_size: Optional[int] = None,
+                        progress_callback: Optional[Callable[[SlackWorkspaceUninstall], None]] = None) \
+        -> Optional[SlackWorkspaceUninstall]:
+    """
+    Uninstalls the workspace, resuming a previous attempt if there is one
+
+    :param progress_callback: called with the progress after every step & chunk
+    :return: the progress, None if there is neither the workspace nor its uninstall
+    """
+    chunk_size = chunk_size or SLACK_UNINSTALL_CHUNK_SIZE
+    workspace = SlackWorkspace.objects.filter(pk=workspace_id).first()
+    if workspace is None:
+        # the workspace was deleted by the previous attempt, or directly
+        SlackWorkspaceUninstall.objects.filter(pk=workspace_id, finished_at__isnull=True) \
+            .update(finished_at=timezone.now())
+        return SlackWorkspaceUninstall.objects.filter(pk=workspace_id).first()
+
+    progress, created = SlackWorkspaceUninstall.objects.get_or_create(
+        workspace_id=workspace.pk, defaults={'workspace_name': workspace.name or ''}
+    )
+    if not created:
+        restart_finished_uninstall(progress)
+
+    def report(**deleted):
+        # also the heartbeat telling schedule_uninstall the uninstall is alive
+        progress.updated = timezone.now()
+        SlackWorkspaceUninstall.objects.filter(pk=progress.pk).update(
+            updated=progress.updated, **{field: F(field) + count for field, count in deleted.items()}
+        )
+        for field, count in deleted.items():
+            setattr(progress, field, getattr(progress, field) + count)
+            metrics.incr('slack_uninstall_rows_deleted', count, model=field.replace('_deleted', ''))
+        logger.info("Uninstalling workspace %s: %s user mappings, %s webhooks & %s event payloads deleted",
+                    workspace.pk, progress.user_mappings_deleted, progress.webhooks_deleted,
+                    progress.event_payloads_deleted)
+        if progress_callback is not None:
+            progress_callback(progress)
+
+    if progress.slack_uninstalled_at is None:
+        uninstall_from_slack(workspace)
+        progress.slack_uninstalled_at = timezone.now()
+        progress.save(update_fields=['slack_uninstalled_at'])
+        report()
+
+    user_mappings = SlackUserMapping.objects.filter(slack_workspace_id=workspace.pk)
+    for deleted in delete_in_chunks(user_mappings, chunk_size, ['access_token'], forget_user_mappings):
+        report(user_mappings_deleted=deleted)
+
+    for deleted in delete_in_chunks(SlackWebHook.objects.filter(workspace_id=workspace.pk), chunk_size):
+        report(webhooks_deleted=deleted)
+
+    for deleted in delete_in_chunks(SlackEventPayload.objects.filter(team_id=workspace.pk), chunk_size):
+        report(event_payloads_deleted=deleted)
+
+    with metrics.timer('slack_uninstall_workspace_delete_seconds'):
+        # Slack has been called already, see post_delete_slack_workspace
+        workspace._slack_uninstalled = True
+        workspace.delete()
+
+    progress.finished_at = timezone.now()
+    progress.save(update_fields=['finished_at'])
+    metrics.incr('slack_uninstalls_finished')
+    report()
+    return progress
+
+
+def get_pending_uninstalls() -> QuerySet:
+    return SlackWorkspaceUninstall.objects.filter(finished_at__isnull=True)
@@ -1,7 +1,7 @@
 from django.urls import path
 
 from .views import slack_oauthcallback, slack_login_callback, slack_interactivity, slack_command, connect_account, \
-    slack_events
+    slack_events, slack_metrics
 
 app_name = "slack_app"
 
@@ -12,4 +12,5 @@ urlpatterns = [
     path('events/', slack_events, name='events'),
     path('commands/<str:name>/', slack_command, name='command'),
     path('connect/<str:nonce>/', connect_account, name='connect_account'),
+    path('metrics/', slack_metrics, name='metrics'),
 ]
\ No newline at end of file
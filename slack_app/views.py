@@ -1,23 +1,31 @@
-import json
 from typing import Tuple
 
-import slack
 from django.conf import settings
 from django.contrib.auth import authenticate, login
 from django.contrib.auth.decorators import login_required
 from django.db import transaction
-from django.http import HttpResponseRedirect, HttpResponse, JsonResponse
+from django.http import HttpResponseRedirect, HttpResponse, JsonResponse, Http404
 from django.shortcuts import render, get_object_or_404
 from django.urls import reverse
+from django.utils.crypto import constant_time_compare
 from django.views.decorators.http import require_http_methods
 
-from .tasks import receive_slack_signal_task
+from . import metrics
+from .clients import get_client
+from .cache import get_workspace, get_or_create_user_mapping
+from .ratelimit import call_slack_api, PRIORITY_HIGH
+from .events import enqueue_slack_event
 from .exceptions import SlackAppNotInstalledProperlyException, SlackAccountNotLinkedException, SlackCommandDoesNotExist, \
-    SlackInteractivityTypeDoesNotExist
+    SlackInteractivityTypeDoesNotExist, SlackEventRejected
 from .models import SlackWorkspace, SlackUserMapping
 from .decorators import slack_verify_request
-from .settings import SLACK_LOGIN_OAUTH_REDIRECT_URL, SLACK_INSTALL_OAUTH_REDIRECT_URL
-from .helpers import create_workspace_from_oauth2_response, slack_interactivity_callbacks, slack_commands
+from .settings import SLACK_LOGIN_OAUTH_REDIRECT_URL, SLACK_INSTALL_OAUTH_REDIRECT_URL, \
+    SLACK_METRICS_ENDPOINT_ENABLED, SLACK_METRICS_TOKEN
+from .interactivity import interactivity_index
+from .payloads import CommandPayload, EventPayload, parse_interactivity_payload
+from .deferred import defer_handler, COMMAND, INTERACTIVITY
+from .helpers import create_workspace_from_oauth2_response, slack_interactivity_callbacks, slack_commands, \
+    run_handler
 
 
 @login_required  # we make sure user is logged-in in order to link Slack
@@ -30,9 +38,13 @@ def slack_oauthcallback(request):
 
     code = request.GET.get("code")
 
-    client = slack.WebClient(token="")
+    client = get_client()
 
-    response = client.oauth_v2_access(
+    response = call_slack_api(
+        None,
+        'oauth.v2.access',
+        client.oauth_v2_access,
+        priority=PRIORITY_HIGH,
         client_id=settings.SLACK_CLIENT_ID,
         client_secret=settings.SLACK_CLIENT_SECRET,
         code=code
@@ -66,50 +78,63 @@ def slack_login_callback(request):
 @slack_verify_request
 @require_http_methods(["POST"])
 def slack_interactivity(request):
-    payload = json.loads(request.POST.get('payload'))
-    payload_type = payload.get("type")
-    callback = slack_interactivity_callbacks.get(payload_type, None)
+    payload = parse_interactivity_payload(request.POST.get('payload'))
+    payload_type = payload.type
+    name = interactivity_index.resolve(payload)
+    callback = slack_interactivity_callbacks.get(name, None) if name else None
 
     if callback is None:
         raise SlackInteractivityTypeDoesNotExist(
             f"Interactivity type '{payload_type}' is not linked using @slack_interactivity decorator")
 
-    fn, required_linked_account = callback
+    fn = callback.fn
     if fn:
-        if required_linked_account:
+        if callback.require_linked_account:
             try:
                 mapping, workspace = get_slack_user_and_workspace(
                     payload.get('team').get('id'),
                     payload.get('user').get('id'),
                 )
             except SlackAppNotInstalledProperlyException:
-                return JsonResponse({
-                    "text": "Slack application is not linked to your workspace. " +
-                            "Please ask your administrators to finish the installation."
-                })
+                return app_not_installed_response()
             except SlackAccountNotLinkedException as err:
-                url = reverse('slack_app:connect_account', kwargs={'nonce': err.slack_user_mapping.nonce})
-                return JsonResponse({
-                    "text": "Hi, it seems like you haven't linked your Slack account to your Scrumie account. " +
-                            f"You can do so <{request.build_absolute_uri(url)}|here>"
-                })
+                return account_not_linked_response(request, err.slack_user_mapping)
         else:
             mapping = None
             workspace = None
-        return fn(request, payload, mapping, workspace)
+
+        if callback.deferred:
+            return defer_handler(INTERACTIVITY, name, request, payload, mapping, workspace)
+
+        return run_handler(fn, request, payload, mapping, workspace, kind=INTERACTIVITY)
 
     return HttpResponse(status=400)
 
 
+def app_not_installed_response() -> JsonResponse:
+    return JsonResponse({
+        "text": "Slack application is not linked to your workspace. " +
+                "Please ask your administrators to finish the installation."
+    })
+
+
+def account_not_linked_response(request, slack_user_mapping: SlackUserMapping) -> JsonResponse:
+    url = reverse('slack_app:connect_account', kwargs={'nonce': slack_user_mapping.nonce})
+    return JsonResponse({
+        "text": "Hi, it seems like you haven't linked your Slack account to your Scrumie account. " +
+                f"You can do so <{request.build_absolute_uri(url)}|here>"
+    })
+
+
 def get_slack_user_and_workspace(team_id, user_id) -> Tuple[SlackUserMapping, SlackWorkspace]:
-    try:
-        workspace = SlackWorkspace.objects.get(id=team_id)
-    except SlackWorkspace.DoesNotExist:
-        raise SlackAppNotInstalledProperlyException("Application is not installed properly")
+    with metrics.timer('slack_model_resolution_seconds'):
+        workspace = get_workspace(team_id)
+        if workspace is None:
+            raise SlackAppNotInstalledProperlyException("Application is not installed properly")
 
-    mapping, created = SlackUserMapping.objects.get_or_create(slack_user_id=user_id, slack_workspace=workspace)
+        mapping, created = get_or_create_user_mapping(user_id, workspace)
 
-    if created or mapping.user is None:
+    if created or mapping.user_id is None:
         raise SlackAccountNotLinkedException(mapping)
 
     return mapping, workspace
@@ -118,36 +143,32 @@ def get_slack_user_and_workspace(team_id, user_id) -> Tuple[SlackUserMapping, Sl
 @slack_verify_request
 @require_http_methods(["POST"])
 def slack_command(request, name: str):
-    payload = request.POST
+    payload = CommandPayload(request.POST)
     callback = slack_commands.get(name, None)
 
     if callback is None:
         raise SlackCommandDoesNotExist(f"Command '{name}' is not linked using @slack_command decorator")
 
-    fn, required_linked_account = callback
+    fn = callback.fn
     if fn:
-        if required_linked_account:
+        if callback.require_linked_account:
             try:
                 mapping, workspace = get_slack_user_and_workspace(
                     request.POST.get('team_id'),
                     request.POST.get('user_id')
                 )
             except SlackAppNotInstalledProperlyException:
-                return JsonResponse({
-                    "text": "Slack application is not linked to your workspace. " +
-                            "Please ask your administrators to finish the installation."
-                })
+                return app_not_installed_response()
             except SlackAccountNotLinkedException as err:
-                url = reverse('slack_app:connect_account', kwargs={'nonce': err.slack_user_mapping.nonce})
-                return JsonResponse({
-                    "text": "Hi, it seems like you haven't linked your Slack account to your Scrumie account. " +
-                            f"You can do so <{request.build_absolute_uri(url)}|here>"
-                })
+                return account_not_linked_response(request, err.slack_user_mapping)
         else:
             workspace = None
             mapping = None
 
-        return fn(request, payload, mapping, workspace)
+        if callback.deferred:
+            return defer_handler(COMMAND, name, request, payload, mapping, workspace)
+
+        return run_handler(fn, request, payload, mapping, workspace, kind=COMMAND)
 
     return HttpResponse(status=400)
 
@@ -165,21 +186,38 @@ def connect_account(request, nonce: str):
 
 @slack_verify_request
 def slack_events(request):
-    data = json.loads(request.body)
+    payload = EventPayload(request.body)
 
-    if data.get("type") == "url_verification":
+    if payload.type == "url_verification":
         return JsonResponse({
-            "challenge": data.get("challenge"),
+            "challenge": payload.get("challenge"),
         })
 
-    if data.get("type") == "event_callback":
-        event_data = data.pop('event')
-        event_type = event_data.pop('type')
-
-        receive_slack_signal_task.delay(sender=request.get_host(), event_type=event_type, event_data=event_data, **data)
+    if payload.type == "event_callback":
+        try:
+            enqueue_slack_event(request.get_host(), payload.dict(),
+                                retry_reason=request.META.get('HTTP_X_SLACK_RETRY_REASON'))
+        except SlackEventRejected:
+            return HttpResponse(status=503)
         return JsonResponse({})
 
-    if data.get("type") == 'app_rate_limited':
+    if payload.type == 'app_rate_limited':
         return JsonResponse({})
 
-    return NotImplementedError(f"Unknown type {type}")
\ No newline at end of file
+    return NotImplementedError(f"Unknown type {type}")
+
+
+@require_http_methods(["GET"])
+def slack_metrics(request):
+    """
+    Metrics of this process in Prometheus text format, see SLACK_METRICS_ENDPOINT_ENABLED
+    """
+    if not SLACK_METRICS_ENDPOINT_ENABLED:
+        raise Http404()
+
+    if SLACK_METRICS_TOKEN and not constant_time_compare(
+        request.META.get('HTTP_AUTHORIZATION', ''), f"Bearer {SLACK_METRICS_TOKEN}"
+    ):
+        return HttpResponse(status=401)
+
+    return HttpResponse(metrics.render_prometheus(), content_type='text/plain; version=0.0.4; charset=utf-8')
@@ -0,0 +1,82 @@
+"""
+Delivery of a message to many incoming webhooks, see `SlackWebHook.objects.broadcast`.
+
+Webhooks are streamed from the database and posted concurrently through the pooled `http_client`, which bounds
+requests in flight per host and retries HTTP 429 & 5xx with backoff. Hooks Slack reports as gone
+(the channel was archived or deleted, the app removed) are marked dead and skipped by later broadcasts.
+"""
+import http.client
+import json
+import logging
+import threading
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from typing import Iterable, List
+
+from django.utils import timezone
+
+from . import metrics
+from .settings import SLACK_WEBHOOK_BROADCAST_CONCURRENCY, SLACK_WEBHOOK_RETRIES
+from .transport import http_client
+
+logger = logging.getLogger(__name__)
+
+WebhookDelivery = namedtuple('WebhookDelivery', 'webhook_id channel_id status ok error')
+
+# https://api.slack.com/messaging/webhooks#handling_errors
+DEAD_STATUSES = (403, 404, 410)
+
+
+def deliver(webhook, body: bytes, retries: int) -> WebhookDelivery:
+    try:
+        response = http_client.post_json(webhook.url, body, retries=retries)
+    except (http.client.HTTPException, OSError) as err:
+        return WebhookDelivery(webhook.pk, webhook.channel_id, None, False, str(err))
+
+    ok = response.status == 200
+    error = None if ok else response.body.decode('utf-8', 'replace')[:255]
+    return WebhookDelivery(webhook.pk, webhook.channel_id, response.status, ok, error)
+
+
+def broadcast(payload, webhooks: Iterable, concurrency: int = None, retries: int = None) -> List[WebhookDelivery]:
+    """
+    Posts `payload` to every webhook, returns a delivery report per webhook
+
+    :param payload: message as a dict (or already serialized JSON bytes)
+    :param webhooks: SlackWebHook queryset, streamed with iterator()
+    """
+    from .models import SlackWebHook
+
+    concurrency = concurrency or SLACK_WEBHOOK_BROADCAST_CONCURRENCY
+    retries = SLACK_WEBHOOK_RETRIES if retries is None else retries
+    body = payload if isinstance(payload, bytes) else json.dumps(payload).encode('utf-8')
+
+    if hasattr(webhooks, 'iterator'):
+        webhooks = webhooks.only('pk', 'channel_id', 'url').iterator(chunk_size=concurrency * 10)
+
+    # bounds webhooks read from the database but not delivered yet
+    in_flight = threading.BoundedSemaphore(concurrency * 2)
+    futures = []
+
+    def run(webhook):
+        try:
+            return deliver(webhook, body, retries)
+        finally:
+            in_flight.release()
+
+    with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix='slack-webhooks') as executor:
+        for webhook in webhooks:
+            in_flight.acquire()
+            futures.append(executor.submit(run, webhook))
+
+    report = [future.result() for future in futures]
+
+    dead = [delivery.webhook_id for delivery in report if delivery.status in DEAD_STATUSES]
+    if dead:
+        SlackWebHook.objects.filter(pk__in=dead).update(dead_since=timezone.now())
+        logger.info("Marked %s Slack webhooks as dead", len(dead))
+
+    delivered = sum(delivery.ok for delivery in report)
+    metrics.incr('slack_webhook_deliveries', delivered, result='ok')
+    metrics.incr('slack_webhook_deliveries', len(report) - delivered, result='failed')
+    return report